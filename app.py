@@ -120,6 +120,14 @@ def create_app(config_name='default'):
     # Créer l'utilisateur par défaut s'il n'existe pas
     _create_default_user()
     
+    # Initialiser le gestionnaire de tâches en arrière-plan
+    from background_jobs import job_manager
+    job_manager.init_app(app)
+    
+    # Baux des tâches planifiées : une seule exécution par tâche entre les workers
+    from scheduler_lease import lease_manager
+    lease_manager.init_app(app)
+    
     # Initialiser le scheduler EBDZ
     from blueprints.ebdz.scheduler import ebdz_scheduler
     ebdz_scheduler.init_app(app)
@@ -139,6 +147,16 @@ def create_app(config_name='default'):
         from blueprints.library.import_history import init_import_history_table
         init_import_history_table()
         
+        # Catalogue ed2k : migration éventuelle, puis analyse des noms de fichiers en attente.
+        # Un seul worker s'en charge (bail partagé) ; les autres démarrent sans attendre
+        from blueprints.ebdz.catalog import init_catalog_db, backfill_metadata
+        with lease_manager.hold('ebdz_catalog_migration') as acquired:
+            if not acquired:
+                print("⏭️  Migration du catalogue ed2k prise en charge par un autre worker")
+            elif init_catalog_db(app.config['DB_FILE']):
+                job_manager.submit('ebdz_metadata', backfill_metadata, app.config['DB_FILE'],
+                                   exclusive=True)
+        
         from blueprints.ebdz.routes import load_ebdz_config
         ebdz_config = load_ebdz_config()
         
@@ -0,0 +1,370 @@
+"""
+Gestionnaire de tâches en arrière-plan (transferts, renommages, scraping...)
+
+Les tâches longues sont exécutées dans un thread dédié avec le contexte de
+l'application Flask. Leur état (progression, résultat, erreur) est stocké dans
+la table background_jobs pour pouvoir être interrogé depuis l'API.
+
+La table est partagée entre les workers : chaque tâche enregistre le worker
+qui l'exécute (owner) et un battement de cœur (heartbeat_at). Une tâche n'est
+marquée "interrupted" que si son worker est arrêté ou ne bat plus, et les
+tests "déjà en cours" portent sur tous les workers.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+
+class BackgroundJob:
+    """Handle passé à la fonction exécutée pour rapporter sa progression"""
+    
+    # Intervalle minimal entre deux écritures de progression en base (secondes)
+    PROGRESS_FLUSH_INTERVAL = 0.5
+    
+    def __init__(self, manager, job_id, job_type):
+        self.manager = manager
+        self.id = job_id
+        self.job_type = job_type
+        self.progress = {}
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+    
+    def update(self, force=False, **progress):
+        """Met à jour la progression (fusionnée avec la progression existante)
+        
+        Les écritures en base sont limitées à PROGRESS_FLUSH_INTERVAL pour ne
+        pas transformer chaque fichier copié en transaction SQLite.
+        """
+        with self._lock:
+            self.progress.update(progress)
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.PROGRESS_FLUSH_INTERVAL:
+                return
+            self._last_flush = now
+            snapshot = dict(self.progress)
+        
+        self.manager._save_progress(self.id, snapshot)
+    
+    def increment(self, key, amount=1):
+        """Incrémente un compteur de progression"""
+        with self._lock:
+            self.progress[key] = self.progress.get(key, 0) + amount
+        self.update()
+
+
+class BackgroundJobManager:
+    """Lance des tâches dans des threads et persiste leur état dans SQLite"""
+    
+    # Intervalle entre deux battements de cœur d'une tâche en cours (secondes)
+    HEARTBEAT_INTERVAL = 30
+    # Une tâche sans battement de cœur depuis JOB_TTL secondes est considérée interrompue
+    JOB_TTL = 120
+    # Tâche en cours ou en attente dont le worker bat encore (paramètres : type, limite)
+    _LIVE_JOB_QUERY = '''
+        SELECT 1 FROM background_jobs
+        WHERE job_type = ? AND status IN ('pending', 'running') AND heartbeat_at >= ?
+    '''
+    
+    def __init__(self, app=None):
+        self.app = app
+        self.db_path = None
+        self._threads = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Initialiser le gestionnaire avec l'app Flask"""
+        self.app = app
+        self.db_path = app.config['DATABASE']
+        self._init_table()
+    
+    @property
+    def owner(self):
+        """Identifiant du worker (calculé à chaque appel : les workers sont forkés)"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=120.0, check_same_thread=False)
+    
+    def _init_table(self):
+        """Crée la table des tâches et marque comme interrompues celles d'un précédent démarrage"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS background_jobs (
+                id TEXT PRIMARY KEY,
+                job_type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_background_jobs_type_created
+            ON background_jobs (job_type, created_at)
+        ''')
+        
+        # Worker propriétaire et battement de cœur (tables antérieures)
+        cursor.execute("PRAGMA table_info(background_jobs)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for col_name, col_type in [('owner', 'TEXT'), ('heartbeat_at', 'REAL')]:
+            if col_name not in existing_columns:
+                cursor.execute(f"ALTER TABLE background_jobs ADD COLUMN {col_name} {col_type}")
+        
+        conn.commit()
+        conn.close()
+        
+        self._reap_dead_jobs()
+    
+    def _owner_alive(self, owner):
+        """Le worker propriétaire d'une tâche est-il encore en vie ?
+        
+        Returns:
+            False si le worker est arrêté (même machine), None si indéterminable
+        """
+        host, _, pid = (owner or '').rpartition(':')
+        if host != socket.gethostname():
+            return None
+        if owner == self.owner:
+            # Même pid que ce processus : tâche d'un processus précédent sauf si on l'exécute
+            return None
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, ValueError):
+            return None
+        return True
+    
+    def _reap_dead_jobs(self):
+        """Marque comme interrompues les tâches dont le worker est arrêté
+        
+        Seules les tâches sans battement de cœur récent, ou dont le worker
+        (sur cette machine) n'existe plus, sont concernées : celles des autres
+        workers en vie continuent.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT id, owner, heartbeat_at FROM background_jobs
+                WHERE status IN ('pending', 'running')
+            ''').fetchall()
+            
+            stale_before = time.time() - self.JOB_TTL
+            with self._lock:
+                local_jobs = set(self._threads)
+            dead = [
+                job_id for job_id, owner, heartbeat_at in rows
+                if job_id not in local_jobs and (
+                    heartbeat_at is None or heartbeat_at < stale_before
+                    or owner == self.owner or self._owner_alive(owner) is False
+                )
+            ]
+            
+            if dead:
+                conn.executemany('''
+                    UPDATE background_jobs
+                    SET status = 'interrupted', finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status IN ('pending', 'running')
+                ''', [(job_id,) for job_id in dead])
+                conn.commit()
+        finally:
+            conn.close()
+    
+    def submit(self, job_type, func, *args, params=None, exclusive=False, **kwargs):
+        """Lance func(job, *args, **kwargs) dans un thread
+        
+        Args:
+            job_type: Type de tâche ('series_transfer', 'bulk_rename'...)
+            func: Fonction à exécuter, reçoit le BackgroundJob en premier argument
+            params: Paramètres à enregistrer avec la tâche (JSON)
+            exclusive: Ne pas lancer la tâche si une tâche de ce type est en
+                       cours sur un worker (test et insertion atomiques)
+        
+        Returns:
+            Identifiant de la tâche (None si exclusive et déjà en cours)
+        """
+        if self.app is None:
+            raise RuntimeError("BackgroundJobManager non initialisé (init_app)")
+        
+        job_id = str(uuid.uuid4())
+        job = BackgroundJob(self, job_id, job_type)
+        thread = threading.Thread(
+            target=self._run,
+            args=(job, func, args, kwargs),
+            name=f"job-{job_type}-{job_id[:8]}",
+            daemon=True
+        )
+        
+        # Enregistrée avant l'insertion : _reap_dead_jobs ne la prend pas pour une tâche orpheline
+        with self._lock:
+            self._threads[job_id] = thread
+        
+        now = time.time()
+        query = '''
+            INSERT INTO background_jobs (id, job_type, status, params, progress, owner, heartbeat_at)
+            SELECT ?, ?, 'pending', ?, '{}', ?, ?
+        '''
+        values = [job_id, job_type, json.dumps(params or {}, default=str), self.owner, now]
+        if exclusive:
+            query += f'WHERE NOT EXISTS ({self._LIVE_JOB_QUERY})'
+            values += [job_type, now - self.JOB_TTL]
+        
+        conn = self._connect()
+        try:
+            if exclusive:
+                # Verrou d'écriture pris avant le test : deux workers ne peuvent pas
+                # lire "aucune tâche" puis insérer tous les deux
+                conn.execute('BEGIN IMMEDIATE')
+            inserted = conn.execute(query, values).rowcount == 1
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if not (exclusive and 'locked' in str(e)):
+                with self._lock:
+                    self._threads.pop(job_id, None)
+                raise
+            # Verrou toujours tenu après le délai d'attente : un autre worker lance la même tâche
+            print(f"⚠️  Base verrouillée, tâche {job_type} considérée comme déjà en cours")
+            inserted = False
+        finally:
+            conn.close()
+        
+        if not inserted:
+            with self._lock:
+                self._threads.pop(job_id, None)
+            return None
+        
+        thread.start()
+        
+        return job_id
+    
+    def _heartbeat_loop(self, job_id, stop):
+        while not stop.wait(self.HEARTBEAT_INTERVAL):
+            try:
+                conn = self._connect()
+                conn.execute('UPDATE background_jobs SET heartbeat_at = ? WHERE id = ?', (time.time(), job_id))
+                conn.commit()
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"⚠️  Impossible d'enregistrer le battement de cœur de {job_id}: {e}")
+    
+    def _run(self, job, func, args, kwargs):
+        """Exécute la tâche dans le contexte de l'application"""
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(job.id, stop),
+            name=f"heartbeat-{job.id[:8]}", daemon=True
+        )
+        heartbeat.start()
+        with self.app.app_context():
+            self._set_status(job.id, 'running', started=True)
+            try:
+                result = func(job, *args, **kwargs)
+                job.update(force=True)
+                self._finish(job.id, 'completed', result=result)
+            except Exception as e:
+                traceback.print_exc()
+                job.update(force=True)
+                self._finish(job.id, 'failed', error=str(e))
+            finally:
+                stop.set()
+                with self._lock:
+                    self._threads.pop(job.id, None)
+    
+    def _set_status(self, job_id, status, started=False):
+        conn = self._connect()
+        if started:
+            conn.execute('''
+                UPDATE background_jobs SET status = ?, started_at = CURRENT_TIMESTAMP WHERE id = ?
+            ''', (status, job_id))
+        else:
+            conn.execute('UPDATE background_jobs SET status = ? WHERE id = ?', (status, job_id))
+        conn.commit()
+        conn.close()
+    
+    def _save_progress(self, job_id, progress):
+        try:
+            conn = self._connect()
+            conn.execute('UPDATE background_jobs SET progress = ? WHERE id = ?',
+                         (json.dumps(progress, default=str), job_id))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  Impossible d'enregistrer la progression de {job_id}: {e}")
+    
+    def _finish(self, job_id, status, result=None, error=None):
+        conn = self._connect()
+        conn.execute('''
+            UPDATE background_jobs
+            SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, json.dumps(result, default=str) if result is not None else None, error, job_id))
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def _row_to_dict(row):
+        job = dict(row)
+        for key in ('params', 'progress', 'result'):
+            if job.get(key):
+                try:
+                    job[key] = json.loads(job[key])
+                except (json.JSONDecodeError, TypeError):
+                    pass
+        return job
+    
+    def get(self, job_id):
+        """Retourne l'état d'une tâche ou None"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('SELECT * FROM background_jobs WHERE id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._row_to_dict(row) if row else None
+    
+    def list(self, job_type=None, limit=20):
+        """Liste les tâches les plus récentes"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        if job_type:
+            rows = conn.execute('''
+                SELECT * FROM background_jobs WHERE job_type = ?
+                ORDER BY created_at DESC LIMIT ?
+            ''', (job_type, limit)).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT * FROM background_jobs ORDER BY created_at DESC LIMIT ?
+            ''', (limit,)).fetchall()
+        conn.close()
+        return [self._row_to_dict(row) for row in rows]
+    
+    def is_running(self, job_type):
+        """Indique si une tâche de ce type est en cours, sur ce worker ou un autre"""
+        with self._lock:
+            if any(t.name.startswith(f"job-{job_type}-") and t.is_alive()
+                   for t in self._threads.values()):
+                return True
+        
+        self._reap_dead_jobs()
+        conn = self._connect()
+        try:
+            row = conn.execute(self._LIVE_JOB_QUERY, (job_type, time.time() - self.JOB_TTL)).fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+
+# Instance globale du gestionnaire
+job_manager = BackgroundJobManager()
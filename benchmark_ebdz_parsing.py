@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the ebdz HTML parsing backends
+Compares CPU time and memory of each backend over saved forum/thread pages
+and checks that they all extract the same data
+"""
+
+import argparse
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from blueprints.ebdz.parsing import SoupParser, available_parsers, get_parser
+
+# Configuration
+FIXTURES_DIR = "data/ebdz_fixtures"
+BASELINE = 'soup-full'
+
+
+class FullSoupParser(SoupParser):
+    """Previous behaviour: full html.parser tree for every page"""
+    
+    name = BASELINE
+    THREAD_STRAINER = None
+
+
+def load_parser(name):
+    if name == BASELINE:
+        return FullSoupParser()
+    return get_parser(name)
+
+
+def load_fixtures(fixtures_dir):
+    """
+    Load saved pages: forum_*.html (forum listings) and thread_*.html (threads)
+    
+    Save pages from a logged-in browser session ("Save page as, HTML only").
+    """
+    fixtures_dir = Path(fixtures_dir)
+    forum_pages = [p.read_text(encoding='utf-8', errors='replace') for p in sorted(fixtures_dir.glob('forum_*.html'))]
+    thread_pages = [p.read_text(encoding='utf-8', errors='replace') for p in sorted(fixtures_dir.glob('thread_*.html'))]
+    return forum_pages, thread_pages
+
+
+def synthetic_pages(threads_per_page=40, forum_page_count=5, thread_page_count=50):
+    """Generate myBB-like pages when no fixture has been saved"""
+    padding = '<div class="smalltext">' + 'Lorem ipsum dolor sit amet. ' * 40 + '</div>'
+    
+    forum_pages = []
+    for page in range(forum_page_count):
+        rows = []
+        for i in range(threads_per_page):
+            tid = page * threads_per_page + i + 1
+            rows.append(
+                f'<tr class="inline_row"><td class="trow1"><img src="images/dot.png" alt=""></td>'
+                f'<td class="trow1"><span class="subject_new"><a href="showthread.php?tid={tid}">Série {tid} [Tome 01-{i + 1:02d}]</a></span>'
+                f'<span class="smalltext">(Pages: <a href="showthread.php?tid={tid}&amp;page=2">2</a>)</span></td>'
+                f'<td class="trow1" align="center"><a href="javascript:MyBB.whoPosted({tid});">{i * 3}</a></td>'
+                f'<td class="trow1 lastpost"><span class="smalltext">19-10-2026, 1{i % 10}:2{i % 6} <br>'
+                f'<a href="showthread.php?tid={tid}&amp;action=lastpost">Dernier message</a> par <a href="member.php?uid=1">user</a></span></td></tr>'
+            )
+        pagination = ''.join(f'<a href="forumdisplay.php?fid=1&amp;page={n}" class="pagination_page">{n}</a>' for n in range(1, forum_page_count + 1))
+        forum_pages.append(
+            f'<html><head><title>Forum</title><script>var my_post_key = "x";</script></head><body>'
+            f'{padding}<div class="pagination">{pagination}</div><table class="tborder">{"".join(rows)}</table>{padding}</body></html>'
+        )
+    
+    thread_pages = []
+    for tid in range(thread_page_count):
+        links = ''.join(f'<a href="ed2k://|file|Serie.{tid}.T{v:02d}.cbz|123456|ABCDEF|/">Tome {v}</a><br>' for v in range(1, 30))
+        thread_pages.append(
+            f'<html><head><title>Thread</title></head><body>{padding * 5}'
+            f'<div class="post_body"><ul><li class="couv"><img src="https://ebdz.net/covers/{tid}.jpg"></li>'
+            f'<li class="infos"><p class="indent">Résumé du tome {tid}<br />sur deux lignes.</p></li></ul>'
+            f'{links}</div>{padding * 5}</body></html>'
+        )
+    
+    return forum_pages, thread_pages
+
+
+def load_baseline(name, forum_pages, thread_pages, queue):
+    """Load the backend and the pages without parsing: RSS reference of run_backend"""
+    load_parser(name)
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def run_backend(name, forum_pages, thread_pages, iterations, queue):
+    """Parse every page `iterations` times in a fresh process (isolated memory)
+    
+    ru_maxrss is a lifetime high-water mark: the parsing cost is the absolute
+    peak of this process minus the one of load_baseline. tracemalloc gives the
+    Python heap peak but does not see native allocations (lxml, selectolax).
+    """
+    parser = load_parser(name)
+    
+    forum_times = []
+    thread_times = []
+    results = None
+    for _ in range(iterations):
+        start = time.process_time()
+        forum_results = [parser.parse_forum_page(html) for html in forum_pages]
+        forum_times.append(time.process_time() - start)
+        
+        start = time.process_time()
+        thread_results = [parser.parse_thread_page(html) for html in thread_pages]
+        thread_times.append(time.process_time() - start)
+        
+        results = (forum_results, thread_results)
+    
+    # Extra pass for the Python heap: tracemalloc would slow down the timed runs
+    results = None
+    tracemalloc.start()
+    results = ([parser.parse_forum_page(html) for html in forum_pages],
+               [parser.parse_thread_page(html) for html in thread_pages])
+    py_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queue.put({
+        'backend': name,
+        'forum_ms': statistics.median(forum_times) * 1000,
+        'thread_ms': statistics.median(thread_times) * 1000,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'py_peak_kb': py_peak // 1024,
+        'results': results
+    })
+
+
+def run_in_process(context, target, *args):
+    queue = context.Queue()
+    process = context.Process(target=target, args=args + (queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def benchmark(forum_pages, thread_pages, iterations):
+    """Run every available backend and compare to the previous behaviour"""
+    context = multiprocessing.get_context('spawn')
+    reports = []
+    
+    for name in [BASELINE] + available_parsers():
+        print(f"  📍 {name}...", end=" ", flush=True)
+        baseline_rss = run_in_process(context, load_baseline, name, forum_pages, thread_pages)
+        report = run_in_process(context, run_backend, name, forum_pages, thread_pages, iterations)
+        report['peak_rss_kb'] = max(report['max_rss_kb'] - baseline_rss, 0)
+        print(f"✅ {report['forum_ms'] + report['thread_ms']:.0f}ms")
+        reports.append(report)
+    
+    baseline = reports[0]
+    for report in reports:
+        report['identical'] = report['results'] == baseline['results']
+    
+    return reports
+
+
+def print_report(reports, forum_count, thread_count, iterations):
+    baseline = reports[0]
+    baseline_ms = baseline['forum_ms'] + baseline['thread_ms']
+    
+    print("\n" + "=" * 70)
+    print(f"{forum_count} forum page(s), {thread_count} thread page(s), median of {iterations} run(s)")
+    print("=" * 70)
+    print(f"{'Backend':<12} {'Forum (ms)':>11} {'Threads (ms)':>13} {'Speedup':>8} "
+          f"{'RSS +KB':>9} {'Py peak KB':>11}  Output")
+    for report in reports:
+        total_ms = report['forum_ms'] + report['thread_ms']
+        speedup = baseline_ms / total_ms if total_ms else 0
+        output = "identical" if report['identical'] else "⚠️ DIFFERENT"
+        print(f"{report['backend']:<12} {report['forum_ms']:>11.1f} {report['thread_ms']:>13.1f} "
+              f"{speedup:>7.1f}x {report['peak_rss_kb']:>9} {report['py_peak_kb']:>11}  {output}")
+    print("RSS +KB: peak RSS above a process that only loads the backend and the pages")
+    print("Py peak KB: Python heap peak while parsing (tracemalloc, native allocations excluded)")
+    print("=" * 70 + "\n")
+
+
+def main():
+    """Main execution"""
+    parser = argparse.ArgumentParser(description="Benchmark of the ebdz HTML parsing backends")
+    parser.add_argument('fixtures', nargs='?', default=FIXTURES_DIR,
+                        help=f"Directory of saved forum_*.html / thread_*.html pages (default: {FIXTURES_DIR})")
+    parser.add_argument('--iterations', type=int, default=5, help="Runs per backend (default: 5)")
+    args = parser.parse_args()
+    
+    print("\n" + "=" * 70)
+    print("🔍 EBDZ HTML PARSING BENCHMARK")
+    print("=" * 70 + "\n")
+    
+    forum_pages, thread_pages = load_fixtures(args.fixtures)
+    if not forum_pages and not thread_pages:
+        print(f"⚠️  No fixture in {args.fixtures}, using synthetic myBB pages\n")
+        forum_pages, thread_pages = synthetic_pages()
+    
+    reports = benchmark(forum_pages, thread_pages, args.iterations)
+    print_report(reports, len(forum_pages), len(thread_pages), args.iterations)
+    
+    if not all(report['identical'] for report in reports):
+        print("❌ Some backends do not extract the same data as html.parser")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+"""
+Catalogue des liens ed2k (base ebdz)
+
+- ed2k_files : un fichier par hash ed2k + taille (premier lien vu) et ses
+  métadonnées analysées : taille numérique, série, tome, résolution, format
+- ed2k_threads : métadonnées des threads (titre, catégorie, couverture...)
+- ed2k_postings : fichiers postés dans chaque thread
+- ed2k_links : vue (fichier × thread) pour les lectures existantes
+- ed2k_series_keys / ed2k_series_matches : correspondances précalculées entre
+  les séries de la bibliothèque et les fichiers (titre normalisé + tome)
+
+Les noms de fichiers sont analysés avec le parseur partagé de la bibliothèque
+(LibraryScanner.parse_filename) et stockés dans des colonnes indexées :
+recherche, classement et détection des tomes manquants filtrent et trient
+directement en SQL.
+"""
+import re
+import sqlite3
+import unicodedata
+from urllib.parse import unquote
+
+from blueprints.library.scanner import LibraryScanner
+
+
+# À incrémenter quand le parseur change : les fichiers sont ré-analysés
+METADATA_VERSION = 2
+
+METADATA_COLUMNS = [
+    ('size_bytes', 'INTEGER'),
+    ('series_title', 'TEXT'),
+    ('resolution', 'TEXT'),
+    ('format', 'TEXT'),
+    ('title_key', 'TEXT'),
+    ('metadata_version', 'INTEGER')
+]
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+PENDING_FILTER = "(metadata_version IS NULL OR metadata_version < ?)"
+
+# Vue (fichier × thread) des lectures existantes, à modifier avec les colonnes du catalogue
+LINKS_VIEW_SQL = """
+    CREATE VIEW ed2k_links AS
+    SELECT p.rowid AS id, f.link, f.filename, f.filesize, f.volume,
+           t.thread_title, t.thread_url, p.thread_id, t.forum_category,
+           t.cover_image, t.description, p.date_scraped, f.id AS file_id,
+           f.size_bytes, f.series_title, f.resolution, f.format
+    FROM ed2k_postings p
+    JOIN ed2k_files f ON f.id = p.file_id
+    JOIN ed2k_threads t ON t.thread_id = p.thread_id
+"""
+
+
+def init_catalog(connection):
+    """Crée le catalogue, migre l'ancienne table ed2k_links et crée la vue si besoin"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ed2k_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ed2k_hash TEXT NOT NULL,
+            filesize TEXT,
+            link TEXT NOT NULL,
+            filename TEXT,
+            volume INTEGER,
+            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (ed2k_hash, filesize)
+        )
+    """)
+    ensure_metadata_columns(connection)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ed2k_threads (
+            thread_id TEXT PRIMARY KEY,
+            thread_title TEXT,
+            thread_url TEXT,
+            forum_category TEXT,
+            cover_image TEXT,
+            description TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ed2k_postings (
+            file_id INTEGER NOT NULL REFERENCES ed2k_files(id),
+            thread_id TEXT NOT NULL,
+            date_scraped TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (file_id, thread_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_postings_thread ON ed2k_postings (thread_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_threads_category ON ed2k_threads (forum_category)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ed2k_series_keys (
+            series_id INTEGER PRIMARY KEY,
+            title_key TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ed2k_series_matches (
+            series_id INTEGER NOT NULL,
+            volume INTEGER NOT NULL,
+            file_id INTEGER NOT NULL REFERENCES ed2k_files(id),
+            PRIMARY KEY (series_id, volume, file_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_series_keys_title ON ed2k_series_keys (title_key)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_series_matches_file ON ed2k_series_matches (file_id)")
+    
+    # Ancienne table à plat : migrée dans le catalogue puis remplacée par la vue
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'ed2k_links'")
+    row = cursor.fetchone()
+    if row and row[0] == 'table':
+        migrate_links_table(connection)
+    
+    connection.commit()
+    cursor.close()
+    ensure_links_view(connection)
+
+
+def _normalize_sql(sql):
+    return ' '.join((sql or '').split())
+
+
+def ensure_links_view(connection):
+    """Crée ou remplace la vue ed2k_links si elle est absente ou périmée
+    
+    Pas de DDL quand la vue est à jour : les appels concurrents (démarrage,
+    scraping, analyse) ne verrouillent pas la base. Le remplacement se fait
+    dans une seule transaction : un lecteur ne voit jamais la base sans vue.
+    """
+    expected = _normalize_sql(LINKS_VIEW_SQL)
+    query = "SELECT type, sql FROM sqlite_master WHERE name = 'ed2k_links'"
+    row = connection.execute(query).fetchone()
+    if row and row[0] == 'view' and _normalize_sql(row[1]) == expected:
+        return
+    
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Vérifié à nouveau sous verrou : un autre processus a pu la créer entre-temps
+        row = connection.execute(query).fetchone()
+        if not (row and row[0] == 'view' and _normalize_sql(row[1]) == expected):
+            connection.execute("DROP VIEW IF EXISTS ed2k_links")
+            connection.execute(LINKS_VIEW_SQL)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def init_catalog_db(db_file):
+    """Crée ou migre le catalogue d'une base ebdz (démarrage de l'application)
+    
+    Returns:
+        Nombre de fichiers dont les métadonnées restent à analyser
+    """
+    connection = sqlite3.connect(db_file, timeout=30)
+    try:
+        init_catalog(connection)
+        return count_pending_metadata(connection)
+    finally:
+        connection.close()
+
+
+def count_pending_metadata(connection):
+    """Nombre de fichiers sans métadonnées (ou d'une version antérieure du parseur)"""
+    return connection.execute(
+        f"SELECT COUNT(*) FROM ed2k_files WHERE {PENDING_FILTER}", (METADATA_VERSION,)
+    ).fetchone()[0]
+
+
+def ensure_metadata_columns(connection):
+    """Ajoute les colonnes de métadonnées et leurs index à ed2k_files"""
+    existing_columns = {row[1] for row in connection.execute("PRAGMA table_info(ed2k_files)")}
+    for col_name, col_type in METADATA_COLUMNS:
+        if col_name not in existing_columns:
+            connection.execute(f"ALTER TABLE ed2k_files ADD COLUMN {col_name} {col_type}")
+    
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ed2k_files_series_volume
+        ON ed2k_files (series_title COLLATE NOCASE, volume)
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_files_volume ON ed2k_files (volume)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_files_size ON ed2k_files (size_bytes)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_files_metadata_version ON ed2k_files (metadata_version)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_ed2k_files_title_key ON ed2k_files (title_key, volume)")
+
+
+def migrate_links_table(connection):
+    """Migre l'ancienne table ed2k_links (une ligne par lien) vers le catalogue"""
+    print("↻ Migration de ed2k_links vers le catalogue dédupliqué...")
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT link, filename, filesize, volume, thread_title, thread_url, thread_id,
+               forum_category, cover_image, description, date_scraped
+        FROM ed2k_links ORDER BY id
+    """)
+    
+    migrated = 0
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        save_links(connection, [
+            {
+                'link': r[0], 'filename': r[1], 'filesize': r[2], 'volume': r[3],
+                'thread_title': r[4], 'thread_url': r[5], 'thread_id': r[6],
+                'forum_category': r[7], 'cover_image': r[8], 'description': r[9],
+                'date_scraped': r[10]
+            }
+            for r in rows
+        ])
+        migrated += len(rows)
+    
+    connection.execute("DROP TABLE ed2k_links")
+    files = connection.execute("SELECT COUNT(*) FROM ed2k_files").fetchone()[0]
+    print(f"✓ {migrated} liens migrés : {files} fichier(s) unique(s)")
+
+
+def parse_ed2k_hash(link):
+    """Hash ed2k du lien (identifiant du fichier avec la taille)"""
+    parts = link.split('|')
+    if len(parts) > 4 and parts[4]:
+        return parts[4].upper()
+    # Lien sans hash : le lien lui-même sert d'identifiant
+    return link
+
+
+def normalize_title(title):
+    """Clé de correspondance d'un titre : minuscules, sans accents ni ponctuation"""
+    if not title:
+        return None
+    title = unicodedata.normalize('NFKD', title)
+    title = ''.join(c for c in title if not unicodedata.combining(c)).lower()
+    return _NON_ALNUM_RE.sub(' ', title).strip() or None
+
+
+def parse_file_metadata(filename, filesize, fallback_volume=None):
+    """Analyse le nom et la taille d'un fichier ed2k
+    
+    Args:
+        filename: Nom du fichier tel qu'extrait du lien (encodé URL)
+        filesize: Taille en octets (texte du lien)
+        fallback_volume: Tome déjà connu, utilisé si le parseur n'en trouve pas
+    
+    Returns:
+        Dict {size_bytes, series_title, title_key, volume, resolution, format}
+    """
+    try:
+        size_bytes = int(filesize)
+    except (TypeError, ValueError):
+        size_bytes = None
+    
+    if not filename:
+        return {'size_bytes': size_bytes, 'series_title': None, 'title_key': None,
+                'volume': fallback_volume, 'resolution': None, 'format': None}
+    
+    info = LibraryScanner.parse_filename(unquote(filename))
+    volume = info['volume'] if info['volume'] is not None else fallback_volume
+    
+    return {
+        'size_bytes': size_bytes,
+        'series_title': info['title'] or None,
+        'title_key': normalize_title(info['title']),
+        'volume': volume,
+        'resolution': info['resolution'],
+        'format': info['format'] or None
+    }
+
+
+def save_links(connection, ed2k_data):
+    """Enregistre des liens parsés dans le catalogue (transaction de l'appelant)
+    
+    Un même fichier (hash + taille) posté dans plusieurs threads ou forums
+    n'est stocké qu'une fois ; seul le postage est ajouté.
+    
+    Returns:
+        Nombre de nouveaux postages (fichier × thread)
+    """
+    files = []
+    for data in ed2k_data:
+        meta = parse_file_metadata(data['filename'], data['filesize'], data['volume'])
+        files.append((
+            parse_ed2k_hash(data['link']), data['filesize'], data['link'], data['filename'],
+            meta['volume'], meta['size_bytes'], meta['series_title'], meta['resolution'],
+            meta['format'], meta['title_key'], METADATA_VERSION
+        ))
+    connection.executemany("""
+        INSERT OR IGNORE INTO ed2k_files (ed2k_hash, filesize, link, filename, volume, size_bytes,
+                                          series_title, resolution, format, title_key, metadata_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, files)
+    # Nouveaux fichiers rattachés aux séries de la bibliothèque de même titre
+    match_title_keys(connection, {file[9] for file in files if file[9]})
+    
+    # Dernières métadonnées connues du thread (la couverture peut arriver plus tard)
+    threads = {}
+    for data in ed2k_data:
+        threads[data['thread_id']] = (
+            data['thread_id'], data['thread_title'], data['thread_url'],
+            data['forum_category'], data['cover_image'], data['description']
+        )
+    connection.executemany("""
+        INSERT INTO ed2k_threads (thread_id, thread_title, thread_url, forum_category, cover_image, description)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(thread_id) DO UPDATE SET
+            thread_title = excluded.thread_title,
+            thread_url = excluded.thread_url,
+            forum_category = excluded.forum_category,
+            cover_image = COALESCE(excluded.cover_image, ed2k_threads.cover_image),
+            description = COALESCE(excluded.description, ed2k_threads.description)
+    """, list(threads.values()))
+    
+    changes_before = connection.total_changes
+    connection.executemany("""
+        INSERT OR IGNORE INTO ed2k_postings (file_id, thread_id, date_scraped)
+        SELECT id, ?, COALESCE(?, CURRENT_TIMESTAMP) FROM ed2k_files
+        WHERE ed2k_hash = ? AND filesize IS ?
+    """, [
+        (data['thread_id'], data.get('date_scraped'), file[0], file[1])
+        for data, file in zip(ed2k_data, files)
+    ])
+    return connection.total_changes - changes_before
+
+
+def backfill_metadata(job, db_file, batch_size=1000):
+    """Analyse les fichiers du catalogue sans métadonnées (ou d'une version antérieure)
+    
+    Traitement par lots (parcours par id, un commit par lot) : peut être
+    interrompu et relancé sans refaire le travail déjà enregistré.
+    
+    Args:
+        job: BackgroundJob pour rapporter la progression (None hors job_manager)
+        db_file: Base ebdz
+        batch_size: Nombre de fichiers par lot
+    
+    Returns:
+        Dict {files_updated}
+    """
+    connection = sqlite3.connect(db_file, timeout=30)
+    try:
+        init_catalog(connection)
+        
+        total = count_pending_metadata(connection)
+        if job:
+            job.update(force=True, files_total=total, files_done=0)
+        if not total:
+            return {'files_updated': 0}
+        
+        print(f"🔍 Analyse des métadonnées de {total} fichier(s) ed2k...")
+        updated = 0
+        last_id = 0
+        while True:
+            rows = connection.execute(f"""
+                SELECT id, filename, filesize, volume FROM ed2k_files
+                WHERE id > ? AND {PENDING_FILTER}
+                ORDER BY id LIMIT ?
+            """, (last_id, METADATA_VERSION, batch_size)).fetchall()
+            if not rows:
+                break
+            
+            updates = []
+            for file_id, filename, filesize, volume in rows:
+                meta = parse_file_metadata(filename, filesize, volume)
+                updates.append((
+                    meta['size_bytes'], meta['series_title'], meta['volume'], meta['resolution'],
+                    meta['format'], meta['title_key'], METADATA_VERSION, file_id
+                ))
+            
+            with connection:
+                connection.executemany("""
+                    UPDATE ed2k_files SET size_bytes = ?, series_title = ?, volume = ?,
+                           resolution = ?, format = ?, title_key = ?, metadata_version = ?
+                    WHERE id = ?
+                """, updates)
+            
+            updated += len(rows)
+            last_id = rows[-1][0]
+            if job:
+                job.increment('files_done', len(rows))
+        
+        # Titres et tomes ont pu changer : correspondances recalculées
+        with connection:
+            rebuild_series_matches(connection)
+        
+        print(f"✓ Métadonnées analysées pour {updated} fichier(s)")
+        return {'files_updated': updated}
+    finally:
+        connection.close()
+
+
+def match_title_keys(connection, title_keys):
+    """Ajoute les correspondances des fichiers portant ces clés de titre"""
+    connection.executemany("""
+        INSERT OR IGNORE INTO ed2k_series_matches (series_id, volume, file_id)
+        SELECT k.series_id, f.volume, f.id
+        FROM ed2k_series_keys k
+        JOIN ed2k_files f ON f.title_key = k.title_key
+        WHERE k.title_key = ? AND f.volume IS NOT NULL
+    """, [(key,) for key in title_keys])
+
+
+def rebuild_series_matches(connection):
+    """Recalcule toutes les correspondances (après une ré-analyse des fichiers)"""
+    connection.execute("DELETE FROM ed2k_series_matches")
+    connection.execute("""
+        INSERT OR IGNORE INTO ed2k_series_matches (series_id, volume, file_id)
+        SELECT k.series_id, f.volume, f.id
+        FROM ed2k_series_keys k
+        JOIN ed2k_files f ON f.title_key = k.title_key
+        WHERE f.volume IS NOT NULL
+    """)
+
+
+def sync_series(connection, series):
+    """Enregistre des séries de la bibliothèque et calcule leurs correspondances
+    
+    Seules les séries nouvelles ou renommées sont (re)calculées.
+    
+    Args:
+        series: Liste de tuples (series_id, titre)
+    
+    Returns:
+        Nombre de séries ajoutées ou modifiées
+    """
+    known = dict(connection.execute("SELECT series_id, title_key FROM ed2k_series_keys"))
+    changed = []
+    for series_id, title in series:
+        title_key = normalize_title(title)
+        if title_key and known.get(series_id) != title_key:
+            changed.append((series_id, title_key))
+    if not changed:
+        return 0
+    
+    connection.executemany("DELETE FROM ed2k_series_matches WHERE series_id = ?",
+                           [(series_id,) for series_id, _ in changed])
+    connection.executemany("""
+        INSERT INTO ed2k_series_keys (series_id, title_key) VALUES (?, ?)
+        ON CONFLICT(series_id) DO UPDATE SET title_key = excluded.title_key
+    """, changed)
+    connection.executemany("""
+        INSERT OR IGNORE INTO ed2k_series_matches (series_id, volume, file_id)
+        SELECT k.series_id, f.volume, f.id
+        FROM ed2k_series_keys k
+        JOIN ed2k_files f ON f.title_key = k.title_key
+        WHERE k.series_id = ? AND f.volume IS NOT NULL
+    """, [(series_id,) for series_id, _ in changed])
+    return len(changed)
+
+
+def register_series(db_file, series_id, title):
+    """Enregistre une série ajoutée à la bibliothèque (erreurs ignorées)"""
+    try:
+        connection = sqlite3.connect(db_file, timeout=30)
+        try:
+            with connection:
+                sync_series(connection, [(series_id, title)])
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Correspondances ed2k non calculées pour la série {series_id}: {e}")
+
+
+def find_series_matches(connection, wanted, limit_per_volume=10):
+    """Résout en une jointure les fichiers disponibles pour des tomes manquants
+    
+    Args:
+        wanted: Liste de tuples (series_id, tome)
+        limit_per_volume: Nombre maximal de fichiers par tome
+    
+    Returns:
+        Dict {(series_id, tome): [dicts {thread_id, thread_title, forum_category,
+        link, filename, size, volume}]}, chaque fichier rattaché à son thread
+        le plus récent
+    """
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_volumes (series_id INTEGER, volume INTEGER)")
+    connection.execute("DELETE FROM temp.wanted_volumes")
+    connection.executemany("INSERT INTO temp.wanted_volumes (series_id, volume) VALUES (?, ?)", wanted)
+    
+    rows = connection.execute("""
+        SELECT w.series_id, w.volume, p.thread_id, t.thread_title, t.forum_category,
+               f.link, f.filename, COALESCE(f.size_bytes, f.filesize),
+               MAX(CAST(p.thread_id AS INTEGER)) AS last_thread
+        FROM temp.wanted_volumes w
+        JOIN ed2k_series_matches m ON m.series_id = w.series_id AND m.volume = w.volume
+        JOIN ed2k_files f ON f.id = m.file_id
+        JOIN ed2k_postings p ON p.file_id = f.id
+        JOIN ed2k_threads t ON t.thread_id = p.thread_id
+        GROUP BY w.series_id, w.volume, f.id
+        ORDER BY w.series_id, w.volume, last_thread DESC
+    """).fetchall()
+    connection.execute("DELETE FROM temp.wanted_volumes")
+    
+    matches = {}
+    for row in rows:
+        results = matches.setdefault((row[0], row[1]), [])
+        if len(results) < limit_per_volume:
+            results.append({
+                'thread_id': row[2],
+                'thread_title': row[3],
+                'forum_category': row[4],
+                'link': row[5],
+                'filename': row[6],
+                'size': row[7],
+                'volume': row[1]
+            })
+    return matches
@@ -0,0 +1,247 @@
+"""
+Téléchargement des couvertures ebdz.net en arrière-plan
+
+Les couvertures sont placées dans une file bornée et récupérées par des
+workers dédiés, hors de la boucle de scraping des threads :
+
+- une seule requête par URL (hash de l'URL), quel que soit le forum
+- GET conditionnel (ETag / Last-Modified) pour les couvertures déjà connues
+- la colonne `cover_image` des threads est renseignée une fois l'image reçue
+"""
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+
+
+COVERS_DIR = './data/covers'
+
+# Marqueur de fin pour les workers
+_STOP = object()
+
+
+class CoverDownloader:
+    """File de téléchargement des couvertures avec workers dédiés"""
+    
+    def __init__(self, fetcher, db_file, covers_dir=COVERS_DIR, workers=2, queue_size=100):
+        """
+        Args:
+            fetcher: PoliteFetcher partagé (même budget de requêtes par hôte)
+            db_file: Base ebdz (tables ebdz_covers et ed2k_threads)
+            covers_dir: Répertoire des images
+            workers: Nombre de téléchargements simultanés
+            queue_size: Taille maximale de la file (le scraping attend si elle est pleine)
+        """
+        self.fetcher = fetcher
+        self.db_file = db_file
+        self.covers_dir = covers_dir
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=queue_size)
+        
+        self._threads = []
+        self._lock = threading.Lock()
+        # url_hash -> threads en attente de cette couverture
+        self._pending = {}
+        # url_hash -> chemin local (ou None si échec) pour ce scraping
+        self._done = {}
+        # thread_id -> url_hash des threads soumis
+        self._thread_covers = {}
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'cached': 0, 'failed': 0}
+        
+        os.makedirs(self.covers_dir, exist_ok=True)
+        self.create_table()
+    
+    def connect_db(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+    
+    def create_table(self):
+        """Crée la table des couvertures téléchargées (validateurs HTTP)"""
+        connection = self.connect_db()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS ebdz_covers (
+                url_hash TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        connection.commit()
+        connection.close()
+    
+    @staticmethod
+    def cover_filename(image_url):
+        """Nom de fichier unique basé sur l'URL"""
+        url_hash = hashlib.md5(image_url.encode()).hexdigest()
+        ext = os.path.splitext(image_url)[1] or '.jpg'
+        return url_hash, f"{url_hash}{ext}"
+    
+    def start(self):
+        """Démarre les workers (appelé automatiquement à la première soumission)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                worker = threading.Thread(target=self._worker, name=f"ebdz-covers-{i}", daemon=True)
+                worker.start()
+                self._threads.append(worker)
+    
+    def submit(self, thread_id, image_url):
+        """Planifie le téléchargement de la couverture d'un thread
+        
+        Returns:
+            Chemin local si la couverture est déjà disponible, None sinon
+            (cover_image sera renseigné à la fin du téléchargement)
+        """
+        if not image_url:
+            return None
+        
+        url_hash, filename = self.cover_filename(image_url)
+        local_path = f"covers/{filename}"
+        
+        with self._lock:
+            self._thread_covers[thread_id] = url_hash
+            if url_hash in self._done:
+                return self._done[url_hash]
+            if url_hash in self._pending:
+                # Déjà en file (autre thread, autre forum) : pas de seconde requête
+                self._pending[url_hash].add(thread_id)
+                return None
+            self._pending[url_hash] = {thread_id}
+        
+        self.start()
+        self.queue.put((url_hash, image_url, filename))
+        
+        # Une couverture déjà présente sur le disque est utilisable tout de suite,
+        # le worker se contente de la revalider
+        if os.path.exists(os.path.join(self.covers_dir, filename)):
+            return local_path
+        return None
+    
+    def _worker(self):
+        connection = self.connect_db()
+        try:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is _STOP:
+                        return
+                    url_hash, image_url, filename = item
+                    try:
+                        local_path = self._fetch(connection, url_hash, image_url, filename)
+                    except Exception as e:
+                        print(f"    ✗ Erreur téléchargement couverture: {e}")
+                        self._count('failed')
+                        local_path = None
+                    self._complete(connection, url_hash, local_path)
+                finally:
+                    self.queue.task_done()
+        finally:
+            connection.close()
+    
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+    
+    def _fetch(self, connection, url_hash, image_url, filename):
+        """Télécharge (ou revalide) une couverture et retourne son chemin local"""
+        filepath = os.path.join(self.covers_dir, filename)
+        local_path = f"covers/{filename}"
+        
+        row = connection.execute(
+            "SELECT etag, last_modified FROM ebdz_covers WHERE url_hash = ?", (url_hash,)
+        ).fetchone()
+        
+        headers = {}
+        if os.path.exists(filepath):
+            if not row or not (row[0] or row[1]):
+                # Image présente sans validateur HTTP : rien à revalider
+                self._count('cached')
+                return local_path
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        
+        response = self.fetcher.get(image_url, headers=headers, timeout=10)
+        
+        if response.status_code == 304:
+            self._count('not_modified')
+            return local_path
+        
+        if response.status_code != 200:
+            print(f"    ✗ Échec du téléchargement de la couverture: HTTP {response.status_code}")
+            self._count('failed')
+            return local_path if os.path.exists(filepath) else None
+        
+        # Écriture atomique : jamais d'image tronquée servie par /covers
+        tmp_path = f"{filepath}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, filepath)
+        
+        with connection:
+            connection.execute("""
+                INSERT INTO ebdz_covers (url_hash, url, filename, etag, last_modified, fetched_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(url_hash) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    fetched_at = CURRENT_TIMESTAMP
+            """, (url_hash, image_url, filename,
+                  response.headers.get('ETag'), response.headers.get('Last-Modified')))
+        
+        self._count('downloaded')
+        print(f"    ✓ Couverture sauvegardée: {filename}")
+        return local_path
+    
+    def _complete(self, connection, url_hash, local_path):
+        """Renseigne cover_image pour les threads en attente de cette couverture"""
+        with self._lock:
+            self._done[url_hash] = local_path
+            thread_ids = self._pending.pop(url_hash, set())
+        
+        if local_path and thread_ids:
+            self._update_links(connection, [(local_path, thread_id) for thread_id in thread_ids])
+    
+    @staticmethod
+    def _update_links(connection, updates):
+        with connection:
+            connection.executemany("""
+                UPDATE ed2k_threads SET cover_image = ?
+                WHERE thread_id = ? AND cover_image IS NULL
+            """, updates)
+    
+    def close(self):
+        """Attend la fin des téléchargements et arrête les workers
+        
+        Les liens enregistrés après la fin du téléchargement de leur
+        couverture sont mis à jour ici.
+        """
+        if not self._threads:
+            return
+        
+        self.queue.join()
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for worker in self._threads:
+            worker.join()
+        self._threads = []
+        
+        updates = [
+            (self._done[url_hash], thread_id)
+            for thread_id, url_hash in self._thread_covers.items()
+            if self._done.get(url_hash)
+        ]
+        if updates:
+            connection = self.connect_db()
+            try:
+                self._update_links(connection, updates)
+            finally:
+                connection.close()
+        
+        print(f"✓ Couvertures: {self.stats['downloaded']} téléchargée(s), "
+              f"{self.stats['not_modified']} inchangée(s), {self.stats['cached']} déjà présente(s), "
+              f"{self.stats['failed']} échec(s)")
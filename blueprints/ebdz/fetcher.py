@@ -0,0 +1,176 @@
+"""
+Moteur de requêtes HTTP respectueux du serveur pour le scraper ebdz.net
+
+- Fenêtre de concurrence bornée (quelques requêtes simultanées au plus)
+- Limite de débit par hôte (token bucket) : le budget requêtes/seconde
+  s'applique quel que soit le nombre de workers
+- Ralentissement adaptatif sur 429/5xx avec respect de l'en-tête Retry-After,
+  puis retour progressif au débit configuré
+"""
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from token_bucket import TokenBucket
+
+
+# Codes HTTP pour lesquels la requête est retentée
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class PoliteFetcher:
+    """Exécute des requêtes GET en parallèle dans un budget de requêtes/seconde"""
+    
+    def __init__(self, session=None, requests_per_second=1.0, max_concurrency=2,
+                 max_retries=4, backoff_base=2.0, max_backoff=120.0, timeout=30,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            session: requests.Session partagée (cookies de connexion)
+            requests_per_second: Budget de requêtes par seconde et par hôte
+            max_concurrency: Nombre maximum de requêtes simultanées
+            max_retries: Nombre de nouvelles tentatives sur 429/5xx/erreur réseau
+            backoff_base: Base du backoff exponentiel (secondes)
+            max_backoff: Attente maximale entre deux tentatives (secondes)
+            timeout: Timeout d'une requête (secondes)
+            clock, sleep: Horloge et attente des seaux à jetons (remplaçables en test)
+        """
+        self.session = session or requests.Session()
+        self.requests_per_second = requests_per_second
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+        
+        # Débit plancher lorsque le serveur demande de ralentir
+        self.min_rate = requests_per_second / 8
+        
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'errors': 0}
+    
+    def _bucket(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.requests_per_second, clock=self.clock, sleep=self.sleep)
+            return self._buckets[host]
+    
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+    
+    @staticmethod
+    def parse_retry_after(value):
+        """Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    
+    def _slow_down(self, bucket):
+        """Divise le débit de l'hôte par deux (sans descendre sous le plancher)"""
+        bucket.set_rate(max(self.min_rate, bucket.rate / 2))
+    
+    def _speed_up(self, bucket):
+        """Remonte progressivement vers le débit configuré après un succès"""
+        if bucket.rate < self.requests_per_second:
+            bucket.set_rate(min(self.requests_per_second, bucket.rate + self.min_rate))
+    
+    def get(self, url, **kwargs):
+        """GET avec limite de débit, backoff et respect de Retry-After
+        
+        Returns:
+            La réponse (éventuellement en erreur si les tentatives sont épuisées)
+        
+        Raises:
+            requests.RequestException: Erreur réseau après toutes les tentatives
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        bucket = self._bucket(url)
+        
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            self._count('requests')
+            
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.RequestException as e:
+                if attempt >= self.max_retries:
+                    self._count('errors')
+                    raise
+                wait = min(self.max_backoff, self.backoff_base ** (attempt + 1)) * random.uniform(0.8, 1.2)
+                print(f"    ⚠️  Erreur réseau ({e.__class__.__name__}), nouvel essai dans {wait:.1f}s")
+                self._count('retries')
+                bucket.pause(wait)
+                continue
+            
+            if response.status_code not in RETRY_STATUS_CODES:
+                self._speed_up(bucket)
+                return response
+            
+            self._count('throttled')
+            if attempt >= self.max_retries:
+                self._count('errors')
+                return response
+            
+            retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is None:
+                retry_after = self.backoff_base ** (attempt + 1) * random.uniform(0.8, 1.2)
+            wait = min(self.max_backoff, retry_after)
+            
+            print(f"    ⚠️  HTTP {response.status_code} sur {urlparse(url).netloc}, pause de {wait:.1f}s")
+            self._count('retries')
+            self._slow_down(bucket)
+            bucket.pause(wait)
+        
+        return response
+    
+    def map(self, func, items):
+        """Applique func(item) en parallèle (fenêtre bornée)
+        
+        func effectue ses requêtes via self.get : le débit global reste
+        limité par hôte quel que soit le nombre de workers.
+        
+        Au plus 2 * max_concurrency éléments sont en cours ou en attente :
+        items est consommé au fur et à mesure et chaque résultat est libéré
+        dès qu'il a été produit, la mémoire ne dépend donc pas du nombre
+        d'éléments.
+        
+        Yields:
+            Tuples (item, résultat, exception) dans l'ordre de fin d'exécution
+        """
+        items = iter(items)
+        window = 2 * self.max_concurrency
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {executor.submit(func, item): item for item in islice(items, window)}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = futures.pop(future)
+                    try:
+                        result, error = future.result(), None
+                    except Exception as e:
+                        result, error = None, e
+                    yield item, result, error
+                
+                # Compléter la fenêtre avec les éléments suivants
+                for item in islice(items, window - len(futures)):
+                    futures[executor.submit(func, item)] = item
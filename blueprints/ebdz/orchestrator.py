@@ -0,0 +1,165 @@
+"""
+Scraping de plusieurs forums ebdz.net en parallèle
+
+Une seule connexion au forum : la session, le moteur de requêtes (budget
+requêtes/seconde global par hôte) et la file de couvertures sont partagés par
+tous les forums. Chaque forum est isolé : une erreur n'interrompt pas les
+autres. Les statistiques proviennent des compteurs du scraper (pas de
+requêtes COUNT).
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from session_manager import SessionManager, session_manager
+
+from .covers import CoverDownloader
+from .fetcher import PoliteFetcher
+from .scraper import MyBBScraper
+
+
+FORUM_ROOT = "https://ebdz.net/forum/"
+FORUM_URL = FORUM_ROOT + "forumdisplay.php?fid={fid}"
+
+
+def is_rejected(response):
+    """Une liste du forum servie sans être connecté : cookie de session expiré"""
+    if 'forumdisplay.php' not in response.url or response.status_code != 200:
+        return False
+    return 'action=logout' not in response.text and 'Déconnexion' not in response.text
+
+
+class ScrapeOrchestrator:
+    """Lance le scraping des forums configurés avec une session partagée"""
+    
+    def __init__(self, db_file, username, password, forums, requests_per_second=1.0,
+                 max_concurrency=2, max_parallel_forums=2):
+        """
+        Args:
+            db_file: Base ebdz
+            username, password: Identifiants du forum
+            forums: Liste de dicts {fid, category, max_pages}
+            requests_per_second: Budget global de requêtes par seconde
+            max_concurrency: Requêtes simultanées par forum
+            max_parallel_forums: Nombre de forums scrapés en même temps
+        """
+        self.db_file = db_file
+        self.username = username
+        self.password = password
+        self.forums = forums
+        self.max_parallel_forums = max(1, int(max_parallel_forums))
+        
+        # Session partagée et persistée : pas de connexion si les cookies sont valides.
+        # Changer d'URL, d'utilisateur ou de mot de passe invalide les cookies
+        self.session = session_manager.get(
+            'ebdz',
+            identity=SessionManager.fingerprint(FORUM_ROOT, username, password),
+            login=self._login,
+            is_rejected=is_rejected
+        )
+        self.fetcher = PoliteFetcher(
+            self.session,
+            requests_per_second=requests_per_second,
+            max_concurrency=max_concurrency
+        )
+        self.covers = CoverDownloader(self.fetcher, db_file)
+    
+    @classmethod
+    def from_config(cls, config, db_file, forums=None):
+        """Crée l'orchestrateur depuis la configuration ebdz (load_ebdz_config)"""
+        return cls(
+            db_file,
+            config.get('username', ''),
+            config.get('password_decrypted', ''),
+            forums if forums is not None else config.get('forums', []),
+            requests_per_second=config.get('requests_per_second', 1.0),
+            max_concurrency=config.get('max_concurrency', 2),
+            max_parallel_forums=config.get('max_parallel_forums', 2)
+        )
+    
+    def _scraper(self, forum_cfg):
+        return MyBBScraper(
+            base_url=FORUM_URL.format(fid=forum_cfg['fid']),
+            db_file=self.db_file,
+            username=self.username,
+            password=self.password,
+            forum_category=forum_cfg['category'],
+            session=self.session,
+            fetcher=self.fetcher,
+            covers=self.covers
+        )
+    
+    def _login(self, session):
+        return self._scraper(self.forums[0]).login()
+    
+    def run(self, job=None, full_rescan=False):
+        """Scrape tous les forums
+        
+        Args:
+            job: BackgroundJob pour rapporter la progression (optionnel)
+            full_rescan: Ignorer l'état des threads et tout re-scraper
+        
+        Returns:
+            Dict {forums_scraped, forums_failed, new_links, forums: [...]}
+        """
+        if job:
+            job.update(force=True, forums_total=len(self.forums), forums_done=0, new_links=0)
+        
+        # Connexion unique, partagée par tous les forums (et entre deux scrapings)
+        login_scraper = self._scraper(self.forums[0])
+        if session_manager.is_authenticated('ebdz'):
+            print("✓ Session ebdz.net réutilisée")
+        elif login_scraper.login():
+            session_manager.mark_authenticated('ebdz')
+        else:
+            raise RuntimeError("Échec de connexion à ebdz.net - vérifiez les identifiants")
+        
+        # Tables créées une fois avant le lancement en parallèle
+        login_scraper.create_table()
+        login_scraper.create_thread_state_table()
+        
+        forums_data = []
+        
+        def scrape_forum(forum_cfg):
+            scraper = self._scraper(forum_cfg)
+            scraper.logged_in = True
+            scraper.tables_ready = True
+            print(f"\n📂 Scraping forum fid={forum_cfg['fid']} catégorie='{forum_cfg['category']}'...")
+            return scraper.run(max_pages=forum_cfg.get('max_pages'), full_rescan=full_rescan)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_parallel_forums) as executor:
+                futures = {executor.submit(scrape_forum, forum_cfg): forum_cfg for forum_cfg in self.forums}
+                for future in as_completed(futures):
+                    forum_cfg = futures[future]
+                    try:
+                        stats = future.result()
+                        stats['success'] = True
+                        print(f"    ✓ {stats['category']}: +{stats['new_links']} nouveaux liens "
+                              f"({stats['threads']} thread(s), {stats['errors']} erreur(s))")
+                    except Exception as e:
+                        # Un forum en erreur n'arrête pas les autres
+                        print(f"    ✗ {forum_cfg['category']}: {e}")
+                        stats = {'category': forum_cfg['category'], 'new_links': 0,
+                                 'success': False, 'error': str(e)}
+                    
+                    forums_data.append(stats)
+                    if job:
+                        job.increment('forums_done')
+                        job.increment('new_links', stats['new_links'])
+        finally:
+            # Attend les dernières couvertures et complète cover_image
+            self.covers.close()
+            # Cookies éventuellement renouvelés par le forum
+            session_manager.save('ebdz')
+        
+        forums_failed = sum(1 for f in forums_data if not f['success'])
+        new_links = sum(f['new_links'] for f in forums_data)
+        
+        print(f"✓ Scraping EBDZ terminé: {len(forums_data) - forums_failed} forum(s), "
+              f"{new_links} nouveau(x) lien(s), {self.fetcher.stats['requests']} requête(s)")
+        
+        return {
+            'forums_scraped': len(forums_data) - forums_failed,
+            'forums_failed': forums_failed,
+            'new_links': new_links,
+            'forums': forums_data
+        }
@@ -0,0 +1,403 @@
+"""
+Extraction ciblée des pages ebdz.net (liste du forum et page de thread)
+
+Seuls les éléments utiles sont lus : liens `showthread` et leur ligne du
+forum, couverture `li.couv`, description `p.indent` et pagination. Le moteur
+le plus rapide disponible est choisi automatiquement :
+
+- selectolax (lexbor, ou modest pour les anciennes versions ; optionnel)
+- lxml (optionnel)
+- BeautifulSoup + html.parser (toujours disponible, arbre restreint aux
+  éléments utiles pour les pages de thread)
+"""
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxHTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxHTMLParser
+    except ImportError:
+        SelectolaxHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+
+TID_RE = re.compile(r'tid=(\d+)')
+SHOWTHREAD_RE = re.compile(r'showthread\.php')
+LASTPOST_RE = re.compile(r'action=lastpost')
+WHOPOSTED_RE = re.compile(r'whoPosted')
+PID_RE = re.compile(r'pid=(\d+)')
+NON_DIGIT_RE = re.compile(r'\D')
+
+# Dates relatives affichées par MyBB dans la colonne "dernier message"
+RELATIVE_DAY_RE = re.compile(r"\b(aujourd['’]hui|today|hier|yesterday)\b", re.IGNORECASE)
+RELATIVE_AGO_RE = re.compile(
+    r"\b(?:il y a\s+(\d+)\s+(minute|heure)s?|(\d+)\s+(minute|hour)s?\s+ago)\b", re.IGNORECASE
+)
+
+# Comme BeautifulSoup, le contenu des scripts et styles n'est pas du texte
+NON_TEXT_TAGS = {'script', 'style'}
+TEXT_XPATH = './/text()[not(parent::script) and not(parent::style)]'
+
+# Classe CSS contenant un mot donné (équivalent XPath de `.classe`)
+_XPATH_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+
+
+def join_text(strings, separator=''):
+    """Concatène les fragments de texte non vides (comme get_text(strip=True))"""
+    return separator.join(s.strip() for s in strings if s and s.strip())
+
+
+def parse_reply_count(text):
+    """Nombre de réponses d'après le texte du lien whoPosted"""
+    digits = NON_DIGIT_RE.sub('', text or '')
+    return int(digits) if digits else None
+
+
+def parse_last_post_pid(hrefs):
+    """Identifiant (pid) du dernier message d'après les liens de sa colonne"""
+    for href in hrefs:
+        pid_match = PID_RE.search(href or '')
+        if pid_match:
+            return pid_match.group(1)
+    return None
+
+
+def last_post_key(last_post, pid=None, now=None):
+    """Clé stable du dernier message d'un thread (scraping différentiel)
+    
+    MyBB affiche des dates relatives ("Aujourd'hui, 10:21", "Hier, 10:21",
+    "Il y a 5 minutes") : le même message change de texte au changement de
+    jour. Le pid du message est utilisé s'il figure dans la liste, sinon les
+    dates relatives sont remplacées par des dates absolues.
+    """
+    if pid:
+        return f'pid:{pid}'
+    if not last_post:
+        return last_post
+    now = now or datetime.now()
+    
+    def resolve_ago(match):
+        amount = int(match.group(1) or match.group(3))
+        unit = (match.group(2) or match.group(4)).lower()
+        delta = timedelta(hours=amount) if unit in ('heure', 'hour') else timedelta(minutes=amount)
+        return (now - delta).strftime('%d-%m-%Y, %H:%M')
+    
+    def resolve_day(match):
+        days = 1 if match.group(1).lower() in ('hier', 'yesterday') else 0
+        return (now - timedelta(days=days)).strftime('%d-%m-%Y')
+    
+    return RELATIVE_DAY_RE.sub(resolve_day, RELATIVE_AGO_RE.sub(resolve_ago, last_post))
+
+
+class BaseParser(ABC):
+    """Interface commune des moteurs d'extraction (un moteur incomplet ne peut pas être instancié)"""
+    
+    name = None
+    
+    @abstractmethod
+    def parse_forum_page(self, html):
+        """Extrait les threads d'une page de la liste du forum
+        
+        Un même thread apparaît plusieurs fois (titre, pages, dernier
+        message) : seul le premier lien avec un titre est retenu.
+        
+        Returns:
+            Tuple (threads, pagination) : liste de dicts {thread_id,
+            thread_title, last_post, last_post_pid, reply_count} dans l'ordre
+            de la page et textes des liens `pagination_page`
+        """
+    
+    @abstractmethod
+    def parse_thread_page(self, html):
+        """Extrait la couverture et la description de la première page d'un thread
+        
+        Returns:
+            Dict {cover_url, description} (None si absent)
+        """
+
+
+class SoupParser(BaseParser):
+    """BeautifulSoup + html.parser (moteur de secours)"""
+    
+    name = 'html.parser'
+    
+    # Les pages de thread ne construisent que les sous-arbres li/p
+    THREAD_STRAINER = SoupStrainer(['li', 'p'])
+    
+    def parse_forum_page(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        threads = []
+        seen = set()
+        for link in soup.find_all('a', href=SHOWTHREAD_RE):
+            tid_match = TID_RE.search(link.get('href', ''))
+            if not tid_match:
+                continue
+            thread_id = tid_match.group(1)
+            thread_title = link.get_text(strip=True)
+            if thread_id in seen or not thread_title:
+                continue
+            seen.add(thread_id)
+            
+            last_post, last_post_pid, reply_count = self._parse_row(link)
+            threads.append({
+                'thread_id': thread_id,
+                'thread_title': thread_title,
+                'last_post': last_post,
+                'last_post_pid': last_post_pid,
+                'reply_count': reply_count
+            })
+        
+        pagination = [a.get_text() for a in soup.find_all('a', class_='pagination_page')]
+        return threads, pagination
+    
+    @staticmethod
+    def _parse_row(link):
+        row = link.find_parent('tr')
+        if not row:
+            return None, None, None
+        
+        last_post = last_post_pid = None
+        lastpost_tag = row.find(class_='lastpost')
+        if not lastpost_tag:
+            lastpost_link = row.find('a', href=LASTPOST_RE)
+            lastpost_tag = lastpost_link.parent if lastpost_link else None
+        if lastpost_tag:
+            last_post = lastpost_tag.get_text(' ', strip=True)
+            last_post_pid = parse_last_post_pid(a.get('href') for a in lastpost_tag.find_all('a'))
+        
+        reply_count = None
+        replies_link = row.find('a', href=WHOPOSTED_RE)
+        if replies_link:
+            reply_count = parse_reply_count(replies_link.get_text())
+        
+        return last_post, last_post_pid, reply_count
+    
+    def parse_thread_page(self, html):
+        soup = BeautifulSoup(html, 'html.parser', parse_only=self.THREAD_STRAINER)
+        
+        cover_url = None
+        couv_li = soup.find('li', class_='couv')
+        if couv_li:
+            img_tag = couv_li.find('img')
+            if img_tag and img_tag.get('src'):
+                cover_url = img_tag['src']
+        
+        description = None
+        desc_p = soup.find('p', class_='indent')
+        if desc_p:
+            description = desc_p.get_text(separator=' ', strip=True)
+        
+        return {'cover_url': cover_url, 'description': description}
+
+
+class LxmlParser(BaseParser):
+    """lxml : arbre construit en C, requêtes XPath ciblées"""
+    
+    name = 'lxml'
+    
+    THREAD_LINKS = "//a[contains(@href, 'showthread.php')]"
+    LASTPOST = ".//*[" + _XPATH_CLASS.format('lastpost') + "]"
+    LASTPOST_LINK = ".//a[contains(@href, 'action=lastpost')]"
+    WHOPOSTED_LINK = ".//a[contains(@href, 'whoPosted')]"
+    PAGINATION = "//a[" + _XPATH_CLASS.format('pagination_page') + "]"
+    COVER = "//li[" + _XPATH_CLASS.format('couv') + "]"
+    DESCRIPTION = "//p[" + _XPATH_CLASS.format('indent') + "]"
+    
+    # Texte déjà décodé : l'encodage est imposé (la balise meta est ignorée)
+    HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8') if lxml is not None else None
+    
+    @classmethod
+    def _document(cls, html):
+        return lxml.html.document_fromstring(html.encode('utf-8'), parser=cls.HTML_PARSER)
+    
+    @staticmethod
+    def _text(element, separator=''):
+        return join_text(element.xpath(TEXT_XPATH), separator)
+    
+    def parse_forum_page(self, html):
+        document = self._document(html)
+        
+        threads = []
+        seen = set()
+        for link in document.xpath(self.THREAD_LINKS):
+            tid_match = TID_RE.search(link.get('href', ''))
+            if not tid_match:
+                continue
+            thread_id = tid_match.group(1)
+            if thread_id in seen:
+                continue
+            thread_title = self._text(link)
+            if not thread_title:
+                continue
+            seen.add(thread_id)
+            
+            last_post, last_post_pid, reply_count = self._parse_row(link)
+            threads.append({
+                'thread_id': thread_id,
+                'thread_title': thread_title,
+                'last_post': last_post,
+                'last_post_pid': last_post_pid,
+                'reply_count': reply_count
+            })
+        
+        pagination = [''.join(a.itertext()) for a in document.xpath(self.PAGINATION)]
+        return threads, pagination
+    
+    def _parse_row(self, link):
+        row = next(link.iterancestors('tr'), None)
+        if row is None:
+            return None, None, None
+        
+        last_post = last_post_pid = None
+        lastpost_tags = row.xpath(self.LASTPOST)
+        if lastpost_tags:
+            lastpost_tag = lastpost_tags[0]
+        else:
+            lastpost_links = row.xpath(self.LASTPOST_LINK)
+            lastpost_tag = lastpost_links[0].getparent() if lastpost_links else None
+        if lastpost_tag is not None:
+            last_post = self._text(lastpost_tag, ' ')
+            last_post_pid = parse_last_post_pid(lastpost_tag.xpath('.//a/@href'))
+        
+        reply_count = None
+        replies_links = row.xpath(self.WHOPOSTED_LINK)
+        if replies_links:
+            reply_count = parse_reply_count(''.join(replies_links[0].itertext()))
+        
+        return last_post, last_post_pid, reply_count
+    
+    def parse_thread_page(self, html):
+        document = self._document(html)
+        
+        cover_url = None
+        couv_li = document.xpath(self.COVER)
+        if couv_li:
+            img_tags = couv_li[0].xpath('.//img')
+            if img_tags and img_tags[0].get('src'):
+                cover_url = img_tags[0].get('src')
+        
+        description = None
+        desc_p = document.xpath(self.DESCRIPTION)
+        if desc_p:
+            description = self._text(desc_p[0], ' ')
+        
+        return {'cover_url': cover_url, 'description': description}
+
+
+class SelectolaxParser(BaseParser):
+    """selectolax : parseur C le plus rapide, sélecteurs CSS"""
+    
+    name = 'selectolax'
+    
+    @staticmethod
+    def _text(node, separator=''):
+        return join_text(
+            (child.text_content for child in node.traverse(include_text=True)
+             if child.tag == '-text' and child.parent.tag not in NON_TEXT_TAGS),
+            separator
+        )
+    
+    def parse_forum_page(self, html):
+        tree = SelectolaxHTMLParser(html)
+        
+        threads = []
+        seen = set()
+        for link in tree.css('a[href*="showthread.php"]'):
+            tid_match = TID_RE.search(link.attributes.get('href') or '')
+            if not tid_match:
+                continue
+            thread_id = tid_match.group(1)
+            if thread_id in seen:
+                continue
+            thread_title = self._text(link)
+            if not thread_title:
+                continue
+            seen.add(thread_id)
+            
+            last_post, last_post_pid, reply_count = self._parse_row(link)
+            threads.append({
+                'thread_id': thread_id,
+                'thread_title': thread_title,
+                'last_post': last_post,
+                'last_post_pid': last_post_pid,
+                'reply_count': reply_count
+            })
+        
+        pagination = [a.text(deep=True) for a in tree.css('a.pagination_page')]
+        return threads, pagination
+    
+    def _parse_row(self, link):
+        row = link.parent
+        while row is not None and row.tag != 'tr':
+            row = row.parent
+        if row is None:
+            return None, None, None
+        
+        last_post = last_post_pid = None
+        lastpost_tag = row.css_first('.lastpost')
+        if lastpost_tag is None:
+            lastpost_link = row.css_first('a[href*="action=lastpost"]')
+            lastpost_tag = lastpost_link.parent if lastpost_link is not None else None
+        if lastpost_tag is not None:
+            last_post = self._text(lastpost_tag, ' ')
+            last_post_pid = parse_last_post_pid(a.attributes.get('href') for a in lastpost_tag.css('a'))
+        
+        reply_count = None
+        replies_link = row.css_first('a[href*="whoPosted"]')
+        if replies_link is not None:
+            reply_count = parse_reply_count(replies_link.text(deep=True))
+        
+        return last_post, last_post_pid, reply_count
+    
+    def parse_thread_page(self, html):
+        tree = SelectolaxHTMLParser(html)
+        
+        cover_url = None
+        couv_li = tree.css_first('li.couv')
+        if couv_li is not None:
+            img_tag = couv_li.css_first('img')
+            if img_tag is not None and img_tag.attributes.get('src'):
+                cover_url = img_tag.attributes['src']
+        
+        description = None
+        desc_p = tree.css_first('p.indent')
+        if desc_p is not None:
+            description = self._text(desc_p, ' ')
+        
+        return {'cover_url': cover_url, 'description': description}
+
+
+PARSERS = {
+    'selectolax': SelectolaxParser if SelectolaxHTMLParser is not None else None,
+    'lxml': LxmlParser if lxml is not None else None,
+    'html.parser': SoupParser,
+}
+
+
+def available_parsers():
+    """Noms des moteurs utilisables, du plus rapide au plus lent"""
+    return [name for name, parser in PARSERS.items() if parser is not None]
+
+
+def get_parser(name=None):
+    """Retourne le moteur demandé, ou le plus rapide disponible
+    
+    Args:
+        name: 'selectolax', 'lxml' ou 'html.parser' (None = automatique)
+    """
+    if name:
+        parser = PARSERS.get(name)
+        if parser is None:
+            raise ValueError(f"Moteur d'analyse HTML indisponible: {name}")
+        return parser()
+    return PARSERS[available_parsers()[0]]()
@@ -130,7 +130,10 @@ def ebdz_config():
         return jsonify({
             'username': config.get('username', ''),
             'password': '****' if config.get('password') else '',
-            'forums': config.get('forums', [])
+            'forums': config.get('forums', []),
+            'requests_per_second': config.get('requests_per_second', 1.0),
+            'max_concurrency': config.get('max_concurrency', 2),
+            'max_parallel_forums': config.get('max_parallel_forums', 2)
         })
     
     else:  # POST
@@ -158,6 +161,23 @@ def ebdz_config():
             
             config['forums'] = forums
             
+            # Débit du scraper (budget requêtes/seconde et concurrence)
+            if 'requests_per_second' in data:
+                requests_per_second = float(data['requests_per_second'])
+                if not 0 < requests_per_second <= 10:
+                    return jsonify({'success': False, 'error': 'requests_per_second doit être entre 0 et 10'}), 400
+                config['requests_per_second'] = requests_per_second
+            if 'max_concurrency' in data:
+                max_concurrency = int(data['max_concurrency'])
+                if not 1 <= max_concurrency <= 8:
+                    return jsonify({'success': False, 'error': 'max_concurrency doit être entre 1 et 8'}), 400
+                config['max_concurrency'] = max_concurrency
+            if 'max_parallel_forums' in data:
+                max_parallel_forums = int(data['max_parallel_forums'])
+                if not 1 <= max_parallel_forums <= 4:
+                    return jsonify({'success': False, 'error': 'max_parallel_forums doit être entre 1 et 4'}), 400
+                config['max_parallel_forums'] = max_parallel_forums
+            
             if save_ebdz_config(config):
                 return jsonify({'success': True})
             else:
@@ -170,7 +190,7 @@ def ebdz_config():
 @ebdz_bp.route('/scrape', methods=['POST'])
 @login_required
 def scrape():
-    """Lance le scraper ebdz.net"""
+    """Lance le scraper ebdz.net en tâche de fond (suivi via /api/jobs/<job_id>)"""
     
     try:
         config = load_ebdz_config()
@@ -195,44 +215,37 @@ def scrape():
         else:
             forums = all_forums
         
-        # Import dynamique du scraper
-        from .scraper import MyBBScraper
+        from background_jobs import job_manager
+        from scheduler_lease import lease_manager
+        from .orchestrator import ScrapeOrchestrator
+        from .scheduler import ebdz_scheduler
         
-        total_links = 0
-        forums_scraped = 0
+        if job_manager.is_running('ebdz_scrape'):
+            return jsonify({'success': False, 'error': 'Un scraping est déjà en cours'}), 409
         
-        for forum_cfg in forums:
-            fid = forum_cfg['fid']
-            category = forum_cfg['category']
-            max_pages = forum_cfg.get('max_pages')
-            
-            forum_url = f"https://ebdz.net/forum/forumdisplay.php?fid={fid}"
-            
-            print(f"\n� Scraping forum fid={fid} catégorie='{category}'...")
-            
-            scraper = MyBBScraper(
-                base_url=forum_url,
-                db_file=current_app.config['DB_FILE'],
-                username=username,
-                password=password,
-                forum_category=category
-            )
-            
-            scraper.run(max_pages=max_pages)
-            forums_scraped += 1
-            
-            # Compter les liens
-            conn = sqlite3.connect(current_app.config['DB_FILE'])
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM ed2k_links WHERE forum_category = ?', (category,))
-            total_links += cursor.fetchone()[0]
-            conn.close()
+        # Scraping automatique en cours sur n'importe quel worker (bail partagé)
+        lease = lease_manager.get(ebdz_scheduler.job_id)
+        if lease and lease['running']:
+            return jsonify({'success': False, 'error': 'Un scraping automatique est déjà en cours'}), 409
+        
+        full_rescan = data.get('full_rescan', False)
+        orchestrator = ScrapeOrchestrator.from_config(config, current_app.config['DB_FILE'], forums)
+        job_id = job_manager.submit(
+            'ebdz_scrape',
+            orchestrator.run,
+            full_rescan=full_rescan,
+            params={'fids': [f['fid'] for f in forums], 'full_rescan': full_rescan},
+            exclusive=True
+        )
+        if job_id is None:
+            # Lancé entre-temps par un autre worker
+            return jsonify({'success': False, 'error': 'Un scraping est déjà en cours'}), 409
         
         return jsonify({
             'success': True,
-            'forums_scraped': forums_scraped,
-            'total_links': total_links
-        })
+            'job_id': job_id,
+            'forums': len(forums)
+        }), 202
     
     except Exception as e:
         import traceback
@@ -240,6 +253,39 @@ def scrape():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@ebdz_bp.route('/catalog/backfill', methods=['POST'])
+@login_required
+def catalog_backfill():
+    """Analyse en tâche de fond les noms de fichiers ed2k sans métadonnées
+    
+    Body JSON optionnel : {"reparse": true} pour ré-analyser tout le catalogue
+    (après une évolution du parseur de noms de fichiers).
+    """
+    try:
+        from background_jobs import job_manager
+        from .catalog import backfill_metadata
+        
+        if job_manager.is_running('ebdz_metadata'):
+            return jsonify({'success': False, 'error': 'Une analyse est déjà en cours'}), 409
+        
+        db_file = current_app.config['DB_FILE']
+        data = request.get_json(silent=True) or {}
+        if data.get('reparse'):
+            conn = sqlite3.connect(db_file, timeout=30)
+            conn.execute("UPDATE ed2k_files SET metadata_version = NULL")
+            conn.commit()
+            conn.close()
+        
+        job_id = job_manager.submit('ebdz_metadata', backfill_metadata, db_file,
+                                    params={'reparse': bool(data.get('reparse'))}, exclusive=True)
+        if job_id is None:
+            return jsonify({'success': False, 'error': 'Une analyse est déjà en cours'}), 409
+        return jsonify({'success': True, 'job_id': job_id}), 202
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @ebdz_bp.route('/auto-scrape/config', methods=['GET', 'POST'])
 @login_required
 def auto_scrape_config():
@@ -299,6 +345,7 @@ def auto_scrape_status():
     """Récupérer le statut du scraping automatique"""
     try:
         from .scheduler import ebdz_scheduler
+        from scheduler_lease import lease_manager
         
         is_running = False
         next_run = None
@@ -312,7 +359,9 @@ def auto_scrape_status():
         return jsonify({
             'success': True,
             'is_running': is_running,
-            'next_run': next_run
+            'next_run': next_run,
+            # Passage en cours ou dernier passage, quel que soit le worker
+            'lease': lease_manager.get(ebdz_scheduler.job_id)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
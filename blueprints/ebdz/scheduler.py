@@ -6,6 +6,7 @@ from apscheduler.triggers.interval import IntervalTrigger
 import json
 import os
 from datetime import datetime
+from scheduler_lease import lease_manager
 
 
 class EBDZScheduler:
@@ -42,10 +43,12 @@ class EBDZScheduler:
         if self.scheduler.get_job(self.job_id):
             self.scheduler.remove_job(self.job_id)
         
-        # Ajouter la nouvelle tâche
+        # Ajouter la nouvelle tâche (exécutée par un seul worker, cf. scheduler_lease)
+        trigger = IntervalTrigger(**{interval_unit: interval_value})
         self.scheduler.add_job(
-            func=self._scrape_ebdz,
-            trigger=IntervalTrigger(**{interval_unit: interval_value}),
+            func=lease_manager.run_exclusive,
+            args=[self.job_id, self._scrape_ebdz, trigger.interval.total_seconds()],
+            trigger=trigger,
             id=self.job_id,
             name='EBDZ Auto Scrape',
             replace_existing=True
@@ -71,10 +74,15 @@ class EBDZScheduler:
                 
                 # Import local pour éviter les boucles circulaires
                 from . import routes
-                from .scraper import MyBBScraper
-                import sqlite3
+                from .orchestrator import ScrapeOrchestrator
                 from flask import current_app
-                from encryption import decrypt
+                from background_jobs import job_manager
+                
+                # Un scraping manuel est déjà en cours, sur ce worker ou un autre
+                # (table background_jobs partagée) : on attend le prochain passage
+                if job_manager.is_running('ebdz_scrape'):
+                    print("⚠️ Scraping EBDZ déjà en cours, passage ignoré")
+                    return
                 
                 # Charger la configuration EBDZ
                 config = routes.load_ebdz_config()
@@ -86,75 +94,15 @@ class EBDZScheduler:
                     print("⚠️ Configuration EBDZ incomplète, scraping annulé")
                     return
                 
-                # Compter les liens AVANT le scraping
-                links_before = {}
-                try:
-                    conn = sqlite3.connect(current_app.config['DB_FILE'])
-                    cursor = conn.cursor()
-                    for forum_cfg in all_forums:
-                        category = forum_cfg['category']
-                        cursor.execute('SELECT COUNT(*) FROM ed2k_links WHERE forum_category = ?', (category,))
-                        count = cursor.fetchone()[0]
-                        links_before[category] = count
-                    conn.close()
-                except Exception as e:
-                    print(f"Erreur lors du comptage initial des liens: {e}")
-                    links_before = {f['category']: 0 for f in all_forums}
-                
-                total_links = 0
-                forums_scraped = 0
-                forums_data = []  # Pour l'historique
-                
-                for forum_cfg in all_forums:
-                    fid = forum_cfg['fid']
-                    category = forum_cfg['category']
-                    max_pages = forum_cfg.get('max_pages')
-                    
-                    forum_url = f"https://ebdz.net/forum/forumdisplay.php?fid={fid}"
-                    
-                    print(f"  → Forum fid={fid} catégorie='{category}'...")
-                    
-                    scraper = MyBBScraper(
-                        base_url=forum_url,
-                        db_file=current_app.config['DB_FILE'],
-                        username=username,
-                        password=password,
-                        forum_category=category
-                    )
-                    
-                    scraper.run(max_pages=max_pages)
-                    forums_scraped += 1
-                    
-                    # Compter les liens APRÈS le scraping et calculer les nouveaux
-                    try:
-                        conn = sqlite3.connect(current_app.config['DB_FILE'])
-                        cursor = conn.cursor()
-                        cursor.execute('SELECT COUNT(*) FROM ed2k_links WHERE forum_category = ?', (category,))
-                        count_after = cursor.fetchone()[0]
-                        total_links += count_after
-                        
-                        # Calculer les nouveaux liens
-                        count_before = links_before.get(category, 0)
-                        new_links = max(0, count_after - count_before)
-                        
-                        forums_data.append({
-                            'category': category,
-                            'new_links': new_links,
-                            'total_links': count_after
-                        })
-                        
-                        print(f"    ✓ {category}: +{new_links} nouveaux liens ({count_after} au total)")
-                        
-                        conn.close()
-                    except Exception as e:
-                        print(f"    Erreur lors du comptage des liens: {e}")
-                        forums_data.append({
-                            'category': category,
-                            'new_links': 0,
-                            'total_links': 0
-                        })
+                # Tous les forums en parallèle avec une seule connexion
+                orchestrator = ScrapeOrchestrator.from_config(config, current_app.config['DB_FILE'])
+                summary = orchestrator.run()
                 
-                print(f"✓ Scraping EBDZ terminé: {forums_scraped} forum(s), {total_links} lien(s)")
+                # Nouveaux liens comptés par le scraper (pas de COUNT avant/après)
+                forums_data = [
+                    {'category': f['category'], 'new_links': f['new_links']}
+                    for f in summary['forums']
+                ]
                 
                 # Enregistrer dans l'historique
                 if forums_data:
@@ -3,30 +3,55 @@ from bs4 import BeautifulSoup
 import re
 import sqlite3
 from urllib.parse import urljoin
-import time
 import os
+import sys
 import hashlib
+from .covers import CoverDownloader
+from .catalog import init_catalog, save_links
+from .fetcher import PoliteFetcher
+from .parsing import get_parser, last_post_key
 
 class MyBBScraper:
-    def __init__(self, base_url, db_file, username, password, forum_category=""):
+    def __init__(self, base_url, db_file, username, password, forum_category="",
+                 requests_per_second=1.0, max_concurrency=2, html_parser=None,
+                 session=None, fetcher=None, covers=None):
+        """
+        Args:
+            session, fetcher, covers: Session connectée, moteur de requêtes et
+                file de couvertures partagés entre plusieurs forums
+                (ScrapeOrchestrator). Créés pour ce scraper si absents.
+        """
         self.base_url = base_url
         self.db_file = db_file
         self.username = username
         self.password = password
         self.forum_category = forum_category
-        self.session = requests.Session()
+        self.session = session or requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
         self.logged_in = False
+        # Tables déjà créées par l'appelant (ScrapeOrchestrator, avant les forums en parallèle)
+        self.tables_ready = False
         
-        # Créer les répertoires nécessaires
-        os.makedirs('./data/covers', exist_ok=True)
+        # Requêtes limitées en débit par hôte, avec backoff sur 429/5xx
+        self.fetcher = fetcher or PoliteFetcher(
+            self.session,
+            requests_per_second=requests_per_second,
+            max_concurrency=max_concurrency
+        )
+        
+        # Extraction ciblée avec le moteur HTML le plus rapide disponible
+        self.parser = get_parser(html_parser)
+        
+        # Couvertures téléchargées hors de la boucle de scraping
+        self._owns_covers = covers is None
+        self.covers = covers or CoverDownloader(self.fetcher, db_file)
         
     def connect_db(self):
         """Connexion à la base SQLite"""
         try:
-            connection = sqlite3.connect(self.db_file)
+            connection = sqlite3.connect(self.db_file, timeout=30)
             return connection
         except Exception as e:
             print(f"Erreur de connexion SQLite: {e}")
@@ -81,7 +106,11 @@ class MyBBScraper:
             return False
     
     def extract_volume_number(self, filename):
-        """Extrait le numéro de volume depuis le nom de fichier"""
+        """Extrait le numéro de volume depuis le nom de fichier
+        
+        Repli de parse_file_metadata (parseur partagé de la bibliothèque)
+        pour les noms qu'il ne reconnaît pas (tough11, Tough_34.rar...).
+        """
         if not filename:
             return None
         
@@ -136,28 +165,10 @@ class MyBBScraper:
         return None
     
     def create_table(self):
-        """Crée la table pour stocker les liens ed2k avec colonne volume"""
+        """Crée (ou migre) le catalogue des liens ed2k"""
         connection = self.connect_db()
         if connection:
-            cursor = connection.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ed2k_links (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    link TEXT NOT NULL UNIQUE,
-                    filename TEXT,
-                    filesize TEXT,
-                    volume INTEGER,
-                    thread_title TEXT,
-                    thread_url TEXT,
-                    thread_id TEXT,
-                    forum_category TEXT,
-                    cover_image TEXT,
-                    description TEXT,
-                    date_scraped TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            connection.commit()
-            cursor.close()
+            init_catalog(connection)
             connection.close()
             print("✓ Table créée/vérifiée dans ebdz.db")
     
@@ -174,11 +185,214 @@ class MyBBScraper:
         filesize = parts[3] if len(parts) > 3 else None
         return filename, filesize
     
-    def get_thread_links(self, forum_url, max_pages=None):
-        """Récupère tous les liens de threads du forum"""
+    def create_thread_state_table(self):
+        """Crée la table d'état des threads (scraping différentiel)"""
+        connection = self.connect_db()
+        if connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ebdz_thread_state (
+                    thread_id TEXT PRIMARY KEY,
+                    thread_url TEXT,
+                    forum_category TEXT,
+                    last_post TEXT,  -- clé stable (pid ou date absolue, voir last_post_key)
+                    reply_count INTEGER,
+                    content_hash TEXT,
+                    links_count INTEGER DEFAULT 0,
+                    last_scraped TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Point de reprise du dernier scraping de chaque catégorie
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ebdz_scrape_checkpoint (
+                    forum_category TEXT PRIMARY KEY,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    full_rescan INTEGER DEFAULT 0,
+                    status TEXT,
+                    threads_done INTEGER DEFAULT 0,
+                    links_saved INTEGER DEFAULT 0
+                )
+            """)
+            connection.commit()
+            cursor.close()
+            connection.close()
+    
+    def load_thread_state(self):
+        """Charge l'état connu des threads de cette catégorie
+        
+        Returns:
+            Dict {thread_id: {'last_post', 'reply_count', 'content_hash'}}
+        """
+        connection = self.connect_db()
+        if not connection:
+            return {}
+        
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT thread_id, last_post, reply_count, content_hash
+            FROM ebdz_thread_state
+            WHERE forum_category = ?
+        """, (self.forum_category,))
+        state = {
+            row[0]: {'last_post': row[1], 'reply_count': row[2], 'content_hash': row[3]}
+            for row in cursor.fetchall()
+        }
+        cursor.close()
+        connection.close()
+        return state
+    
+    def save_thread_state(self, thread_states, connection=None):
+        """Enregistre l'état des threads scrapés (après la sauvegarde des liens)
+        
+        Args:
+            thread_states: Liste de dicts d'état par thread
+            connection: Connexion existante (transaction gérée par l'appelant)
+        """
+        if not thread_states:
+            return
+        
+        own_connection = connection is None
+        if own_connection:
+            connection = self.connect_db()
+            if not connection:
+                return
+        
+        connection.executemany("""
+            INSERT INTO ebdz_thread_state
+                (thread_id, thread_url, forum_category, last_post, reply_count, content_hash, links_count, last_scraped)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(thread_id) DO UPDATE SET
+                thread_url = excluded.thread_url,
+                forum_category = excluded.forum_category,
+                last_post = excluded.last_post,
+                reply_count = excluded.reply_count,
+                content_hash = excluded.content_hash,
+                links_count = excluded.links_count,
+                last_scraped = CURRENT_TIMESTAMP
+        """, [
+            (s['thread_id'], s['thread_url'], self.forum_category, s['last_post'],
+             s['reply_count'], s['content_hash'], s['links_count'])
+            for s in thread_states
+        ])
+        
+        if own_connection:
+            connection.commit()
+            connection.close()
+    
+    def start_checkpoint(self, full_rescan=False):
+        """Démarre ou reprend un scraping de la catégorie
+        
+        Si le scraping précédent ne s'est pas terminé, il est repris : les
+        threads déjà enregistrés depuis son démarrage sont ignorés.
+        
+        Returns:
+            Ensemble des thread_id déjà traités par le scraping repris
+        """
+        connection = self.connect_db()
+        if not connection:
+            return set()
+        
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT started_at, full_rescan FROM ebdz_scrape_checkpoint
+            WHERE forum_category = ? AND status = 'running'
+        """, (self.forum_category,))
+        running = cursor.fetchone()
+        
+        done = set()
+        if running and bool(running[1]) == bool(full_rescan):
+            cursor.execute("""
+                SELECT thread_id FROM ebdz_thread_state
+                WHERE forum_category = ? AND last_scraped >= ?
+            """, (self.forum_category, running[0]))
+            done = {row[0] for row in cursor.fetchall()}
+            print(f"↻ Reprise du scraping interrompu du {running[0]} ({len(done)} thread(s) déjà traités)")
+        else:
+            cursor.execute("""
+                INSERT OR REPLACE INTO ebdz_scrape_checkpoint
+                    (forum_category, started_at, full_rescan, status, threads_done, links_saved)
+                VALUES (?, CURRENT_TIMESTAMP, ?, 'running', 0, 0)
+            """, (self.forum_category, 1 if full_rescan else 0))
+            connection.commit()
+        
+        cursor.close()
+        connection.close()
+        return done
+    
+    def finish_checkpoint(self):
+        """Marque le scraping de la catégorie comme terminé"""
+        connection = self.connect_db()
+        if not connection:
+            return
+        connection.execute("""
+            UPDATE ebdz_scrape_checkpoint
+            SET status = 'completed', finished_at = CURRENT_TIMESTAMP
+            WHERE forum_category = ?
+        """, (self.forum_category,))
+        connection.commit()
+        connection.close()
+    
+    def flush_batch(self, ed2k_data, thread_states):
+        """Enregistre un lot de threads terminés en une seule transaction
+        
+        Les liens et l'état des threads sont commités ensemble : un thread
+        marqué comme traité a toujours ses liens en base (point de reprise).
+        
+        Returns:
+            Nombre de nouveaux liens insérés
+        """
+        connection = self.connect_db()
+        if not connection:
+            return 0
+        
+        try:
+            with connection:
+                saved = self.save_to_db(ed2k_data, connection=connection)
+                self.save_thread_state(thread_states, connection=connection)
+                connection.execute("""
+                    UPDATE ebdz_scrape_checkpoint
+                    SET threads_done = threads_done + ?, links_saved = links_saved + ?
+                    WHERE forum_category = ?
+                """, (len(thread_states), saved, self.forum_category))
+        finally:
+            connection.close()
+        
+        return saved
+    
+    def thread_has_changed(self, thread, known_state):
+        """Indique si un thread doit être re-scrapé d'après la liste du forum"""
+        state = known_state.get(thread['thread_id'])
+        if not state:
+            return True
+        
+        # Sans information exploitable dans la liste, on ne peut pas conclure
+        if thread['last_post_key'] is None and thread['reply_count'] is None:
+            return True
+        
+        return (thread['last_post_key'] != state['last_post']
+                or thread['reply_count'] != state['reply_count'])
+    
+    def get_thread_links(self, forum_url, max_pages=None, known_state=None):
+        """Récupère les liens de threads du forum
+        
+        Args:
+            forum_url: URL de la liste du forum
+            max_pages: Nombre maximum de pages lues
+            known_state: État connu des threads (load_thread_state). Si fourni,
+                         seuls les threads nouveaux ou modifiés sont retournés
+                         et la lecture s'arrête à la première page sans
+                         aucun changement (liste triée par dernier message).
+        
+        Returns:
+            Liste de dicts {thread_url, thread_title, thread_id, last_post,
+            last_post_pid, last_post_key, reply_count}
+        """
         thread_links = []
-        seen_urls = set()
+        seen_tids = set()
         page = 1
+        skipped = 0
+        base_url = forum_url.split('forumdisplay.php')[0]
         
         try:
             while True:
@@ -193,54 +407,51 @@ class MyBBScraper:
                         page_url = f"{forum_url}?page={page}"
                 
                 print(f"  Lecture page {page} du forum...")
-                response = self.session.get(page_url)
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Trouve TOUS les liens qui contiennent showthread
-                all_thread_links = soup.find_all('a', href=re.compile(r'showthread\.php'))
+                response = self.fetcher.get(page_url)
+                page_threads, pagination = self.parser.parse_forum_page(response.text)
                 
-                # Trouve les liens de threads myBB dans cette page
-                page_threads = []
-                for link in all_thread_links:
-                    href = link.get('href', '')
-                    if 'tid=' in href:
-                        thread_url = urljoin(forum_url.split('forumdisplay.php')[0], href)
-                        # Nettoie l'URL (enlève les ancres et paramètres inutiles)
-                        thread_url = thread_url.split('#')[0].split('&page=')[0]
-                        thread_title = link.get_text(strip=True)
-                        
-                        if thread_url not in seen_urls and thread_title:
-                            seen_urls.add(thread_url)
-                            page_threads.append((thread_url, thread_title))
+                # Un même thread peut réapparaître d'une page à l'autre : URL normalisée par tid
+                page_threads = [t for t in page_threads if t['thread_id'] not in seen_tids]
+                for thread in page_threads:
+                    seen_tids.add(thread['thread_id'])
+                    thread['thread_url'] = urljoin(base_url, f"showthread.php?tid={thread['thread_id']}")
+                    # Clé comparée et enregistrée à la place du texte (dates relatives)
+                    thread['last_post_key'] = last_post_key(thread['last_post'], thread.get('last_post_pid'))
                 
                 if not page_threads:
                     break
                 
-                print(f"  → {len(page_threads)} threads trouvés sur cette page")
-                thread_links.extend(page_threads)
+                if known_state is not None:
+                    changed = [t for t in page_threads if self.thread_has_changed(t, known_state)]
+                    skipped += len(page_threads) - len(changed)
+                    print(f"  → {len(page_threads)} threads sur cette page, {len(changed)} nouveaux/modifiés")
+                    thread_links.extend(changed)
+                    
+                    # Les pages suivantes ne contiennent que des threads plus anciens
+                    if not changed:
+                        print("  → Page sans changement, arrêt de la lecture du forum")
+                        break
+                else:
+                    print(f"  → {len(page_threads)} threads trouvés sur cette page")
+                    thread_links.extend(page_threads)
                 
                 # Limite de pages pour les tests
                 if max_pages and page >= max_pages:
                     print(f"  Limite de {max_pages} page(s) atteinte")
                     break
                 
-                # Vérifie s'il y a une page suivante - cherche plusieurs patterns
-                pagination = soup.find_all('a', class_='pagination_page')
-                
-                # Cherche le lien "next" ou le numéro de page suivant
-                has_next = False
-                for link in pagination:
-                    if str(page + 1) in link.get_text():
-                        has_next = True
-                        break
+                # Cherche le numéro de page suivant dans la pagination
+                has_next = any(str(page + 1) in label for label in pagination)
                 
                 if not has_next:
                     break
                 
                 page += 1
-                time.sleep(0.5)  # Petite pause entre les pages
             
-            print(f"✓ {len(thread_links)} threads trouvés au total")
+            if known_state is not None:
+                print(f"✓ {len(thread_links)} threads à scraper ({skipped} inchangés ignorés)")
+            else:
+                print(f"✓ {len(thread_links)} threads trouvés au total")
         except Exception as e:
             print(f"Erreur lors du scraping du forum: {e}")
             import traceback
@@ -248,39 +459,13 @@ class MyBBScraper:
         
         return thread_links
     
-    def download_cover(self, image_url):
-        """Télécharge une couverture et retourne le chemin local"""
-        if not image_url:
-            return None
+    def scrape_thread(self, thread_url, thread_title, raise_errors=False):
+        """Scrappe la première page d'un thread pour extraire les liens ed2k
         
-        try:
-            # Génère un nom de fichier unique basé sur l'URL
-            url_hash = hashlib.md5(image_url.encode()).hexdigest()
-            ext = os.path.splitext(image_url)[1] or '.jpg'
-            filename = f"{url_hash}{ext}"
-            filepath = os.path.join('./data/covers', filename)
-            
-            # Télécharge seulement si pas déjà présent
-            if not os.path.exists(filepath):
-                print(f"    Téléchargement de la couverture...")
-                response = self.session.get(image_url, timeout=10)
-                if response.status_code == 200:
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-                    print(f"    ✓ Couverture sauvegardée: {filename}")
-                    return f"covers/{filename}"
-                else:
-                    print(f"    ✗ Échec du téléchargement: HTTP {response.status_code}")
-                    return None
-            else:
-                print(f"    ✓ Couverture existe déjà: {filename}")
-                return f"covers/{filename}"
-        except Exception as e:
-            print(f"    ✗ Erreur téléchargement couverture: {e}")
-            return None
-    
-    def scrape_thread(self, thread_url, thread_title):
-        """Scrappe la première page d'un thread pour extraire les liens ed2k"""
+        Args:
+            raise_errors: Propager les erreurs au lieu de retourner une liste
+                          vide (pour ne pas marquer le thread comme scrapé)
+        """
         ed2k_data = []
         try:
             # Assure qu'on est sur la première page (pas de paramètre &page=)
@@ -293,26 +478,21 @@ class MyBBScraper:
             if tid_match:
                 thread_id = tid_match.group(1)
             
-            response = self.session.get(thread_url)
+            response = self.fetcher.get(thread_url)
+            response.raise_for_status()
             html = response.text
-            soup = BeautifulSoup(response.content, 'html.parser')
+            page_info = self.parser.parse_thread_page(html)
             
-            # Récupère la couverture
+            # Couverture téléchargée en arrière-plan (cover_image renseigné à la fin)
             cover_image = None
-            couv_li = soup.find('li', class_='couv')
-            if couv_li:
-                img_tag = couv_li.find('img')
-                if img_tag and img_tag.get('src'):
-                    cover_url = img_tag['src']
-                    print(f"  → Couverture trouvée: {cover_url[:60]}...")
-                    cover_image = self.download_cover(cover_url)
+            if page_info['cover_url']:
+                cover_url = page_info['cover_url']
+                print(f"  → Couverture trouvée: {cover_url[:60]}...")
+                cover_image = self.covers.submit(thread_id, cover_url)
             
             # Récupère la description
-            description = None
-            desc_p = soup.find('p', class_='indent')
-            if desc_p:
-                # Nettoie la description (enlève les balises <br />)
-                description = desc_p.get_text(separator=' ', strip=True)
+            description = page_info['description']
+            if description:
                 print(f"  → Description trouvée ({len(description)} caractères)")
             
             links = self.extract_ed2k_links(html)
@@ -342,49 +522,85 @@ class MyBBScraper:
                 
         except Exception as e:
             print(f"Erreur lors du scraping du thread: {e}")
+            if raise_errors:
+                raise
         
         return ed2k_data
     
-    def save_to_db(self, ed2k_data):
-        """Sauvegarde les liens ed2k dans SQLite"""
-        connection = self.connect_db()
-        if not connection:
-            return
+    def save_to_db(self, ed2k_data, connection=None):
+        """Sauvegarde les liens ed2k dans le catalogue (doublons ignorés)
         
-        cursor = connection.cursor()
-        saved = 0
-        duplicates = 0
-        
-        for data in ed2k_data:
-            try:
-                cursor.execute("""
-                    INSERT INTO ed2k_links (link, filename, filesize, volume, thread_title, thread_url, thread_id, forum_category, cover_image, description)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (data['link'], data['filename'], data['filesize'], data['volume'],
-                      data['thread_title'], data['thread_url'], data['thread_id'], 
-                      data['forum_category'], data['cover_image'], data['description']))
-                saved += 1
-            except sqlite3.IntegrityError:
-                duplicates += 1
+        Un même fichier (hash + taille) posté dans plusieurs threads ou
+        forums n'est stocké qu'une fois ; seul le postage est ajouté.
         
-        connection.commit()
-        cursor.close()
-        connection.close()
+        Args:
+            ed2k_data: Liste de liens parsés
+            connection: Connexion existante (transaction gérée par l'appelant)
+        
+        Returns:
+            Nombre de nouveaux postages (fichier × thread) sauvegardés
+        """
+        if not ed2k_data:
+            return 0
+        
+        own_connection = connection is None
+        if own_connection:
+            connection = self.connect_db()
+            if not connection:
+                return 0
+        
+        saved = save_links(connection, ed2k_data)
         
-        print(f"✓ {saved} nouveaux liens sauvegardés, {duplicates} doublons ignorés")
+        if own_connection:
+            connection.commit()
+            connection.close()
+            print(f"✓ {saved} nouveaux liens sauvegardés, {len(ed2k_data) - saved} doublons ignorés")
+        
+        return saved
+    
+    @staticmethod
+    def compute_content_hash(ed2k_data):
+        """Hash du contenu utile d'un thread (liens, couverture, description)"""
+        digest = hashlib.sha1()
+        for link in sorted(d['link'] for d in ed2k_data):
+            digest.update(link.encode('utf-8', 'replace'))
+        if ed2k_data:
+            digest.update((ed2k_data[0]['cover_image'] or '').encode('utf-8', 'replace'))
+            digest.update((ed2k_data[0]['description'] or '').encode('utf-8', 'replace'))
+        return digest.hexdigest()
     
-    def run(self, max_pages=None):
-        """Lance le scraping complet"""
+    def run(self, max_pages=None, full_rescan=False, batch_size=25):
+        """Lance le scraping
+        
+        Les threads terminés sont enregistrés par lots au fil de l'eau : un
+        scraping interrompu reprend au dernier lot commité.
+        
+        Args:
+            max_pages: Nombre maximum de pages du forum à lire
+            full_rescan: Ignorer l'état des threads et tout re-scraper
+            batch_size: Nombre de threads par transaction
+        
+        Returns:
+            Compteurs du scraping {category, threads, links_found, new_links,
+            unchanged, errors}, None si la connexion a échoué
+        """
         print("=== Démarrage du scraper myBB ===\n")
         
-        # Connexion au forum
-        print("Connexion au forum...")
-        if not self.login():
-            print("Impossible de continuer sans connexion.")
-            return
+        # Connexion au forum (déjà faite si la session est partagée)
+        if not self.logged_in:
+            print("Connexion au forum...")
+            if not self.login():
+                print("Impossible de continuer sans connexion.")
+                return None
         
-        # Crée la table
-        self.create_table()
+        # Crée les tables
+        if not self.tables_ready:
+            self.create_table()
+            self.create_thread_state_table()
+        
+        # État des threads pour le scraping différentiel
+        known_state = None if full_rescan else self.load_thread_state()
+        already_done = self.start_checkpoint(full_rescan)
         
         # Récupère les threads
         if max_pages:
@@ -392,26 +608,86 @@ class MyBBScraper:
         else:
             print(f"\nScraping du forum: {self.base_url}")
         
-        thread_links = self.get_thread_links(self.base_url, max_pages)
+        thread_links = self.get_thread_links(self.base_url, max_pages, known_state)
+        if already_done:
+            thread_links = [t for t in thread_links if t['thread_id'] not in already_done]
         
         # Scrappe chaque thread
         print(f"\nScraping des threads...\n")
-        all_ed2k_data = []
-        
-        for i, (thread_url, thread_title) in enumerate(thread_links, 1):
-            print(f"[{i}/{len(thread_links)}] {thread_title[:60]}...")
-            ed2k_data = self.scrape_thread(thread_url, thread_title)
-            all_ed2k_data.extend(ed2k_data)
-            time.sleep(1)  # Politesse envers le serveur
-        
-        # Sauvegarde dans la base
-        if all_ed2k_data:
-            print(f"\n=== Sauvegarde de {len(all_ed2k_data)} liens ===")
-            self.save_to_db(all_ed2k_data)
+        pending_links = []
+        pending_states = []
+        links_found = 0
+        links_saved = 0
+        unchanged = 0
+        errors = 0
+        
+        # Threads récupérés en parallèle, dans le budget de requêtes/seconde
+        results = self.fetcher.map(
+            lambda thread: self.scrape_thread(thread['thread_url'], thread['thread_title'], raise_errors=True),
+            thread_links
+        )
+        
+        for i, (thread, ed2k_data, error) in enumerate(results, 1):
+            print(f"[{i}/{len(thread_links)}] {thread['thread_title'][:60]}")
+            if error is not None:
+                print(f"  ✗ Erreur: {error}")
+                errors += 1
+                continue
+            
+            content_hash = self.compute_content_hash(ed2k_data)
+            previous = (known_state or {}).get(thread['thread_id'])
+            if previous and previous['content_hash'] == content_hash:
+                # Nouveau message sans nouveau lien : rien à sauvegarder
+                unchanged += 1
+            else:
+                pending_links.extend(ed2k_data)
+                links_found += len(ed2k_data)
+            
+            pending_states.append({
+                'thread_id': thread['thread_id'],
+                'thread_url': thread['thread_url'],
+                'last_post': thread['last_post_key'],
+                'reply_count': thread['reply_count'],
+                'content_hash': content_hash,
+                'links_count': len(ed2k_data)
+            })
+            
+            if len(pending_states) >= batch_size:
+                links_saved += self.flush_batch(pending_links, pending_states)
+                pending_links = []
+                pending_states = []
+        
+        if pending_states:
+            links_saved += self.flush_batch(pending_links, pending_states)
+        
+        # Attend les dernières couvertures et complète cover_image
+        if self._owns_covers:
+            self.covers.close()
+        
+        self.finish_checkpoint()
+        
+        stats = self.fetcher.stats
+        print(f"\n{stats['requests']} requête(s), {stats['retries']} nouvel(s) essai(s), "
+              f"{stats['throttled']} réponse(s) 429/5xx")
+        
+        if unchanged:
+            print(f"\n{unchanged} thread(s) modifié(s) sans nouveau contenu")
+        
+        if links_found:
+            print(f"\n✓ {links_saved} nouveaux liens sauvegardés, {links_found - links_saved} doublons ignorés")
         else:
-            print("\nAucun lien ed2k trouvé.")
+            print("\nAucun nouveau lien ed2k trouvé.")
         
         print("\n=== Scraping terminé ===")
+        
+        return {
+            'category': self.forum_category,
+            'threads': len(thread_links),
+            'links_found': links_found,
+            'new_links': links_saved,
+            'unchanged': unchanged,
+            'errors': errors
+        }
 
 
 def load_config_from_json(config_path):
@@ -507,7 +783,8 @@ if __name__ == "__main__":
             forum_config['category']
         )
 
-        scraper.run(max_pages=forum_config['max_pages'])
+        # --full : ignorer l'état des threads et tout re-scraper
+        scraper.run(max_pages=forum_config['max_pages'], full_rescan='--full' in sys.argv)
 
         print("\n" + "-" * 60)
 
@@ -96,10 +96,42 @@ def emule_config():
             return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def add_ed2k_links(config, links):
+    """Ajoute plusieurs liens ED2K dans une seule session amulecmd
+    
+    Les commandes `add` sont envoyées sur l'entrée standard d'un unique
+    processus (une connexion EC) au lieu d'un processus par lien.
+    
+    Returns:
+        Tuple (succès, message d'erreur)
+    """
+    if len(links) == 1:
+        # Un seul lien : mode commande directe
+        commands = ['-c', f'add {links[0]}']
+        stdin = None
+    else:
+        commands = []
+        stdin = ''.join(f'add {link}\n' for link in links) + 'quit\n'
+    
+    cmd = [
+        'amulecmd',
+        '-h', config['host'],
+        '-P', config.get('password_decrypted', ''),
+        '-p', str(config['ec_port'])
+    ] + commands
+    
+    result = subprocess.run(cmd, input=stdin, capture_output=True, text=True,
+                            timeout=10 + 2 * len(links))
+    
+    if result.returncode == 0:
+        return True, ''
+    return False, result.stderr
+
+
 @emule_bp.route('/add', methods=['POST'])
 @login_required
 def add_to_emule():
-    """Ajoute un lien ED2K à eMule"""
+    """Ajoute un ou plusieurs liens ED2K à eMule (`link` ou `links`)"""
     
     config = load_emule_config()
     
@@ -107,26 +139,18 @@ def add_to_emule():
         return jsonify({'success': False, 'error': 'aMule non activé'}), 400
     
     data = request.get_json()
-    link = data.get('link')
+    links = data.get('links') or ([data['link']] if data.get('link') else [])
     
-    if not link:
+    if not links:
         return jsonify({'success': False, 'error': 'Lien manquant'}), 400
     
     try:
-        cmd = [
-            'amulecmd',
-            '-h', config['host'],
-            '-P', config.get('password_decrypted', ''),
-            '-p', str(config['ec_port']),
-            '-c', f'add {link}'
-        ]
+        success, error = add_ed2k_links(config, links)
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        
-        if result.returncode == 0:
+        if success:
             return jsonify({'success': True})
         else:
-            return jsonify({'success': False, 'error': result.stderr}), 500
+            return jsonify({'success': False, 'error': error}), 500
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
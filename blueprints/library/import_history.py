@@ -48,6 +48,22 @@ def init_import_history_table():
             )
         ''')
         
+        # Colonne indiquant qu'une opération a été compactée (fichiers supprimés)
+        cursor.execute("PRAGMA table_info(import_history)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        if 'compacted' not in existing_columns:
+            cursor.execute("ALTER TABLE import_history ADD COLUMN compacted INTEGER DEFAULT 0")
+        
+        # Index pour la pagination, la rétention et le détail d'une opération
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_import_history_created_at
+            ON import_history (created_at)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_import_history_files_operation
+            ON import_history_files (operation_id)
+        ''')
+        
         conn.commit()
         conn.close()
         return True
@@ -143,19 +159,36 @@ def update_import_operation(operation_id, status, imported_count, replaced_count
                 pass
 
 
-def get_import_history(limit=50):
-    """Récupère l'historique des imports"""
+def get_import_history(limit=50, before_id=None):
+    """Récupère l'historique des imports (pagination par curseur)
+    
+    Args:
+        limit: Nombre maximum d'opérations retournées
+        before_id: Retourner uniquement les opérations plus anciennes que cet id
+    
+    Returns:
+        Liste des opérations, de la plus récente à la plus ancienne
+    """
     conn = None
     try:
         conn = sqlite3.connect(current_app.config['DATABASE'], timeout=120.0, check_same_thread=False)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT * FROM import_history 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (limit,))
+        # L'id est croissant avec la date : pas d'OFFSET, on repart du dernier id vu
+        if before_id:
+            cursor.execute('''
+                SELECT * FROM import_history 
+                WHERE id < ?
+                ORDER BY id DESC 
+                LIMIT ?
+            ''', (before_id, limit))
+        else:
+            cursor.execute('''
+                SELECT * FROM import_history 
+                ORDER BY id DESC 
+                LIMIT ?
+            ''', (limit,))
         
         history = [dict(row) for row in cursor.fetchall()]
         return history
@@ -170,6 +203,94 @@ def get_import_history(limit=50):
                 pass
 
 
+def compact_import_history(retention_days=90, vacuum_pages=2000):
+    """Compacte les opérations plus anciennes que la période de rétention
+    
+    Le détail fichier par fichier des anciennes opérations est remplacé par
+    un résumé JSON dans la colonne details (compteurs par action/statut et
+    séries concernées). L'opération reste visible dans l'historique mais ne
+    peut plus être annulée. L'espace libéré est rendu au disque par un
+    VACUUM incrémental.
+    
+    Args:
+        retention_days: Nombre de jours pendant lesquels le détail est conservé
+        vacuum_pages: Nombre maximum de pages libérées par appel
+    
+    Returns:
+        Dict de statistiques (opérations compactées, lignes supprimées...)
+    """
+    import json
+    
+    conn = None
+    try:
+        conn = sqlite3.connect(current_app.config['DATABASE'], timeout=120.0, check_same_thread=False)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT operation_id FROM import_history
+            WHERE created_at < datetime('now', ?)
+              AND COALESCE(compacted, 0) = 0
+              AND status != 'started'
+        ''', (f'-{int(retention_days)} days',))
+        operation_ids = [row[0] for row in cursor.fetchall()]
+        
+        files_deleted = 0
+        with conn:
+            for operation_id in operation_ids:
+                cursor.execute('''
+                    SELECT action, status, series_title, COUNT(*)
+                    FROM import_history_files
+                    WHERE operation_id = ?
+                    GROUP BY action, status, series_title
+                ''', (operation_id,))
+                
+                summary = {'files': 0, 'actions': {}, 'statuses': {}, 'series': []}
+                for action, status, series_title, count in cursor.fetchall():
+                    summary['files'] += count
+                    summary['actions'][action or 'unknown'] = summary['actions'].get(action or 'unknown', 0) + count
+                    summary['statuses'][status or 'unknown'] = summary['statuses'].get(status or 'unknown', 0) + count
+                    if series_title and series_title not in summary['series']:
+                        summary['series'].append(series_title)
+                
+                cursor.execute('''
+                    UPDATE import_history
+                    SET compacted = 1, details = ?
+                    WHERE operation_id = ?
+                ''', (json.dumps(summary, ensure_ascii=False), operation_id))
+                
+                cursor.execute('DELETE FROM import_history_files WHERE operation_id = ?', (operation_id,))
+                files_deleted += cursor.rowcount
+        
+        # Le mode incrémental ne s'active qu'après un VACUUM complet (une seule fois)
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:
+            if files_deleted:
+                cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cursor.execute('VACUUM')
+                print("✓ Base convertie en auto_vacuum incrémental")
+        else:
+            cursor.execute(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+            cursor.fetchall()
+        
+        if operation_ids:
+            print(f"🗜️  Historique d'import compacté: {len(operation_ids)} opération(s), "
+                  f"{files_deleted} ligne(s) fichier supprimée(s)")
+        
+        return {
+            'operations_compacted': len(operation_ids),
+            'files_deleted': files_deleted
+        }
+    except Exception as e:
+        print(f"Erreur lors du compactage de l'historique: {e}")
+        return {'operations_compacted': 0, 'files_deleted': 0, 'error': str(e)}
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except:
+                pass
+
+
 def get_operation_details(operation_id):
     """Récupère les détails d'une opération"""
     conn = None
@@ -204,86 +325,188 @@ def get_operation_details(operation_id):
                 pass
 
 
-def undo_import_operation(operation_id):
-    """Annule une opération d'import en déplaçant les fichiers"""
+def _plan_undo_moves(files, undo_dir):
+    """Calcule la cible de chaque fichier à annuler, groupée par dossier source
+    
+    Les noms en double (même fichier importé dans deux séries) reçoivent un
+    suffixe pour ne pas s'écraser dans le dossier d'undo.
+    
+    Returns:
+        Dict {dossier_destination: [(file_record, chemin_undo), ...]}
+    """
+    import os
+    
+    groups = {}
+    used_names = set()
+    
+    for file_record in files:
+        basename = os.path.basename(file_record['destination_path'])
+        name, ext = os.path.splitext(basename)
+        target_name = basename
+        suffix = 2
+        while target_name in used_names:
+            target_name = f"{name} ({suffix}){ext}"
+            suffix += 1
+        used_names.add(target_name)
+        
+        directory = os.path.dirname(file_record['destination_path'])
+        groups.setdefault(directory, []).append((file_record, os.path.join(undo_dir, target_name)))
+    
+    return groups
+
+
+def _undo_directory(moves):
+    """Déplace vers le dossier d'undo tous les fichiers d'un même dossier
+    
+    Returns:
+        Liste de tuples (file_record, statut, taille, erreur) avec statut
+        'moved', 'missing' ou 'error'
+    """
+    import os
+    import shutil
+    
+    results = []
+    for file_record, undo_path in moves:
+        destination = file_record['destination_path']
+        try:
+            if not os.path.exists(destination):
+                results.append((file_record, 'missing', 0, None))
+                continue
+            
+            size = os.path.getsize(destination)
+            try:
+                # Même disque que le dossier d'undo : renommage instantané
+                os.rename(destination, undo_path)
+            except OSError:
+                shutil.move(destination, undo_path)
+            results.append((file_record, 'moved', size, None))
+        except Exception as e:
+            results.append((file_record, 'error', 0, str(e)))
+    
+    return results
+
+
+def undo_import_operation(operation_id, max_workers=4):
+    """Annule une opération d'import en déplaçant les fichiers
+    
+    Les fichiers de l'opération sont chargés en une seule requête, déplacés
+    en parallèle (un worker par dossier) puis la base est mise à jour en une
+    seule transaction : statut des fichiers, suppression des volumes
+    correspondants et recalcul des statistiques des séries touchées.
+    
+    Returns:
+        Tuple (succès, message, erreurs, statistiques)
+    """
+    import os
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from .scanner import LibraryScanner
+    
+    conn = None
     try:
-        import os
-        import shutil
-        from datetime import datetime
+        start_time = time.monotonic()
+        db_path = current_app.config['DATABASE']
         
-        operation_details = get_operation_details(operation_id)
-        if not operation_details or not operation_details['operation']:
-            return False, "Opération non trouvée", []
+        conn = sqlite3.connect(db_path, timeout=120.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
         
-        operation = operation_details['operation']
-        files = operation_details['files']
+        cursor.execute('SELECT * FROM import_history WHERE operation_id = ?', (operation_id,))
+        operation = cursor.fetchone()
+        if not operation:
+            return False, "Opération non trouvée", [], {}
         
         if operation['status'] != 'completed':
-            return False, "Seules les opérations complétées peuvent être annulées", []
+            return False, "Seules les opérations complétées peuvent être annulées", [], {}
         
-        undo_count = 0
-        error_count = 0
-        errors = []
+        if operation['compacted']:
+            return False, "Opération compactée : le détail des fichiers n'est plus disponible", [], {}
+        
+        # Uniquement les fichiers réellement importés/remplacés
+        cursor.execute('''
+            SELECT id, filename, destination_path, series_id
+            FROM import_history_files
+            WHERE operation_id = ? AND status IN ('imported', 'replaced')
+            ORDER BY id
+        ''', (operation_id,))
+        files = [dict(row) for row in cursor.fetchall() if row['destination_path']]
         
         # Créer un dossier d'undo
-        import_path = operation['import_path']
-        undo_dir = os.path.join(import_path, f'_undo_{operation_id}')
+        undo_dir = os.path.join(operation['import_path'], f'_undo_{operation_id}')
         os.makedirs(undo_dir, exist_ok=True)
         
-        for file_record in files:
-            try:
-                if file_record['status'] in ['imported', 'replaced']:
-                    # Le fichier a été importé/remplacé, le déplacer vers undo
-                    if os.path.exists(file_record['destination_path']):
-                        shutil.move(file_record['destination_path'], 
-                                   os.path.join(undo_dir, os.path.basename(file_record['destination_path'])))
-                        undo_count += 1
-                        
-                        # Mettre à jour le statut
-                        conn = None
-                        try:
-                            conn = sqlite3.connect(current_app.config['DATABASE'], timeout=120.0, check_same_thread=False)
-                            cursor = conn.cursor()
-                            cursor.execute('''
-                                UPDATE import_history_files 
-                                SET status = 'undone' 
-                                WHERE operation_id = ? AND filename = ?
-                            ''', (operation_id, file_record['filename']))
-                            conn.commit()
-                        finally:
-                            if conn:
-                                try:
-                                    conn.close()
-                                except:
-                                    pass
-            except Exception as e:
-                error_count += 1
-                errors.append(f"{file_record['filename']}: {str(e)}")
-        
-        # Mettre à jour l'opération
-        conn = None
-        try:
-            conn = sqlite3.connect(current_app.config['DATABASE'], timeout=120.0, check_same_thread=False)
-            cursor = conn.cursor()
+        groups = _plan_undo_moves(files, undo_dir)
+        
+        results = []
+        if groups:
+            workers = max(1, min(max_workers, len(groups)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for group_results in executor.map(_undo_directory, groups.values()):
+                    results.extend(group_results)
+        
+        moved = [(record, size) for record, status, size, _ in results if status == 'moved']
+        errors = [f"{record['filename']}: {error}" for record, status, _, error in results if status == 'error']
+        moved_paths = [record['destination_path'] for record, _ in moved]
+        
+        # Instancié hors transaction : le constructeur initialise le schéma
+        scanner = LibraryScanner(db_path)
+        
+        # Mise à jour de la base en une seule transaction
+        with conn:
+            series_ids = {record['series_id'] for record, _ in moved if record['series_id']}
+            
+            # Séries dont un volume pointe vers un fichier déplacé
+            for i in range(0, len(moved_paths), 500):
+                chunk = moved_paths[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'''
+                    SELECT DISTINCT series_id FROM volumes WHERE filepath IN ({placeholders})
+                ''', chunk)
+                series_ids.update(row[0] for row in cursor.fetchall())
+            
+            cursor.executemany('''
+                UPDATE import_history_files SET status = 'undone' WHERE id = ?
+            ''', [(record['id'],) for record, _ in moved])
+            
+            cursor.executemany('DELETE FROM volumes WHERE filepath = ?',
+                               [(path,) for path in moved_paths])
+            
+            for series_id in series_ids:
+                scanner.update_series_stats(series_id, conn=conn)
+            
             cursor.execute('''
                 UPDATE import_history 
                 SET status = 'undone' 
                 WHERE operation_id = ?
             ''', (operation_id,))
-            conn.commit()
-        finally:
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
         
-        message = f"Annulation complétée: {undo_count} fichier(s) déplacé(s) vers {undo_dir}"
-        if error_count > 0:
-            message += f" ({error_count} erreur(s))"
+        elapsed = time.monotonic() - start_time
+        total_bytes = sum(size for _, size in moved)
+        stats = {
+            'files_moved': len(moved),
+            'files_missing': sum(1 for _, status, _, _ in results if status == 'missing'),
+            'files_failed': len(errors),
+            'series_updated': len(series_ids),
+            'bytes_moved': total_bytes,
+            'elapsed_seconds': round(elapsed, 3),
+            'files_per_second': round(len(moved) / elapsed, 1) if elapsed > 0 else None,
+            'mb_per_second': round(total_bytes / 1024 / 1024 / elapsed, 1) if elapsed > 0 else None
+        }
+        print(f"↩️  Annulation {operation_id}: {len(moved)} fichier(s) en {elapsed:.2f}s "
+              f"({stats['files_per_second']} fichiers/s)")
+        
+        message = f"Annulation complétée: {len(moved)} fichier(s) déplacé(s) vers {undo_dir}"
+        if errors:
+            message += f" ({len(errors)} erreur(s))"
         
-        return True, message, errors
+        return True, message, errors, stats
         
     except Exception as e:
         print(f"Erreur lors de l'annulation: {e}")
-        return False, str(e), []
+        return False, str(e), [], {}
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except:
+                pass
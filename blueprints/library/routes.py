@@ -1,7 +1,7 @@
 """
 Routes pour la gestion des bibliothèques
 """
-from flask import render_template, request, jsonify, current_app
+from flask import render_template, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required
 from . import library_bp
 from .scanner import LibraryScanner
@@ -1049,120 +1049,69 @@ def get_transfer_series(library_id):
 @library_bp.route('/api/transfer/move', methods=['POST'])
 @login_required
 def move_series():
-    """Transfère une série d'une bibliothèque à une autre (fichiers + BD)"""
-    data = request.get_json()
+    """Lance le transfert d'une ou plusieurs séries vers une autre bibliothèque
     
-    series_id = data.get('series_id')
+    Le déplacement (fichiers + BD) s'exécute en tâche de fond : la route
+    retourne immédiatement un job_id à suivre via /api/jobs/<job_id>.
+    """
+    data = request.get_json() or {}
+    
+    series_ids = list(data.get('series_ids') or [])
+    if data.get('series_id'):
+        series_ids.append(data['series_id'])
     from_library_id = data.get('from_library_id')
     to_library_id = data.get('to_library_id')
+    verify = data.get('verify', 'hash')
     
-    if not all([series_id, from_library_id, to_library_id]):
+    if not series_ids or not all([from_library_id, to_library_id]):
         return jsonify({'error': 'Paramètres manquants'}), 400
     
     if from_library_id == to_library_id:
         return jsonify({'error': 'Les bibliothèques doivent être différentes'}), 400
     
+    if verify not in ['hash', 'size']:
+        return jsonify({'error': 'Mode de vérification invalide'}), 400
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Récupérer les infos de la série
-        cursor.execute('''
-            SELECT id, library_id, title, path FROM series WHERE id = ?
-        ''', (series_id,))
-        series = cursor.fetchone()
-        
-        if not series:
-            conn.close()
-            return jsonify({'error': 'Série non trouvée'}), 404
-        
-        if series['library_id'] != from_library_id:
-            conn.close()
-            return jsonify({'error': 'La série n\'appartient pas à cette bibliothèque'}), 400
-        
-        # Récupérer les infos des deux bibliothèques
+        # Vérifier que les deux bibliothèques existent
         cursor.execute('''
-            SELECT id, path FROM libraries WHERE id IN (?, ?)
+            SELECT id FROM libraries WHERE id IN (?, ?)
         ''', (from_library_id, to_library_id))
+        libraries_found = len(cursor.fetchall())
+        conn.close()
         
-        libraries = {}
-        for lib in cursor.fetchall():
-            libraries[lib['id']] = lib['path']
-        
-        if len(libraries) != 2:
-            conn.close()
+        if libraries_found != 2:
             return jsonify({'error': 'Une ou plusieurs bibliothèques n\'existent pas'}), 404
         
-        from_lib_path = libraries[from_library_id]
-        to_lib_path = libraries[to_library_id]
-        
-        # Construire les chemins source et destination
-        # Si le chemin n'existe pas en BD, on le reconstruit
-        if series['path']:
-            old_series_path = series['path']
-        else:
-            old_series_path = os.path.join(from_lib_path, series['title'])
-        
-        new_series_path = os.path.join(to_lib_path, series['title'])
-        
-        # Vérifier que le chemin source existe
-        if not os.path.exists(old_series_path):
-            conn.close()
-            return jsonify({
-                'error': f'Le dossier de la série n\'existe pas: {old_series_path}'
-            }), 400
-        
-        try:
-            # Créer le dossier destination s'il n'existe pas
-            os.makedirs(to_lib_path, exist_ok=True)
-            
-            # Vérifier que la destination n'existe pas déjà
-            if os.path.exists(new_series_path):
-                conn.close()
-                return jsonify({
-                    'error': f'Une série avec ce nom existe déjà dans la destination'
-                }), 400
-            
-            # Déplacer le dossier de la série
-            shutil.move(old_series_path, new_series_path)
-            
-            # Mettre à jour le chemin de la série en BD
-            cursor.execute('''
-                UPDATE series SET library_id = ?, path = ? WHERE id = ?
-            ''', (to_library_id, new_series_path, series_id))
-            
-            # Récupérer et mettre à jour les chemins de tous les volumes
-            cursor.execute('''
-                SELECT id, filepath FROM volumes WHERE series_id = ?
-            ''', (series_id,))
-            
-            volumes = cursor.fetchall()
-            for volume in volumes:
-                old_volume_path = volume['filepath']
-                # Remplacer le chemin source par le chemin destination
-                new_volume_path = old_volume_path.replace(old_series_path, new_series_path, 1)
-                
-                cursor.execute('''
-                    UPDATE volumes SET filepath = ? WHERE id = ?
-                ''', (new_volume_path, volume['id']))
-            
-            conn.commit()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'message': f'Série transférée avec succès vers la bibliothèque {to_library_id}',
-                'new_path': new_series_path
-            })
+        from background_jobs import job_manager
+        from .transfer import SeriesTransfer
+        
+        # Dédupliquer en gardant l'ordre
+        series_ids = list(dict.fromkeys(int(sid) for sid in series_ids))
+        
+        transfer = SeriesTransfer(verify=verify)
+        job_id = job_manager.submit(
+            'series_transfer',
+            transfer.run,
+            series_ids,
+            to_library_id,
+            from_library_id=from_library_id,
+            params={
+                'series_ids': series_ids,
+                'from_library_id': from_library_id,
+                'to_library_id': to_library_id,
+                'verify': verify
+            }
+        )
         
-        except Exception as e:
-            conn.close()
-            print(f"❌ Erreur lors du déplacement des fichiers: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({
-                'error': f'Erreur lors du déplacement des fichiers: {str(e)}'
-            }), 500
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': f'Transfert de {len(series_ids)} série(s) lancé en arrière-plan'
+        }), 202
     
     except Exception as e:
         print(f"❌ Erreur transfert série: {e}")
@@ -1171,6 +1120,42 @@ def move_series():
         return jsonify({'error': str(e)}), 500
 
 
+# ========== ROUTES DES TÂCHES EN ARRIÈRE-PLAN ==========
+
+@library_bp.route('/api/jobs', methods=['GET'])
+@login_required
+def list_background_jobs():
+    """Liste les tâches en arrière-plan récentes"""
+    from background_jobs import job_manager
+    
+    job_type = request.args.get('type')
+    limit = request.args.get('limit', 20, type=int)
+    
+    return jsonify({'success': True, 'jobs': job_manager.list(job_type, limit)})
+
+
+@library_bp.route('/api/jobs/scheduled', methods=['GET'])
+@login_required
+def list_scheduled_jobs():
+    """État des tâches planifiées partagé entre les workers (détenteur du bail, dernier passage)"""
+    from scheduler_lease import lease_manager
+    
+    return jsonify({'success': True, 'scheduled': lease_manager.list()})
+
+
+@library_bp.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_background_job(job_id):
+    """Récupère l'état et la progression d'une tâche en arrière-plan"""
+    from background_jobs import job_manager
+    
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Tâche introuvable'}), 404
+    
+    return jsonify({'success': True, 'job': job})
+
+
 @library_bp.route('/api/series/<int:series_id>/tags', methods=['GET', 'PUT'])
 @login_required
 def manage_series_tags(series_id):
@@ -1315,43 +1300,34 @@ def preview_rename(series_id):
         ''', (series_id,))
         
         series = cursor.fetchone()
+        conn.close()
         if not series:
             return jsonify({'error': 'Série introuvable'}), 404
         
         series_id, series_title, series_path = series
         
-        # Récupérer tous les volumes
-        cursor.execute('''
-            SELECT filename, volume_number, part_number
-            FROM volumes
-            WHERE series_id = ?
-            ORDER BY part_number, volume_number
-        ''', (series_id,))
+        # Générer l'aperçu avec le moteur utilisé pour l'exécution
+        from rename_handler import RenameEngine
         
-        volumes = []
-        for vol in cursor.fetchall():
-            volumes.append({
-                'filename': vol[0],
-                'volume_number': vol[1],
-                'part_number': vol[2],
-                'series_title': series_title
-            })
-        
-        conn.close()
+        engine = RenameEngine(current_app.config['DATABASE'])
+        volumes = engine.load_volumes(series_ids=[series_id])
         
         if not volumes:
             return jsonify({'error': 'Aucun volume trouvé'}), 404
         
-        # Générer l'aperçu
-        from rename_handler import RenamePattern
-        
-        rename_pattern = RenamePattern(pattern)
-        is_valid, error = rename_pattern.validate()
-        
-        if not is_valid:
-            return jsonify({'error': error}), 400
-        
-        preview = rename_pattern.preview(volumes)
+        try:
+            operations = engine.plan(pattern, volumes)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        preview = [{
+            'old_name': op['old_name'],
+            'new_name': op['new_name'],
+            'volume_number': op['volume_number'],
+            'counter': op['counter'],
+            'status': op['status'],
+            'error': op.get('error')
+        } for op in operations]
         
         return jsonify({
             'success': True,
@@ -1381,43 +1357,31 @@ def execute_rename(series_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Récupérer les infos de la série
-        cursor.execute('''
-            SELECT s.id, s.title, s.path
-            FROM series s
-            WHERE s.id = ?
-        ''', (series_id,))
-        
+        # Vérifier que la série existe
+        cursor.execute('SELECT id FROM series WHERE id = ?', (series_id,))
         series = cursor.fetchone()
+        conn.close()
         if not series:
             return jsonify({'error': 'Série introuvable'}), 404
         
-        series_id, series_title, series_path = series
-        conn.close()
+        # Renommage en deux phases + mise à jour des volumes en une transaction
+        from rename_handler import RenameEngine
         
-        # Effectuer le renommage
-        from rename_handler import FileRenamer
-        
-        success, results, error = FileRenamer.rename_series_files(
-            series_path=series_path,
-            pattern=pattern,
-            files_to_rename=files_to_rename,
-            series_title=series_title,
-            dry_run=False
-        )
+        engine = RenameEngine(current_app.config['DATABASE'])
+        try:
+            operations = engine.plan(pattern, engine.load_volumes(series_ids=[series_id]))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not success:
-            return jsonify({'error': error}), 500
+        # Le compteur [C] est calculé sur toute la série, comme dans l'aperçu
+        requested = set(files_to_rename)
+        operations = [op for op in operations if op['old_name'] in requested]
         
-        # Après succès, rescanner la série pour mettre à jour la base de données
-        try:
-            from .scanner import LibraryScanner
-            scanner = LibraryScanner()
-            scanner.scan_single_series(series_id)
-        except Exception as e:
-            print(f"Erreur lors du re-scan: {e}")
-            import traceback
-            traceback.print_exc()
+        results = [
+            {'old_name': op['old_name'], 'new_name': op['new_name'], 'success': False, 'error': op['error']}
+            for op in operations if op['status'] == 'conflict'
+        ]
+        results.extend(engine.execute(operations))
         
         return jsonify({
             'success': True,
@@ -1430,6 +1394,137 @@ def execute_rename(series_id):
         return jsonify({'error': str(e)}), 500
 
 
+@library_bp.route('/api/libraries/<int:library_id>/rename/preview', methods=['POST'])
+@login_required
+def preview_library_rename(library_id):
+    """Aperçu du renommage de toute une bibliothèque, diffusé en NDJSON
+    
+    Calculé uniquement à partir de la table volumes (aucun accès disque).
+    Une ligne JSON par série contenant des changements, puis une ligne de
+    résumé. Les collisions sont détectées sur l'ensemble de la bibliothèque.
+    """
+    try:
+        data = request.get_json() or {}
+        pattern = data.get('pattern', '')
+        series_ids = data.get('series_ids')
+        
+        if not pattern:
+            return jsonify({'error': 'Pattern vide'}), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM libraries WHERE id = ?', (library_id,))
+        library = cursor.fetchone()
+        conn.close()
+        if not library:
+            return jsonify({'error': 'Bibliothèque introuvable'}), 404
+        
+        from rename_handler import RenameEngine
+        
+        engine = RenameEngine(current_app.config['DATABASE'])
+        volumes = engine.load_volumes(series_ids=series_ids, library_id=library_id)
+        
+        try:
+            operations = engine.plan(pattern, volumes, check_disk=False)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        totals = {'series': 0, 'files': len(operations), 'rename': 0, 'unchanged': 0, 'conflict': 0}
+        
+        # Les opérations sont triées par série : on émet une ligne à chaque changement de série
+        current = None
+        changes = []
+        for op in operations + [None]:
+            if current is not None and (op is None or op['series_id'] != current['series_id']):
+                totals['series'] += 1
+                if changes:
+                    yield json.dumps({
+                        'type': 'series',
+                        'series_id': current['series_id'],
+                        'series_title': current['series_title'],
+                        'changes': changes
+                    }, ensure_ascii=False) + '\n'
+                changes = []
+            if op is None:
+                break
+            
+            current = op
+            totals[op['status']] += 1
+            if op['status'] != 'unchanged':
+                changes.append({
+                    'volume_id': op['volume_id'],
+                    'old_name': op['old_name'],
+                    'new_name': op['new_name'],
+                    'status': op['status'],
+                    'error': op.get('error')
+                })
+        
+        yield json.dumps({'type': 'summary', 'library_id': library_id, **totals}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@library_bp.route('/api/libraries/<int:library_id>/rename/execute', methods=['POST'])
+@login_required
+def execute_library_rename(library_id):
+    """Lance le renommage de toute une bibliothèque en tâche de fond"""
+    try:
+        data = request.get_json() or {}
+        pattern = data.get('pattern', '')
+        series_ids = data.get('series_ids')
+        
+        if not pattern:
+            return jsonify({'error': 'Pattern vide'}), 400
+        
+        from rename_handler import RenamePattern, RenameEngine
+        from background_jobs import job_manager
+        
+        is_valid, error = RenamePattern(pattern).validate()
+        if not is_valid:
+            return jsonify({'error': error}), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM libraries WHERE id = ?', (library_id,))
+        library = cursor.fetchone()
+        conn.close()
+        if not library:
+            return jsonify({'error': 'Bibliothèque introuvable'}), 404
+        
+        if job_manager.is_running('library_rename'):
+            return jsonify({'error': 'Un renommage de bibliothèque est déjà en cours'}), 409
+        
+        engine = RenameEngine(current_app.config['DATABASE'])
+        job_id = job_manager.submit(
+            'library_rename',
+            engine.run,
+            pattern,
+            library_id=library_id,
+            series_ids=series_ids,
+            params={'library_id': library_id, 'pattern': pattern, 'series_ids': series_ids},
+            exclusive=True
+        )
+        if job_id is None:
+            return jsonify({'error': 'Un renommage de bibliothèque est déjà en cours'}), 409
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': 'Renommage de la bibliothèque lancé en arrière-plan'
+        }), 202
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @library_bp.route('/api/libraries/<int:library_id>/create-series', methods=['POST'])
 @login_required
 def create_series_directory(library_id):
@@ -1928,6 +2023,8 @@ def import_config():
             config['auto_import_interval'] = data['auto_import_interval']
         if 'auto_import_interval_unit' in data:
             config['auto_import_interval_unit'] = data['auto_import_interval_unit']
+        if 'history_retention_days' in data:
+            config['history_retention_days'] = int(data['history_retention_days'])
         
         if save_library_import_config(config):
             # Redémarrer le scheduler si nécessaire
@@ -1953,10 +2050,35 @@ def import_history():
     try:
         from .import_history import get_import_history
         
-        limit = request.args.get('limit', 50, type=int)
-        history = get_import_history(limit)
+        # Borné à [1, 500] : 0 viderait la page, une valeur négative lèverait la limite SQLite
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        before_id = request.args.get('before', type=int)
+        history = get_import_history(limit, before_id)
+        
+        # Curseur de la page suivante (None quand tout a été chargé)
+        next_before = history[-1]['id'] if len(history) == limit else None
+        
+        return jsonify({'success': True, 'history': history, 'next_before': next_before})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@library_bp.route('/api/import/history/compact', methods=['POST'])
+@login_required
+def compact_import_history():
+    """Compacte les anciennes opérations selon la période de rétention"""
+    try:
+        from .import_history import compact_import_history as do_compact
+        
+        data = request.get_json(silent=True) or {}
+        config = load_library_import_config()
+        retention_days = data.get('retention_days', config.get('history_retention_days', 90))
+        
+        stats = do_compact(retention_days)
+        if 'error' in stats:
+            return jsonify({'error': stats['error']}), 500
         
-        return jsonify({'success': True, 'history': history})
+        return jsonify({'success': True, 'stats': stats})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1985,10 +2107,10 @@ def undo_import_operation(operation_id):
     try:
         from .import_history import undo_import_operation as do_undo
         
-        success, message, errors = do_undo(operation_id)
+        success, message, errors, stats = do_undo(operation_id)
         
         if success:
-            return jsonify({'success': True, 'message': message, 'errors': errors})
+            return jsonify({'success': True, 'message': message, 'errors': errors, 'stats': stats})
         else:
             return jsonify({'error': message}), 400
             
@@ -19,6 +19,43 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Expressions régulières de parse_filename, compilées une seule fois
+# (le parsing est appelé pour chaque fichier lors des scans, imports et renommages)
+_DIGITAL_RESOLUTION_RE = re.compile(r'\[(?:Digital|ePub|[0-9]p)-(\d+)\]', re.IGNORECASE)
+_BRACKET_RESOLUTION_RE = re.compile(r'\[(\d{3,4})\]')
+_DOT_NOT_BEFORE_DIGIT_RE = re.compile(r'\.(?!\d)')
+_DOT_NOT_AFTER_DIGIT_RE = re.compile(r'(?<!\d)\.')
+_SPECIAL_CHARS_RE = re.compile(r'[_!,;:?\[\]{}()«»„""]')
+_MULTI_SPACES_RE = re.compile(r'\s+')
+_PART_RE = re.compile(r'(?:Part|Arc|Partie)\s+(\d+)', re.IGNORECASE)
+_PART_NAME_RE = re.compile(r'(?:Part|Arc|Partie)\s+\d+\s*-\s*([^T]+?)(?=\s+T\d+)', re.IGNORECASE)
+_VOLUME_AFTER_PART_RE = re.compile(r'(?:Part|Arc|Partie)\s+\d+(?:\s*-\s*[^T-]*?)?\s*-?\s*T[\s\.]?(\d+)', re.IGNORECASE)
+_VOLUME_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'Tome[\s\.](\d+)',               # Tome 09, Tome.09
+    r'T[\s\.]?(\d+)',                 # T04, T.04, T 4
+    r'Vol\.?\s*(\d+)',                # Vol. 4, Vol 4, Vol.4
+    r'Volume[\s\.](\d+)',             # Volume 4, Volume.4
+    r'v[\s\.]?(\d+)',                 # v4, v.4
+    r'#(\d+)',                        # #4
+    r'-\s*(\d+)(?:\s|$)',             # - 08 (à la fin ou suivi d'espace)
+    r'\s(\d{1,2})\s+(?=[A-Za-z])',   # 08 Noda - nombre suivi d'espace(s) et d'une lettre (ex: Golden kamui 08 Noda)
+    r'\s(\d+)\s*(?:FR|EN|VF|VO)',    # 09 FR (nombre avant langue)
+    r'\s(\d{1,3})$'                   # 08 (nombre de 1-3 chiffres à la fin, évite les années)
+)]
+_TITLE_BEFORE_PART_RE = re.compile(r'^(.+?)\s+(?:Part|Arc|Partie)\s*\d+', re.IGNORECASE)
+_TITLE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^(.+?)\s+(?:Tome|T[\s\.]?\d+|Vol|Volume|v[\s\.]?\d+|#\d+|-\s*\d+)',  # Patterns explicites
+    r'^(.+?)\s+(\d{1,2})\s*(?:\(|\[)',  # Titre avant nombre + parenthèse/crochet (ex: "Golden kamui 01 (Noda)")
+)]
+_LANGUAGE_TAIL_RE = re.compile(r'\s*(?:FR|EN|VF|VO|FRENCH|ENGLISH).*$', re.IGNORECASE)
+_RELEASE_TAG_TAIL_RE = re.compile(r'\s*-\s*[A-Za-z0-9]+$')
+_TRAILING_DASH_RE = re.compile(r'\s*-\s*$')
+_AUTHOR_PARENS_RE = re.compile(r'\(([^)]+?)\)')
+_YEAR_ONLY_RE = re.compile(r'^\d{4}$')
+_AUTHOR_DASH_RE = re.compile(r'-\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*(?:T\d+|Tome|Vol)')
+_YEAR_RE = re.compile(r'\b(19\d{2}|20\d{2})\b')
+_RESOLUTION_RE = re.compile(r'(\d{3,4}x\d{3,4})')
+
 
 class LibraryScanner:
     def __init__(self, db_path=None):
@@ -121,8 +158,14 @@ class LibraryScanner:
         
         conn.commit()
 
-    def parse_filename(self, filename):
-        """Parse le nom de fichier pour extraire les métadonnées"""
+    @staticmethod
+    def parse_filename(filename):
+        """Parse le nom de fichier pour extraire les métadonnées
+        
+        Méthode statique (les expressions régulières sont compilées une fois au
+        niveau du module) : utilisable sans instancier le scanner, notamment
+        par le moteur de renommage.
+        """
         info = {
             'title': '',
             'part_number': None,
@@ -142,13 +185,13 @@ class LibraryScanner:
         excluded_numbers = set()  # Nombres à exclure de la détection de volume (résolutions)
         
         # Pattern 1: [Digital-XXX] ou [ePub-XXX] (Digital/ePub resolution)
-        digital_match = re.search(r'\[(?:Digital|ePub|[0-9]p)-(\d+)\]', name_without_ext, re.IGNORECASE)
+        digital_match = _DIGITAL_RESOLUTION_RE.search(name_without_ext)
         if digital_match:
             excluded_numbers.add(int(digital_match.group(1)))
             info['resolution'] = f"Digital-{digital_match.group(1)}"
         
         # Pattern 2: [XXX] où XXX est un nombre >= 300 (typique pour résolutions)
-        bracket_match = re.search(r'\[(\d{3,4})\]', name_without_ext)
+        bracket_match = _BRACKET_RESOLUTION_RE.search(name_without_ext)
         if bracket_match:
             bracket_num = int(bracket_match.group(1))
             if bracket_num >= 300:  # Seuil: les résolutions commencent généralement à 300+
@@ -162,21 +205,21 @@ class LibraryScanner:
         normalized_name = name_without_ext
 
         # Remplacer les points par des espaces, sauf si précédés/suivis d'un chiffre
-        normalized_name = re.sub(r'\.(?!\d)', ' ', normalized_name)  # Point non suivi d'un chiffre
-        normalized_name = re.sub(r'(?<!\d)\.', ' ', normalized_name)  # Point non précédé d'un chiffre
+        normalized_name = _DOT_NOT_BEFORE_DIGIT_RE.sub(' ', normalized_name)  # Point non suivi d'un chiffre
+        normalized_name = _DOT_NOT_AFTER_DIGIT_RE.sub(' ', normalized_name)  # Point non précédé d'un chiffre
         
         # Remplacer underscores et caractères spéciaux par des espaces
-        normalized_name = re.sub(r'[_!,;:?\[\]{}()«»„""]', ' ', normalized_name)
+        normalized_name = _SPECIAL_CHARS_RE.sub(' ', normalized_name)
         
         # Nettoyer les espaces multiples
-        normalized_name = re.sub(r'\s+', ' ', normalized_name).strip()
+        normalized_name = _MULTI_SPACES_RE.sub(' ', normalized_name).strip()
 
         # Extraire la partie/arc (Part XX, Arc XX, Partie XX)
-        part_match = re.search(r'(?:Part|Arc|Partie)\s+(\d+)', normalized_name, re.IGNORECASE)
+        part_match = _PART_RE.search(normalized_name)
         if part_match:
             info['part_number'] = int(part_match.group(1))
             # Essayer d'extraire le nom de la partie
-            part_name_match = re.search(r'(?:Part|Arc|Partie)\s+\d+\s*-\s*([^T]+?)(?=\s+T\d+)', normalized_name, re.IGNORECASE)
+            part_name_match = _PART_NAME_RE.search(normalized_name)
             if part_name_match:
                 info['part_name'] = part_name_match.group(1).strip()
 
@@ -184,27 +227,14 @@ class LibraryScanner:
         # Si on a une partie, chercher d'abord un volume explicite APRÈS la partie
         if info['part_number']:
             # Chercher après "Part X" ou "Part X - Nom" un pattern "T Y" ou "- T Y"
-            after_part = re.search(r'(?:Part|Arc|Partie)\s+\d+(?:\s*-\s*[^T-]*?)?\s*-?\s*T[\s\.]?(\d+)', normalized_name, re.IGNORECASE)
+            after_part = _VOLUME_AFTER_PART_RE.search(normalized_name)
             if after_part:
                 info['volume'] = int(after_part.group(1))
 
         # Si pas encore trouvé de volume, utiliser les patterns standard
         if not info['volume']:
-            volume_patterns = [
-                r'Tome[\s\.](\d+)',               # Tome 09, Tome.09
-                r'T[\s\.]?(\d+)',                 # T04, T.04, T 4
-                r'Vol\.?\s*(\d+)',                # Vol. 4, Vol 4, Vol.4
-                r'Volume[\s\.](\d+)',             # Volume 4, Volume.4
-                r'v[\s\.]?(\d+)',                 # v4, v.4
-                r'#(\d+)',                        # #4
-                r'-\s*(\d+)(?:\s|$)',             # - 08 (à la fin ou suivi d'espace)
-                r'\s(\d{1,2})\s+(?=[A-Za-z])',   # 08 Noda - nombre suivi d'espace(s) et d'une lettre (ex: Golden kamui 08 Noda)
-                r'\s(\d+)\s*(?:FR|EN|VF|VO)',    # 09 FR (nombre avant langue)
-                r'\s(\d{1,3})$'                   # 08 (nombre de 1-3 chiffres à la fin, évite les années)
-            ]
-
-            for pattern in volume_patterns:
-                match = re.search(pattern, normalized_name, re.IGNORECASE)
+            for pattern in _VOLUME_PATTERNS:
+                match = pattern.search(normalized_name)
                 if match:
                     potential_volume = int(match.group(1))
                     # Filtrer les fausses détections :
@@ -217,16 +247,12 @@ class LibraryScanner:
 
         # Extraire le titre (avant Part/Arc ou avant le numéro de tome)
         if info['part_number']:
-            title_match = re.match(r'^(.+?)\s+(?:Part|Arc|Partie)\s*\d+', normalized_name, re.IGNORECASE)
+            title_match = _TITLE_BEFORE_PART_RE.match(normalized_name)
         else:
             # Essayer progressivement différents patterns pour extraire le titre
-            title_patterns = [
-                r'^(.+?)\s+(?:Tome|T[\s\.]?\d+|Vol|Volume|v[\s\.]?\d+|#\d+|-\s*\d+)',  # Patterns explicites
-                r'^(.+?)\s+(\d{1,2})\s*(?:\(|\[)',  # Titre avant nombre + parenthèse/crochet (ex: "Golden kamui 01 (Noda)")
-            ]
             title_match = None
-            for pattern in title_patterns:
-                title_match = re.match(pattern, normalized_name, re.IGNORECASE)
+            for pattern in _TITLE_PATTERNS:
+                title_match = pattern.match(normalized_name)
                 if title_match:
                     break
 
@@ -235,37 +261,37 @@ class LibraryScanner:
         else:
             # Si aucun pattern de tome trouvé, essayer de nettoyer le titre
             # Retirer les tags courants à la fin
-            clean_title = re.sub(r'\s*(?:FR|EN|VF|VO|FRENCH|ENGLISH).*$', '', normalized_name, flags=re.IGNORECASE)
-            clean_title = re.sub(r'\s*-\s*[A-Za-z0-9]+$', '', clean_title)  # Retirer les tags de release
+            clean_title = _LANGUAGE_TAIL_RE.sub('', normalized_name)
+            clean_title = _RELEASE_TAG_TAIL_RE.sub('', clean_title)  # Retirer les tags de release
             info['title'] = clean_title.strip() if clean_title else normalized_name
 
         # Nettoyer le titre (retirer les tirets multiples, espaces superflus)
-        info['title'] = re.sub(r'\s*-\s*$', '', info['title'])
-        info['title'] = re.sub(r'\s+', ' ', info['title']).strip()
+        info['title'] = _TRAILING_DASH_RE.sub('', info['title'])
+        info['title'] = _MULTI_SPACES_RE.sub(' ', info['title']).strip()
 
         # Extraire l'auteur (cherche dans le nom complet avec extension)
-        author_match = re.search(r'\(([^)]+?)\)', filename)
+        author_match = _AUTHOR_PARENS_RE.search(filename)
         if author_match:
             potential_author = author_match.group(1)
             # Éviter de prendre l'année comme auteur
-            if not re.match(r'^\d{4}$', potential_author):
+            if not _YEAR_ONLY_RE.match(potential_author):
                 info['author'] = potential_author
 
         # Chercher aussi l'auteur après un tiret (format: titre - auteur)
         if not info['author']:
-            author_dash_match = re.search(r'-\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*(?:T\d+|Tome|Vol)', normalized_name)
+            author_dash_match = _AUTHOR_DASH_RE.search(normalized_name)
             if author_dash_match:
                 info['author'] = author_dash_match.group(1).strip()
 
         # Extraire l'année
-        year_match = re.search(r'\b(19\d{2}|20\d{2})\b', filename)
+        year_match = _YEAR_RE.search(filename)
         if year_match:
             info['year'] = int(year_match.group(1))
 
         # Extraire la résolution (1920x1080, etc.)
         # Ne pas écraser la résolution déjà extraite depuis les crochets
         if not info['resolution']:
-            resolution_match = re.search(r'(\d{3,4}x\d{3,4})', filename)
+            resolution_match = _RESOLUTION_RE.search(filename)
             if resolution_match:
                 info['resolution'] = resolution_match.group(1)
 
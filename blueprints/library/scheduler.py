@@ -7,6 +7,7 @@ import json
 import os
 from datetime import datetime
 from flask import current_app
+from scheduler_lease import lease_manager
 
 
 class LibraryImportScheduler:
@@ -43,10 +44,12 @@ class LibraryImportScheduler:
         if self.scheduler.get_job(self.job_id):
             self.scheduler.remove_job(self.job_id)
         
-        # Ajouter la nouvelle tâche
+        # Ajouter la nouvelle tâche (exécutée par un seul worker, cf. scheduler_lease)
+        trigger = IntervalTrigger(**{interval_unit: interval_value})
         self.scheduler.add_job(
-            func=self._auto_import,
-            trigger=IntervalTrigger(**{interval_unit: interval_value}),
+            func=lease_manager.run_exclusive,
+            args=[self.job_id, self._auto_import, trigger.interval.total_seconds()],
+            trigger=trigger,
             id=self.job_id,
             name='Library Auto Import',
             replace_existing=True
@@ -135,6 +138,10 @@ class LibraryImportScheduler:
                 else:
                     print(f"✗ Erreur lors de l'import automatique")
                 
+                # Compacter l'historique pour qu'il ne grossisse pas indéfiniment
+                from .import_history import compact_import_history
+                compact_import_history(config.get('history_retention_days', 90))
+                
             except Exception as e:
                 print(f"✗ Erreur lors de l'import automatique: {e}")
                 import traceback
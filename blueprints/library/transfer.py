@@ -0,0 +1,277 @@
+"""
+Transfert de séries entre bibliothèques, exécuté en tâche de fond
+
+- Même système de fichiers : simple os.rename du dossier (atomique)
+- Disques différents : copie parallèle fichier par fichier, vérification
+  (taille + hash partiel) puis suppression de la source
+- Une seule transaction SQLite à la fin pour toutes les séries déplacées
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+
+
+# Taille des blocs lus pour le hash partiel (début, milieu et fin du fichier)
+PARTIAL_HASH_BLOCK = 1024 * 1024
+
+
+def partial_hash(filepath, file_size=None):
+    """Calcule un hash SHA-1 sur le début, le milieu et la fin d'un fichier
+    
+    Suffisant pour détecter une copie tronquée ou corrompue sans relire
+    intégralement des archives de plusieurs centaines de Mo.
+    """
+    if file_size is None:
+        file_size = os.path.getsize(filepath)
+    
+    digest = hashlib.sha1()
+    digest.update(str(file_size).encode())
+    
+    with open(filepath, 'rb') as f:
+        if file_size <= PARTIAL_HASH_BLOCK * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, file_size // 2, file_size - PARTIAL_HASH_BLOCK):
+                f.seek(offset)
+                digest.update(f.read(PARTIAL_HASH_BLOCK))
+    
+    return digest.hexdigest()
+
+
+def same_filesystem(path_a, path_b):
+    """Vérifie si deux chemins existants sont sur le même périphérique"""
+    try:
+        return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+    except OSError:
+        return False
+
+
+class SeriesTransferError(Exception):
+    """Erreur lors du transfert d'une série (la source reste intacte)"""
+
+
+class SeriesTransfer:
+    """Déplace une ou plusieurs séries vers une autre bibliothèque"""
+    
+    def __init__(self, db_path=None, max_workers=4, verify='hash'):
+        """
+        Args:
+            db_path: Chemin de la base (par défaut celle de l'app)
+            max_workers: Nombre de fichiers copiés en parallèle
+            verify: 'hash' (taille + hash partiel) ou 'size'
+        """
+        self.db_path = db_path or current_app.config['DATABASE']
+        self.max_workers = max_workers
+        self.verify = verify
+    
+    def plan(self, series_ids, to_library_id, from_library_id=None):
+        """Prépare les transferts à partir de la base (une seule lecture)
+        
+        Returns:
+            Tuple (plans, errors) : plans = liste de dicts par série,
+            errors = liste de {'series_id', 'error'}
+        """
+        conn = sqlite3.connect(self.db_path, timeout=120.0)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, path FROM libraries WHERE id = ?', (to_library_id,))
+        to_library = cursor.fetchone()
+        if not to_library:
+            conn.close()
+            raise SeriesTransferError("Bibliothèque de destination introuvable")
+        
+        placeholders = ','.join('?' * len(series_ids))
+        cursor.execute(f'''
+            SELECT s.id, s.library_id, s.title, s.path, l.path AS library_path
+            FROM series s
+            JOIN libraries l ON l.id = s.library_id
+            WHERE s.id IN ({placeholders})
+        ''', list(series_ids))
+        rows = {row['id']: row for row in cursor.fetchall()}
+        conn.close()
+        
+        plans = []
+        errors = []
+        to_lib_path = to_library['path']
+        
+        for series_id in series_ids:
+            row = rows.get(series_id)
+            if not row:
+                errors.append({'series_id': series_id, 'error': 'Série non trouvée'})
+                continue
+            
+            if from_library_id is not None and row['library_id'] != from_library_id:
+                errors.append({'series_id': series_id, 'title': row['title'],
+                               'error': "La série n'appartient pas à cette bibliothèque"})
+                continue
+            
+            if row['library_id'] == to_library_id:
+                errors.append({'series_id': series_id, 'title': row['title'],
+                               'error': 'La série est déjà dans cette bibliothèque'})
+                continue
+            
+            # Si le chemin n'existe pas en BD, on le reconstruit
+            old_path = row['path'] or os.path.join(row['library_path'], row['title'])
+            new_path = os.path.join(to_lib_path, row['title'])
+            
+            if not os.path.isdir(old_path):
+                errors.append({'series_id': series_id, 'title': row['title'],
+                               'error': f"Le dossier de la série n'existe pas: {old_path}"})
+                continue
+            
+            if os.path.exists(new_path):
+                errors.append({'series_id': series_id, 'title': row['title'],
+                               'error': 'Une série avec ce nom existe déjà dans la destination'})
+                continue
+            
+            files = []
+            for root, _, filenames in os.walk(old_path):
+                for filename in filenames:
+                    src = os.path.join(root, filename)
+                    files.append((src, os.path.getsize(src)))
+            
+            plans.append({
+                'series_id': series_id,
+                'title': row['title'],
+                'old_path': old_path,
+                'new_path': new_path,
+                'to_library_id': to_library_id,
+                'to_library_path': to_lib_path,
+                'files': files,
+                'bytes': sum(size for _, size in files)
+            })
+        
+        return plans, errors
+    
+    def run(self, job, series_ids, to_library_id, from_library_id=None):
+        """Point d'entrée de la tâche de fond (voir background_jobs)"""
+        plans, errors = self.plan(series_ids, to_library_id, from_library_id)
+        
+        job.update(
+            force=True,
+            series_total=len(series_ids),
+            series_done=0,
+            files_total=sum(len(p['files']) for p in plans),
+            files_done=0,
+            bytes_total=sum(p['bytes'] for p in plans),
+            bytes_done=0,
+            current_series=None
+        )
+        
+        moved = []
+        for plan in plans:
+            job.update(current_series=plan['title'])
+            try:
+                method = self._move_series(plan, job)
+                moved.append(plan)
+                print(f"✓ Série transférée ({method}): {plan['title']} → {plan['new_path']}")
+            except Exception as e:
+                print(f"❌ Erreur transfert série {plan['title']}: {e}")
+                errors.append({'series_id': plan['series_id'], 'title': plan['title'], 'error': str(e)})
+            job.increment('series_done')
+        
+        if moved:
+            self._apply_db_updates(moved)
+        
+        job.update(force=True, current_series=None, series_done=len(series_ids))
+        
+        return {
+            'transferred': [
+                {'series_id': p['series_id'], 'title': p['title'], 'new_path': p['new_path']}
+                for p in moved
+            ],
+            'failed': errors,
+            'transferred_count': len(moved),
+            'failed_count': len(errors)
+        }
+    
+    def _move_series(self, plan, job):
+        """Déplace le dossier d'une série, retourne la méthode utilisée"""
+        os.makedirs(plan['to_library_path'], exist_ok=True)
+        
+        if same_filesystem(plan['old_path'], plan['to_library_path']):
+            os.rename(plan['old_path'], plan['new_path'])
+            job.increment('files_done', len(plan['files']))
+            job.increment('bytes_done', plan['bytes'])
+            return 'rename'
+        
+        self._copy_series(plan, job)
+        return 'copy'
+    
+    def _copy_series(self, plan, job):
+        """Copie vérifiée d'une série sur un autre disque puis suppression de la source"""
+        old_path = plan['old_path']
+        new_path = plan['new_path']
+        
+        os.makedirs(new_path)
+        try:
+            # Recréer l'arborescence avant de lancer les copies en parallèle
+            for root, dirs, _ in os.walk(old_path):
+                rel = os.path.relpath(root, old_path)
+                for d in dirs:
+                    os.makedirs(os.path.join(new_path, rel, d), exist_ok=True)
+            
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self._copy_file, src, os.path.join(new_path, os.path.relpath(src, old_path)), size): src
+                    for src, size in plan['files']
+                }
+                for future in as_completed(futures):
+                    size = future.result()
+                    job.increment('files_done')
+                    job.increment('bytes_done', size)
+        except Exception:
+            # La source est intacte : on retire la copie partielle
+            shutil.rmtree(new_path, ignore_errors=True)
+            raise
+        
+        try:
+            shutil.rmtree(old_path)
+        except OSError as e:
+            # La destination est complète et vérifiée, on garde le transfert
+            print(f"⚠️  Copie vérifiée mais suppression de la source incomplète ({old_path}): {e}")
+    
+    def _copy_file(self, src, dst, expected_size):
+        """Copie un fichier via un nom temporaire et vérifie la copie"""
+        tmp_dst = dst + '.part'
+        shutil.copyfile(src, tmp_dst)
+        shutil.copystat(src, tmp_dst)
+        
+        copied_size = os.path.getsize(tmp_dst)
+        if copied_size != expected_size:
+            os.remove(tmp_dst)
+            raise SeriesTransferError(
+                f"Taille différente après copie: {src} ({copied_size} != {expected_size})"
+            )
+        
+        if self.verify == 'hash' and partial_hash(src, expected_size) != partial_hash(tmp_dst, copied_size):
+            os.remove(tmp_dst)
+            raise SeriesTransferError(f"Hash différent après copie: {src}")
+        
+        os.replace(tmp_dst, dst)
+        return copied_size
+    
+    def _apply_db_updates(self, moved):
+        """Met à jour séries et volumes déplacés en une seule transaction"""
+        conn = sqlite3.connect(self.db_path, timeout=120.0)
+        try:
+            with conn:
+                conn.executemany('''
+                    UPDATE series SET library_id = ?, path = ? WHERE id = ?
+                ''', [(p['to_library_id'], p['new_path'], p['series_id']) for p in moved])
+                
+                # Remplacer le préfixe du chemin source par le chemin destination
+                conn.executemany('''
+                    UPDATE volumes
+                    SET filepath = ? || substr(filepath, length(?) + 1)
+                    WHERE series_id = ? AND substr(filepath, 1, length(?)) = ?
+                ''', [
+                    (p['new_path'], p['old_path'], p['series_id'], p['old_path'], p['old_path'])
+                    for p in moved
+                ])
+        finally:
+            conn.close()
@@ -91,7 +91,10 @@ class MissingVolumeDetector:
                 s.nautiljon_status,
                 l.name as library_name,
                 mnm.id as monitor_id,
-                mnm.enabled
+                mnm.enabled,
+                s.nautiljon_url,
+                s.nautiljon_year_start,
+                s.nautiljon_updated_at
             FROM series s
             JOIN libraries l ON s.library_id = l.id
             JOIN missing_volume_monitor mnm ON s.id = mnm.series_id
@@ -109,7 +112,10 @@ class MissingVolumeDetector:
                 'nautiljon_status': row[4],
                 'library_name': row[5],
                 'monitor_id': row[6],
-                'enabled': row[7]
+                'enabled': row[7],
+                'nautiljon_url': row[8],
+                'nautiljon_year_start': row[9],
+                'nautiljon_updated_at': row[10]
             })
         
         conn.close()
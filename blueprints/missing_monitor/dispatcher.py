@@ -0,0 +1,135 @@
+"""
+File d'envoi des téléchargements automatiques aux clients
+
+Les liens trouvés pendant une surveillance sont regroupés par client puis
+envoyés par lots (un appel torrents/add pour qBittorrent, une session
+amulecmd pour aMule) :
+
+- un lien ou un volume déjà envoyé avec succès depuis moins de dedup_days
+  (historique indexé) n'est pas renvoyé
+- un même lien n'est mis en file qu'une fois
+- un lot dont l'envoi échoue (client injoignable, timeout) est réessayé avec
+  un délai croissant (backoff exponentiel) ; un refus du client ne l'est pas
+"""
+import time
+from typing import Dict, List
+
+
+DEFAULT_DISPATCH_CONFIG = {
+    'batch_size': 20,
+    'max_attempts': 3,
+    'backoff_seconds': 2.0,
+    # Fenêtre (jours) de l'historique utilisée pour ne pas renvoyer un lien ou un volume
+    'dedup_days': 3
+}
+
+CLIENT_NAMES = {'qbittorrent': 'qBittorrent', 'amule': 'aMule'}
+
+
+class DownloadDispatcher:
+    """Regroupe les envois par client et les transmet par lots"""
+    
+    def __init__(self, downloader, config: Dict = None, sleep=time.sleep, telemetry=None):
+        """
+        Args:
+            downloader: MissingVolumeDownloader (envoi par lot et historique)
+            config: Réglages (batch_size, max_attempts, backoff_seconds, dedup_days)
+            sleep: Fonction d'attente entre deux tentatives
+            telemetry: RunTelemetry du passage (latence des envois par client)
+        """
+        config = dict(DEFAULT_DISPATCH_CONFIG, **(config or {}))
+        self.downloader = downloader
+        self.batch_size = max(1, int(config['batch_size']))
+        self.max_attempts = max(1, int(config['max_attempts']))
+        self.backoff_seconds = float(config['backoff_seconds'])
+        self.sleep = sleep
+        self.telemetry = telemetry
+        self.dedup_days = float(config['dedup_days'])
+        
+        # Volumes envoyés pendant ce passage (l'historique est consulté pour le reste)
+        self._sent = set()
+        self._queued_links = set()
+        self._queues = {}
+        self.errors = []
+        self.stats = {'queued': 0, 'duplicates': 0, 'sent': 0, 'failed': 0, 'batches': 0, 'retries': 0}
+    
+    def enqueue(self, link: str, title: str, volume_num: int,
+                client: str = None, category: str = None) -> bool:
+        """Met un lien en file (envoi immédiat du lot s'il est plein)
+        
+        Returns:
+            False si le lien est ignoré (vide, déjà en file ou volume déjà envoyé)
+        """
+        if not link:
+            return False
+        
+        if (link in self._queued_links or (title, volume_num) in self._sent
+                or self.downloader.already_sent(link, title, volume_num, self.dedup_days)):
+            self.stats['duplicates'] += 1
+            return False
+        
+        client = client or self.downloader.detect_client(link)
+        self._queued_links.add(link)
+        queue = self._queues.setdefault((client, category), [])
+        queue.append({'link': link, 'title': title, 'volume_num': volume_num})
+        self.stats['queued'] += 1
+        
+        if len(queue) >= self.batch_size:
+            self._flush_queue(client, category)
+        return True
+    
+    def flush(self) -> List[Dict]:
+        """Envoie tous les lots en attente
+        
+        Returns:
+            Liste des envois {'link', 'title', 'volume_num', 'client', 'success', 'message'}
+        """
+        results = []
+        for client, category in list(self._queues):
+            results.extend(self._flush_queue(client, category))
+        return results
+    
+    def _flush_queue(self, client: str, category: str) -> List[Dict]:
+        items = self._queues.pop((client, category), [])
+        if not items:
+            return []
+        
+        client_name = CLIENT_NAMES.get(client, client)
+        outcomes = {}
+        links = [item['link'] for item in items]
+        
+        for attempt in range(self.max_attempts):
+            if attempt:
+                # Backoff exponentiel avant de renvoyer le lot
+                self.stats['retries'] += 1
+                self.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+            
+            self.stats['batches'] += 1
+            start = time.perf_counter()
+            try:
+                outcomes.update(self.downloader.send_batch(client, links, category))
+                break
+            except Exception as e:
+                outcomes.update({link: (False, f"Erreur connexion {client_name}: {str(e)}") for link in links})
+            finally:
+                if self.telemetry is not None:
+                    self.telemetry.record_request(client, time.perf_counter() - start)
+        
+        results = []
+        for item in items:
+            success, detail = outcomes[item['link']]
+            if success:
+                msg = f"✅ {item['title']} Vol {item['volume_num']} envoyé à {client_name}"
+                self.stats['sent'] += 1
+                self._sent.add((item['title'], item['volume_num']))
+            else:
+                msg = f"Erreur {client_name}: {detail}"
+                self.stats['failed'] += 1
+                self.errors.append(f"Erreur envoi {client_name} pour {item['title']} vol {item['volume_num']}: {detail}")
+            
+            print(msg)
+            self.downloader._log_download(item['title'], item['volume_num'], client, success, msg,
+                                          link=item['link'])
+            results.append(dict(item, client=client, success=success, message=msg))
+        
+        return results
@@ -1,14 +1,20 @@
 """
 Envoi automatique des téléchargements aux clients (qBittorrent, aMule)
 """
-import requests
+import hashlib
 import json
+import sys
 from typing import Dict, List, Optional, Tuple
 from flask import current_app
 from datetime import datetime
 import sqlite3
 
 
+def link_hash(link: str) -> str:
+    """Empreinte d'un lien (clé indexée de l'historique, les magnets étant longs)"""
+    return hashlib.sha1(link.strip().encode('utf-8')).hexdigest()
+
+
 class MissingVolumeDownloader:
     """Envoie les téléchargements aux clients configurés"""
     
@@ -37,20 +43,23 @@ class MissingVolumeDownloader:
         
         # Auto-détection du client si non spécifié
         if not client:
-            # Déterminer le client selon le type de lien
-            if torrent_link.startswith('ed2k://'):
-                client = 'amule'
-            else:
-                # magnet:, http://, https://, etc. → qBittorrent
-                client = 'qbittorrent'
+            client = self.detect_client(torrent_link)
         
         if client not in self.clients:
             return False, f"Client inconnu: {client}"
         
+        client_name = 'qBittorrent' if client == 'qbittorrent' else 'aMule'
         try:
-            return self.clients[client](torrent_link, title, volume_num, category)
+            success, detail = self.send_batch(client, [torrent_link], category)[torrent_link]
         except Exception as e:
-            return False, f"Erreur {client}: {str(e)}"
+            success, detail = False, f"Erreur connexion {client_name}: {str(e)}"
+        
+        if success:
+            msg = f"✅ {title} Vol {volume_num} envoyé à {client_name}"
+        else:
+            msg = f"Erreur {client_name}: {detail}"
+        self._log_download(title, volume_num, client, success, msg, link=torrent_link)
+        return success, msg
     
     def _get_default_client(self) -> str:
         """Détermine le client par défaut (le premier actif)"""
@@ -73,119 +82,66 @@ class MissingVolumeDownloader:
         
         return 'qbittorrent'  # Par défaut
     
-    def _download_to_qbittorrent(self, torrent_link: str, title: str, 
-                                volume_num: int, category: str = None) -> Tuple[bool, str]:
-        """Envoie à qBittorrent en utilisant l'endpoint /api/qbittorrent/add"""
-        try:
-            import sys
-            
-            # Charger la catégorie par défaut si non fournie
-            if not category:
-                from ..qbittorrent.routes import load_qbittorrent_config
-                config = load_qbittorrent_config()
-                category = config.get('default_category', '')
-            
-            # Utiliser l'endpoint qBittorrent existant qui fonctionne déjà
-            payload = {
-                'torrent_url': torrent_link,
-            }
-            
-            # Ajouter la catégorie si configurée
-            if category:
-                payload['category'] = category
-            
-            print(f"[qBittorrent Download] Envoi à qBittorrent: {title} Vol {volume_num}", file=sys.stderr)
-            print(f"[qBittorrent Download] URL: {torrent_link[:80]}...", file=sys.stderr)
-            if category:
-                print(f"[qBittorrent Download] Catégorie: {category}", file=sys.stderr)
-            
-            response = requests.post(
-                'http://127.0.0.1:5000/api/qbittorrent/add',
-                json=payload,
-                timeout=30
-            )
+    def detect_client(self, torrent_link: str) -> str:
+        """Client selon le type de lien : ED2K → aMule, le reste → qBittorrent"""
+        if torrent_link.startswith('ed2k://'):
+            return 'amule'
+        # magnet:, http://, https://, etc. → qBittorrent
+        return 'qbittorrent'
+    
+    def send_batch(self, client: str, links: List[str], category: str = None) -> Dict[str, Tuple[bool, str]]:
+        """Envoie plusieurs liens au même client en un seul appel
+        
+        Args:
+            client: 'qbittorrent' ou 'amule'
+            links: Liens à ajouter
+            category: Catégorie (pour qBittorrent)
             
-            print(f"[qBittorrent Download] Réponse HTTP: {response.status_code}", file=sys.stderr)
+        Returns:
+            Dict {lien: (succès, message)}
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"[qBittorrent Download] Résultat: {result}", file=sys.stderr)
-                
-                if result.get('success'):
-                    msg = f"✅ {title} Vol {volume_num} envoyé à qBittorrent"
-                    self._log_download(title, volume_num, 'qbittorrent', True, msg)
-                    print(f"[qBittorrent Download] ✅ Succès", file=sys.stderr)
-                    return True, msg
-                else:
-                    error_msg = result.get('error', 'Erreur inconnue')
-                    msg = f"Erreur qBittorrent: {error_msg}"
-                    self._log_download(title, volume_num, 'qbittorrent', False, msg)
-                    print(f"[qBittorrent Download] ❌ {error_msg}", file=sys.stderr)
-                    return False, msg
-            else:
-                msg = f"Erreur qBittorrent: HTTP {response.status_code}"
-                self._log_download(title, volume_num, 'qbittorrent', False, msg)
-                print(f"[qBittorrent Download] ❌ HTTP {response.status_code}: {response.text[:200]}", file=sys.stderr)
-                return False, msg
+        Raises:
+            Exception: client injoignable (l'appelant peut réessayer)
+        """
+        if client not in self.clients:
+            return {link: (False, f"Client inconnu: {client}") for link in links}
+        return self.clients[client](links, category)
+    
+    def _download_to_qbittorrent(self, links: List[str], category: str = None) -> Dict[str, Tuple[bool, str]]:
+        """Envoie à qBittorrent (un seul appel torrents/add, session partagée)"""
+        from ..qbittorrent.routes import add_torrents
         
-        except Exception as e:
-            import sys
-            msg = f"Erreur connexion qBittorrent: {str(e)}"
-            self._log_download(title, volume_num, 'qbittorrent', False, msg)
-            print(f"[qBittorrent Download] ❌ Exception: {str(e)}", file=sys.stderr)
-            return False, msg
-
+        print(f"[qBittorrent Download] Envoi de {len(links)} torrent(s)", file=sys.stderr)
+        return add_torrents(links, category)
     
-    def _download_to_amule(self, torrent_link: str, title: str, 
-                          volume_num: int, category: str = None) -> Tuple[bool, str]:
-        """Envoie à aMule/eMule en utilisant l'endpoint /api/emule/add"""
-        try:
-            # Utiliser l'endpoint eMule existant qui fonctionne déjà
-            payload = {
-                'link': torrent_link,
-            }
-            
-            # Si on a une catégorie, on peut la passer (bien que aMule ne l'utilise pas)
-            if category:
-                payload['category'] = category
-            
-            response = requests.post(
-                'http://127.0.0.1:5000/api/emule/add',
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    msg = f"✅ {title} Vol {volume_num} envoyé à aMule"
-                    self._log_download(title, volume_num, 'amule', True, msg)
-                    return True, msg
-                else:
-                    error_msg = result.get('error', 'Erreur inconnue')
-                    msg = f"Erreur aMule: {error_msg}"
-                    self._log_download(title, volume_num, 'amule', False, msg)
-                    return False, msg
-            else:
-                msg = f"Erreur aMule: HTTP {response.status_code}"
-                self._log_download(title, volume_num, 'amule', False, msg)
-                return False, msg
+    def _download_to_amule(self, links: List[str], category: str = None) -> Dict[str, Tuple[bool, str]]:
+        """Envoie à aMule (une seule session amulecmd pour tous les liens)"""
+        from ..emule.routes import load_emule_config, add_ed2k_links
         
-        except Exception as e:
-            msg = f"Erreur connexion aMule: {str(e)}"
-            self._log_download(title, volume_num, 'amule', False, msg)
-            return False, msg
+        config = load_emule_config()
+        if not config.get('enabled'):
+            return {link: (False, 'aMule non activé') for link in links}
+        
+        success, error = add_ed2k_links(config, links)
+        message = 'Lien ajouté à aMule' if success else error
+        return {link: (success, message) for link in links}
     
     def _log_download(self, title: str, volume_num: int, client: str, 
-                     success: bool, message: str) -> bool:
+                     success: bool, message: str, link: str = None) -> bool:
         """Enregistre un événement de téléchargement dans la base de données
         
+        Un nouvel envoi du même lien pour le même tome met à jour la ligne
+        existante (index unique lien/série/tome) au lieu d'en ajouter une.
+        Un échec ne remplace pas un envoi réussi : seul le nombre d'envois
+        augmente, already_sent continue de voir le succès.
+        
         Args:
             title: Titre du manga
             volume_num: Numéro du volume
             client: Client utilisé
             success: Si succès ou erreur
             message: Message de détail
+            link: Lien envoyé
             
         Returns:
             True si enregistré
@@ -200,9 +156,16 @@ class MissingVolumeDownloader:
             
             cursor.execute('''
                 INSERT INTO missing_volume_downloads 
-                (title, volume_number, client, success, message, created_at)
-                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (title, volume_num, client, 1 if success else 0, message))
+                (title, volume_number, client, success, message, link, link_hash, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(link_hash, title, volume_number) DO UPDATE SET
+                    client = CASE WHEN excluded.success >= success THEN excluded.client ELSE client END,
+                    message = CASE WHEN excluded.success >= success THEN excluded.message ELSE message END,
+                    created_at = CASE WHEN excluded.success >= success THEN CURRENT_TIMESTAMP ELSE created_at END,
+                    success = MAX(success, excluded.success),
+                    attempts = attempts + 1
+            ''', (title, volume_num, client, 1 if success else 0, message,
+                  link, link_hash(link) if link else None))
             
             conn.commit()
             conn.close()
@@ -211,14 +174,51 @@ class MissingVolumeDownloader:
             print(f"Erreur log download: {e}")
             return False
     
-    def get_download_history(self, limit: int = 50) -> List[Dict]:
-        """Récupère l'historique des téléchargements
+    def already_sent(self, link: str, title: str, volume_num: int, days: float) -> bool:
+        """Vérifie si ce lien ou ce tome a été envoyé avec succès récemment
+        
+        Les deux conditions sont servies par les index de l'historique
+        (empreinte du lien, puis série/tome/date).
+        
+        Args:
+            link: Lien à envoyer
+            title: Titre du manga
+            volume_num: Numéro du volume
+            days: Fenêtre en jours
+            
+        Returns:
+            True si un envoi réussi existe dans la fenêtre
+        """
+        try:
+            db_path = current_app.config.get('DATABASE')
+            if not db_path:
+                return False
+            
+            since = f'-{int(float(days) * 86400)} seconds'
+            conn = sqlite3.connect(db_path, timeout=30.0)
+            row = conn.execute('''
+                SELECT 1 FROM missing_volume_downloads
+                WHERE link_hash = ? AND success = 1 AND created_at >= datetime('now', ?)
+                UNION ALL
+                SELECT 1 FROM missing_volume_downloads
+                WHERE title = ? AND volume_number = ? AND success = 1 AND created_at >= datetime('now', ?)
+                LIMIT 1
+            ''', (link_hash(link), since, title, volume_num, since)).fetchone()
+            conn.close()
+            return row is not None
+        except Exception as e:
+            print(f"Erreur récupération historique: {e}")
+            return False
+    
+    def get_download_history(self, limit: int = 50, before_id: int = None) -> List[Dict]:
+        """Récupère l'historique des téléchargements (pagination par curseur)
         
         Args:
             limit: Nombre maximum de records à retourner
+            before_id: Retourner uniquement les envois plus anciens que cet id
             
         Returns:
-            Liste historique
+            Liste historique, du plus récent au plus ancien
         """
         try:
             db_path = current_app.config.get('DATABASE')
@@ -229,12 +229,23 @@ class MissingVolumeDownloader:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT id, title, volume_number, client, success, message, created_at
-                FROM missing_volume_downloads
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (limit,))
+            # Pagination sur l'id, immuable : un renvoi modifie created_at d'une
+            # ligne existante, ce qui décalerait un curseur basé sur la date
+            if before_id:
+                cursor.execute('''
+                    SELECT id, title, volume_number, client, success, message, created_at, attempts
+                    FROM missing_volume_downloads
+                    WHERE id < ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                ''', (before_id, limit))
+            else:
+                cursor.execute('''
+                    SELECT id, title, volume_number, client, success, message, created_at, attempts
+                    FROM missing_volume_downloads
+                    ORDER BY id DESC
+                    LIMIT ?
+                ''', (limit,))
             
             history = []
             for row in cursor.fetchall():
@@ -245,7 +256,8 @@ class MissingVolumeDownloader:
                     'client': row[3],
                     'success': bool(row[4]),
                     'message': row[5],
-                    'created_at': row[6]
+                    'created_at': row[6],
+                    'attempts': row[7] or 1
                 })
             
             conn.close()
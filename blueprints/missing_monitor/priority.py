@@ -0,0 +1,161 @@
+"""
+Ordonnancement des recherches de volumes manquants par priorité
+
+Chaque couple (série, tome) reçoit un score calculé à partir de signaux
+pondérés (configurables dans monitor_missing_volumes.priority) :
+
+- ongoing : série en cours de publication sur Nautiljon
+- yield : part des tomes de la série trouvés lors des dernières recherches
+- next_volume : dernier tome paru d'une série en cours
+- staleness : temps écoulé depuis la dernière recherche du tome. Ce signal
+  multiplie les autres : un tome tout juste recherché passe en fin de file,
+  quelle que soit sa série, et les séries prioritaires reviennent plus tôt.
+
+La progression (dernière recherche de chaque tome) est enregistrée dans la
+base de la bibliothèque : un passage interrompu ou limité reprend par les
+tomes les moins récemment recherchés, au lieu de repartir de "A".
+"""
+import heapq
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+
+DEFAULT_PRIORITY_CONFIG = {
+    'weights': {
+        'ongoing': 2.0,
+        'yield': 1.5,
+        'next_volume': 3.0,
+        # Exposant appliqué à l'ancienneté (0..1) de la dernière recherche
+        'staleness': 1.0
+    },
+    # Âge (heures) à partir duquel un tome est considéré "jamais recherché"
+    'staleness_horizon_hours': 168,
+    # Nombre maximal de tomes recherchés par passage (0 = tous)
+    'max_volumes_per_run': 0
+}
+
+# Rendement supposé d'une série sans historique
+UNKNOWN_YIELD = 0.5
+
+
+def is_ongoing(series: Dict) -> bool:
+    """Série en cours de publication (statut Nautiljon non "Terminé")"""
+    status = series.get('nautiljon_status')
+    return bool(status) and not status.lower().startswith('termin')
+
+
+class SearchPrioritizer:
+    """File de priorité des recherches et progression persistée"""
+    
+    def __init__(self, db_path: str, config: Dict = None):
+        """
+        Args:
+            db_path: Base de la bibliothèque (table missing_monitor_progress)
+            config: Section monitor_missing_volumes.priority de la configuration
+        """
+        config = config or {}
+        self.db_path = db_path
+        self.weights = dict(DEFAULT_PRIORITY_CONFIG['weights'], **config.get('weights', {}))
+        self.staleness_horizon_hours = float(
+            config.get('staleness_horizon_hours', DEFAULT_PRIORITY_CONFIG['staleness_horizon_hours'])
+        ) or 1.0
+        self.max_volumes_per_run = int(
+            config.get('max_volumes_per_run', DEFAULT_PRIORITY_CONFIG['max_volumes_per_run'])
+        )
+        self.create_table()
+    
+    def connect_db(self):
+        return sqlite3.connect(self.db_path, timeout=30.0)
+    
+    def create_table(self):
+        """Crée la table de progression (dernière recherche de chaque tome)"""
+        conn = self.connect_db()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS missing_monitor_progress (
+                series_id INTEGER NOT NULL,
+                volume INTEGER NOT NULL,
+                last_searched TIMESTAMP NOT NULL,
+                last_results INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (series_id, volume)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+    
+    def load_progress(self) -> Dict[Tuple[int, int], Tuple[str, int]]:
+        """Retourne {(series_id, tome): (last_searched, last_results)}"""
+        conn = self.connect_db()
+        rows = conn.execute(
+            'SELECT series_id, volume, last_searched, last_results FROM missing_monitor_progress'
+        ).fetchall()
+        conn.close()
+        return {(row[0], row[1]): (row[2], row[3]) for row in rows}
+    
+    def _staleness(self, last_searched: str, now: datetime) -> float:
+        if not last_searched:
+            return 1.0
+        try:
+            age = now - datetime.strptime(last_searched, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return 1.0
+        return min(max(age.total_seconds() / 3600.0 / self.staleness_horizon_hours, 0.0), 1.0)
+    
+    def plan(self, series_list: List[Dict]) -> List[Tuple[float, Dict, int]]:
+        """Ordonne les tomes manquants par priorité décroissante
+        
+        Args:
+            series_list: Séries de MissingVolumeDetector.get_monitored_series()
+        
+        Returns:
+            Liste [(score, série, tome)] limitée à max_volumes_per_run
+        """
+        progress = self.load_progress()
+        now = datetime.utcnow()
+        heap = []
+        
+        for series in series_list:
+            series_id = series['series_id']
+            volumes = series['missing_volumes']
+            if not volumes:
+                continue
+            
+            ongoing = is_ongoing(series)
+            
+            # Rendement récent : tomes de la série trouvés lors de leur dernière recherche
+            history = [progress[(series_id, vol)][1] for vol in volumes if (series_id, vol) in progress]
+            series_yield = (
+                sum(1 for found in history if found > 0) / len(history) if history else UNKNOWN_YIELD
+            )
+            latest_volume = max(volumes)
+            
+            for vol in volumes:
+                last_searched = progress.get((series_id, vol), (None, 0))[0]
+                score = (
+                    1.0
+                    + self.weights['ongoing'] * ongoing
+                    + self.weights['yield'] * series_yield
+                    + self.weights['next_volume'] * (ongoing and vol == latest_volume)
+                ) * self._staleness(last_searched, now) ** self.weights['staleness']
+                # Tas min : score négatif ; titre et tome départagent de façon stable
+                heapq.heappush(heap, (-score, last_searched or '', series['title'], vol, series_id, series))
+        
+        limit = self.max_volumes_per_run if self.max_volumes_per_run > 0 else len(heap)
+        plan = []
+        while heap and len(plan) < limit:
+            neg_score, _, _, vol, _, series = heapq.heappop(heap)
+            plan.append((-neg_score, series, vol))
+        return plan
+    
+    def record(self, series_id: int, volume: int, result_count: int):
+        """Enregistre la recherche d'un tome (appelé dès que le tome est traité)"""
+        conn = self.connect_db()
+        conn.execute('''
+            INSERT INTO missing_monitor_progress (series_id, volume, last_searched, last_results)
+            VALUES (?, ?, CURRENT_TIMESTAMP, ?)
+            ON CONFLICT(series_id, volume) DO UPDATE SET
+                last_searched = CURRENT_TIMESTAMP,
+                last_results = excluded.last_results
+        ''', (series_id, volume, result_count))
+        conn.commit()
+        conn.close()
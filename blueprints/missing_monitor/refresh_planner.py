@@ -0,0 +1,111 @@
+"""
+Planification des rafraîchissements Nautiljon pour la détection de nouveaux volumes
+
+Une fiche Nautiljon coûte une à deux requêtes (recherche + fiche) suivies
+chacune de 5 s de pause : la vérification ne porte donc que sur les séries
+dont un nouveau tome est plausible.
+
+- séries terminées : jamais rafraîchies (le total stocké fait foi)
+- séries en cours : intervalle déduit du rythme de parution
+  (années de publication / nombre de tomes), borné par min/max_interval_days
+- séries en pause ou abandonnées : max_interval_days
+- séries jamais rafraîchies : en premier
+
+Les séries non rafraîchies restent comparées au total Nautiljon stocké.
+"""
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+
+DEFAULT_REFRESH_CONFIG = {
+    'min_interval_days': 7,
+    'max_interval_days': 90,
+    # Fraction de l'intervalle moyen entre deux tomes avant de revérifier
+    'cadence_factor': 0.5,
+    # Nombre maximal de fiches Nautiljon récupérées par passage (0 = toutes)
+    'max_checks_per_run': 0
+}
+
+PAUSED_STATUSES = ('pause', 'abandon', 'arrêt', 'suspendu')
+
+
+def is_finished(status: str) -> bool:
+    """Statut Nautiljon "Terminé" """
+    return bool(status) and status.lower().startswith('termin')
+
+
+class NautiljonRefreshPlanner:
+    """Choisit les séries dont la fiche Nautiljon doit être rafraîchie"""
+    
+    def __init__(self, config: Dict = None):
+        """
+        Args:
+            config: Section monitor_new_volumes.refresh de la configuration
+        """
+        config = dict(DEFAULT_REFRESH_CONFIG, **(config or {}))
+        self.min_interval_days = float(config['min_interval_days'])
+        self.max_interval_days = max(float(config['max_interval_days']), self.min_interval_days)
+        self.cadence_factor = float(config['cadence_factor'])
+        self.max_checks_per_run = int(config['max_checks_per_run'])
+    
+    def refresh_interval_days(self, series: Dict, now: datetime) -> float:
+        """Intervalle de rafraîchissement d'une série non terminée"""
+        status = (series.get('nautiljon_status') or '').lower()
+        if any(word in status for word in PAUSED_STATUSES):
+            return self.max_interval_days
+        
+        total = series.get('nautiljon_total_volumes') or 0
+        year_start = series.get('nautiljon_year_start')
+        if not total or not year_start or year_start > now.year:
+            return self.min_interval_days
+        
+        # Rythme moyen de parution depuis le début de la publication
+        days_per_volume = (now.year - year_start + 1) * 365.0 / total
+        interval = days_per_volume * self.cadence_factor
+        return min(max(interval, self.min_interval_days), self.max_interval_days)
+    
+    def plan(self, series_list: List[Dict], now: datetime = None) -> Tuple[List[Dict], Dict[str, int]]:
+        """Sépare les séries à rafraîchir des autres
+        
+        Args:
+            series_list: Séries de MissingVolumeDetector.get_series_for_new_volume_check()
+            now: Date de référence (UTC, comme CURRENT_TIMESTAMP)
+        
+        Returns:
+            (séries à rafraîchir, les plus en retard d'abord ;
+             compteurs {'finished', 'not_due', 'deferred'} des séries ignorées)
+        """
+        now = now or datetime.utcnow()
+        skipped = {'finished': 0, 'not_due': 0, 'deferred': 0}
+        due = []
+        
+        for series in series_list:
+            if is_finished(series.get('nautiljon_status')) and series.get('nautiljon_total_volumes'):
+                skipped['finished'] += 1
+                continue
+            
+            updated_at = series.get('nautiljon_updated_at')
+            if not updated_at:
+                due.append((float('inf'), series))
+                continue
+            
+            try:
+                age_days = (now - datetime.strptime(updated_at[:19], '%Y-%m-%d %H:%M:%S')).total_seconds() / 86400
+            except ValueError:
+                due.append((float('inf'), series))
+                continue
+            
+            # Retard relatif : 1.0 = tout juste dû
+            interval = self.refresh_interval_days(series, now)
+            overdue = age_days / interval if interval > 0 else float('inf')
+            if overdue >= 1.0:
+                due.append((overdue, series))
+            else:
+                skipped['not_due'] += 1
+        
+        due.sort(key=lambda item: -item[0])
+        if self.max_checks_per_run > 0 and len(due) > self.max_checks_per_run:
+            skipped['deferred'] = len(due) - self.max_checks_per_run
+            due = due[:self.max_checks_per_run]
+        
+        return [series for _, series in due], skipped
@@ -3,47 +3,139 @@ Gestionnaire de throttling pour limiter les requêtes aux sources externes (Prow
 """
 import time
 from typing import Callable, Any, Dict, List
-from datetime import datetime, timedelta
+from datetime import timedelta
 import threading
 from functools import wraps
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+
+from config import Config
+from token_bucket import TokenBucket
+
+
+# Base du cache des recherches (partagée entre les workers)
+SEARCH_CACHE_DB = os.path.join(Config.DATA_DIR, 'search_cache.db')
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+class _SourceBucket(TokenBucket):
+    """Seau à jetons d'une source (`burst` requêtes en rafale) et ses métriques d'attente"""
+    
+    def __init__(self, requests_per_minute: float, burst: int, clock: Callable[[], float],
+                 sleep: Callable[[float], Any]):
+        super().__init__(requests_per_minute / 60.0, burst, clock=clock, sleep=sleep)
+        self.stats = {
+            'requests': 0,
+            'immediate': 0,
+            'waited': 0,
+            'rejected': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0
+        }
+    
+    @property
+    def requests_per_minute(self) -> float:
+        return self.rate * 60.0
 
 
 class RequestThrottler:
-    """Limite le nombre de requêtes vers les sources externes"""
+    """Limite le nombre de requêtes vers les sources externes (seau à jetons par source)
+    
+    Chaque source a son propre seau : rafale de `burst` requêtes, puis un débit
+    de `requests_per_minute`. Une requête qui doit attendre réserve son jeton
+    sous le verrou de sa source, puis attend hors de tout verrou : les autres
+    threads et les autres sources ne sont jamais bloqués par une attente.
+    """
     
-    def __init__(self, requests_per_minute: int = 6):
+    def __init__(self, requests_per_minute: int = 6, burst: int = 1,
+                 rates: Dict[str, Dict] = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Any] = time.sleep):
         """
         Initialise le throttler
         
         Args:
-            requests_per_minute: Nombre maximal de requêtes par minute
+            requests_per_minute: Débit par défaut des sources sans réglage propre
+            burst: Nombre de requêtes autorisées en rafale par défaut
+            rates: Réglages par source ({source: {'requests_per_minute', 'burst'}})
+            clock: Horloge monotone en secondes (remplaçable par une horloge factice)
+            sleep: Fonction d'attente associée à l'horloge
         """
         self.requests_per_minute = requests_per_minute
-        self.min_interval = 60.0 / requests_per_minute  # Délai minimum entre requêtes
-        self.last_request_time = {}  # Par source
-        self.request_queue = {}  # Requêtes en attente par source
+        self.burst = max(1, int(burst))
+        self.min_interval = 60.0 / requests_per_minute  # Délai moyen entre requêtes
+        self.clock = clock
+        self.sleep = sleep
+        self.rates = {}
+        self._buckets = {}
+        # Protège uniquement le registre des seaux (jamais tenu pendant une attente)
         self.lock = threading.Lock()
+        self.configure(rates or {})
     
-    def wait_if_needed(self, source: str):
+    def _bucket(self, source: str) -> _SourceBucket:
+        with self.lock:
+            bucket = self._buckets.get(source)
+            if bucket is None:
+                rate = self.rates.get(source, {})
+                bucket = _SourceBucket(
+                    rate.get('requests_per_minute', self.requests_per_minute),
+                    rate.get('burst', self.burst),
+                    self.clock,
+                    self.sleep
+                )
+                self._buckets[source] = bucket
+            return bucket
+    
+    def reserve(self, source: str) -> float:
+        """Réserve un jeton et retourne le délai (secondes) avant de pouvoir l'utiliser"""
+        bucket = self._bucket(source)
+        wait_time = bucket.reserve()
+        with bucket.lock:
+            bucket.stats['requests'] += 1
+            if wait_time > 0:
+                bucket.stats['waited'] += 1
+                bucket.stats['total_wait_seconds'] += wait_time
+                bucket.stats['max_wait_seconds'] = max(bucket.stats['max_wait_seconds'], wait_time)
+            else:
+                bucket.stats['immediate'] += 1
+        return wait_time
+    
+    def wait_if_needed(self, source: str) -> float:
         """Attend si nécessaire avant d'effectuer une requête
         
         Args:
             source: Nom de la source (prowlarr, ebdz, etc.)
-        """
-        with self.lock:
-            current_time = time.time()
-            
-            if source not in self.last_request_time:
-                self.last_request_time[source] = 0
-            
-            last_time = self.last_request_time[source]
-            time_since_last = current_time - last_time
             
-            if time_since_last < self.min_interval:
-                wait_time = self.min_interval - time_since_last
-                time.sleep(wait_time)
-            
-            self.last_request_time[source] = time.time()
+        Returns:
+            Temps d'attente effectif en secondes
+        """
+        wait_time = self.reserve(source)
+        if wait_time > 0:
+            self.sleep(wait_time)
+        return wait_time
+    
+    def try_acquire(self, source: str) -> bool:
+        """Prend un jeton s'il est disponible, sans jamais attendre
+        
+        Returns:
+            True si la requête peut partir tout de suite
+        """
+        bucket = self._bucket(source)
+        acquired = bucket.try_acquire()
+        with bucket.lock:
+            if not acquired:
+                bucket.stats['rejected'] += 1
+                return False
+            bucket.stats['requests'] += 1
+            bucket.stats['immediate'] += 1
+            return True
+    
+    def time_until_available(self, source: str) -> float:
+        """Délai (secondes) avant qu'un jeton soit disponible, sans le prendre"""
+        return self._bucket(source).time_until_available()
     
     def can_request(self, source: str) -> bool:
         """Vérifie si on peut faire une requête sans throttling
@@ -54,60 +146,170 @@ class RequestThrottler:
         Returns:
             True si on peut faire une requête
         """
-        with self.lock:
-            current_time = time.time()
-            
-            if source not in self.last_request_time:
-                return True
-            
-            last_time = self.last_request_time[source]
-            time_since_last = current_time - last_time
-            
-            return time_since_last >= self.min_interval
+        return self.time_until_available(source) == 0
     
-    def set_request_rate(self, source: str, requests_per_minute: int):
+    def set_request_rate(self, source: str, requests_per_minute: int, burst: int = None):
         """Configure le taux de requêtes pour une source spécifique
         
         Args:
             source: Nom de la source
             requests_per_minute: Taux pour cette source
+            burst: Requêtes autorisées en rafale (inchangé si None)
         """
         with self.lock:
-            if source not in self.request_queue:
-                self.request_queue[source] = {
-                    'rate': 60.0 / requests_per_minute,
-                    'last_time': 0
-                }
-            else:
-                self.request_queue[source]['rate'] = 60.0 / requests_per_minute
+            rate = self.rates.setdefault(source, {})
+            rate['requests_per_minute'] = requests_per_minute
+            if burst is not None:
+                rate['burst'] = max(1, int(burst))
+            bucket = self._buckets.get(source)
+        
+        if bucket is not None:
+            bucket.set_rate(requests_per_minute / 60.0, rate.get('burst', bucket.capacity))
+    
+    def configure(self, rates: Dict[str, Dict]):
+        """Applique les réglages par source de la configuration
+        
+        Args:
+            rates: {source: {'requests_per_minute': int, 'burst': int}}
+        """
+        for source, rate in rates.items():
+            if rate.get('requests_per_minute'):
+                self.set_request_rate(source, rate['requests_per_minute'], rate.get('burst'))
+    
+    def stats(self) -> Dict:
+        """Métriques d'attente par source"""
+        with self.lock:
+            buckets = dict(self._buckets)
+        
+        by_source = {}
+        for source, bucket in buckets.items():
+            tokens_available = bucket.available()
+            with bucket.lock:
+                stats = dict(bucket.stats)
+                stats['requests_per_minute'] = bucket.requests_per_minute
+                stats['burst'] = int(bucket.capacity)
+            stats['tokens_available'] = round(tokens_available, 2)
+            stats['avg_wait_seconds'] = (
+                round(stats['total_wait_seconds'] / stats['waited'], 3) if stats['waited'] else 0.0
+            )
+            stats['total_wait_seconds'] = round(stats['total_wait_seconds'], 3)
+            stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 3)
+            by_source[source] = stats
+        
+        return {
+            'default_requests_per_minute': self.requests_per_minute,
+            'default_burst': self.burst,
+            'by_source': by_source
+        }
 
 
 class SearchResultCache:
-    """Cache simple pour les résultats de recherche"""
+    """Cache persistant (SQLite) des résultats de recherche
+    
+    Partagé entre les processus (workers gunicorn) et conservé au
+    redémarrage. Les recherches sans résultat sont aussi mises en cache
+    (cache négatif, durée plus courte). Taille bornée : les entrées les moins
+    récemment lues sont supprimées au-delà de `max_entries`.
+    
+    Les lectures n'écrivent pas dans la base : dates de dernière lecture et
+    compteurs sont accumulés en mémoire puis enregistrés par lot lors d'un
+    set(), d'un stats() ou au plus tard toutes les FLUSH_INTERVAL secondes.
+    """
+    
+    # Délai maximal avant l'enregistrement des lectures accumulées (secondes)
+    FLUSH_INTERVAL = 30
     
-    def __init__(self, cache_duration_minutes: int = 60):
+    def __init__(self, cache_duration_minutes: int = 60, db_path: str = SEARCH_CACHE_DB,
+                 source_ttls: Dict[str, int] = None, negative_ttls: Dict[str, int] = None,
+                 negative_duration_minutes: int = 15, max_entries: int = 5000):
         """
         Initialise le cache
         
         Args:
-            cache_duration_minutes: Durée de vie du cache en minutes
+            cache_duration_minutes: Durée de vie par défaut des résultats (minutes)
+            db_path: Base SQLite du cache
+            source_ttls: Durée de vie des résultats par source ({source: minutes})
+            negative_ttls: Durée de vie des recherches sans résultat par source
+            negative_duration_minutes: Durée par défaut des recherches sans résultat
+            max_entries: Nombre maximal d'entrées (éviction LRU)
         """
         self.cache_duration = timedelta(minutes=cache_duration_minutes)
-        self.cache = {}  # {cache_key: (results, timestamp)}
+        self.db_path = db_path
+        self.source_ttls = source_ttls or {}
+        self.negative_ttls = negative_ttls or {}
+        self.negative_duration = timedelta(minutes=negative_duration_minutes)
+        self.max_entries = max_entries
         self.lock = threading.Lock()
+        self._initialized = False
+        # Lectures pas encore enregistrées : {cache_key: last_access} et {source: {compteur: n}}
+        self._pending_access = {}
+        self._pending_counts = {}
+        self._last_flush = time.time()
+    
+    def _connect(self):
+        if not self._initialized:
+            with self.lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, timeout=30.0)
+                    self._init_db(conn)
+                    self._initialized = True
+                    return conn
+        return sqlite3.connect(self.db_path, timeout=30.0)
+    
+    def _init_db(self, conn):
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache (
+                cache_key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                results TEXT NOT NULL,
+                is_negative INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache (last_access)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache (expires_at)')
+        # Compteurs partagés entre processus
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache_stats (
+                source TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                negative_hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.commit()
+    
+    @staticmethod
+    def normalize_title(title: str) -> str:
+        """Titre normalisé : minuscules, sans accents ni ponctuation"""
+        title = unicodedata.normalize('NFKD', title or '')
+        title = ''.join(c for c in title if not unicodedata.combining(c)).lower()
+        return _NON_ALNUM_RE.sub(' ', title).strip()
     
     def generate_key(self, source: str, title: str, volume_num: int) -> str:
         """Génère une clé de cache
         
         Args:
             source: Source de recherche
-            title: Titre du manga
+            title: Titre du manga (normalisé : "One-Piece" et "one piece" partagent l'entrée)
             volume_num: Numéro du volume
             
         Returns:
             Clé de cache
         """
-        return f"{source}:{title.lower()}:vol{volume_num}"
+        return f"{source}:{self.normalize_title(title)}:vol{volume_num}"
+    
+    def ttl_for(self, source: str, negative: bool = False) -> timedelta:
+        """Durée de vie d'une entrée selon la source et le résultat"""
+        if negative:
+            minutes = self.negative_ttls.get(source)
+            return timedelta(minutes=minutes) if minutes is not None else self.negative_duration
+        minutes = self.source_ttls.get(source)
+        return timedelta(minutes=minutes) if minutes is not None else self.cache_duration
     
     def get(self, key: str) -> Any:
         """Récupère une valeur du cache
@@ -116,44 +318,172 @@ class SearchResultCache:
             key: Clé de cache
             
         Returns:
-            Résultats ou None si expiré/non trouvé
+            Résultats (liste vide pour une recherche sans résultat) ou None
+            si expiré/non trouvé
         """
+        source = key.split(':', 1)[0]
+        now = time.time()
+        
+        conn = self._connect()
+        try:
+            # Lecture seule : les entrées expirées sont supprimées par _evict
+            row = conn.execute(
+                'SELECT results, is_negative, expires_at FROM search_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+        
+        if row is None or row[2] <= now:
+            self._record(source, 'misses', now)
+            return None
+        
+        self._record(source, 'negative_hits' if row[1] else 'hits', now, key)
+        return json.loads(row[0])
+    
+    def _record(self, source: str, counter: str, now: float, key: str = None):
+        """Accumule une lecture en mémoire (enregistrée par lot)"""
         with self.lock:
-            if key not in self.cache:
-                return None
-            
-            results, timestamp = self.cache[key]
-            
-            if datetime.now() - timestamp > self.cache_duration:
-                del self.cache[key]
-                return None
-            
-            return results
+            if key is not None:
+                self._pending_access[key] = now
+            counts = self._pending_counts.setdefault(source, {})
+            counts[counter] = counts.get(counter, 0) + 1
+            due = now - self._last_flush >= self.FLUSH_INTERVAL
+        
+        if due:
+            conn = self._connect()
+            try:
+                with conn:
+                    self._flush(conn)
+            except sqlite3.Error as e:
+                print(f"⚠️  Impossible d'enregistrer les statistiques du cache: {e}")
+            finally:
+                conn.close()
+    
+    def _flush(self, conn):
+        """Enregistre les lectures accumulées dans la transaction en cours"""
+        with self.lock:
+            access, self._pending_access = self._pending_access, {}
+            counts, self._pending_counts = self._pending_counts, {}
+            self._last_flush = time.time()
+        
+        if access:
+            conn.executemany(
+                'UPDATE search_cache SET last_access = MAX(last_access, ?) WHERE cache_key = ?',
+                [(last_access, key) for key, last_access in access.items()]
+            )
+        if counts:
+            conn.executemany('''
+                INSERT INTO search_cache_stats (source, hits, negative_hits, misses) VALUES (?, ?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET
+                    hits = hits + excluded.hits,
+                    negative_hits = negative_hits + excluded.negative_hits,
+                    misses = misses + excluded.misses
+            ''', [
+                (source, c.get('hits', 0), c.get('negative_hits', 0), c.get('misses', 0))
+                for source, c in counts.items()
+            ])
     
     def set(self, key: str, results: List[Dict]):
         """Stocke une valeur dans le cache
         
         Args:
             key: Clé de cache
-            results: Résultats à cacher
+            results: Résultats à cacher (une liste vide est mise en cache
+                     avec la durée de vie négative)
         """
-        with self.lock:
-            self.cache[key] = (results, datetime.now())
+        source = key.split(':', 1)[0]
+        negative = not results
+        now = time.time()
+        expires_at = now + self.ttl_for(source, negative).total_seconds()
+        
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('''
+                    INSERT INTO search_cache (cache_key, source, results, is_negative, created_at, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        results = excluded.results,
+                        is_negative = excluded.is_negative,
+                        created_at = excluded.created_at,
+                        expires_at = excluded.expires_at,
+                        last_access = excluded.last_access
+                ''', (key, source, json.dumps(results or []), int(negative), now, expires_at, now))
+                # Dates de lecture à jour avant l'éviction LRU
+                self._flush(conn)
+                self._evict(conn, now)
+        finally:
+            conn.close()
+    
+    def _evict(self, conn, now: float):
+        """Supprime les entrées expirées puis les moins récemment lues au-delà de la limite"""
+        conn.execute('DELETE FROM search_cache WHERE expires_at <= ?', (now,))
+        excess = conn.execute('SELECT COUNT(*) FROM search_cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('''
+                DELETE FROM search_cache WHERE cache_key IN (
+                    SELECT cache_key FROM search_cache ORDER BY last_access LIMIT ?
+                )
+            ''', (excess,))
     
     def clear(self):
         """Vide le cache"""
         with self.lock:
-            self.cache.clear()
+            self._pending_access.clear()
+            self._pending_counts.clear()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM search_cache')
+                conn.execute('DELETE FROM search_cache_stats')
+        finally:
+            conn.close()
     
     def stats(self) -> Dict:
-        """Retourne des stats sur le cache"""
-        with self.lock:
-            return {
-                'total_entries': len(self.cache),
-                'cache_size_bytes': sum(
-                    len(str(results)) for results, _ in self.cache.values()
-                )
+        """Retourne des stats sur le cache (taux de succès par source)"""
+        conn = self._connect()
+        try:
+            with conn:
+                self._flush(conn)
+            entries = {
+                row[0]: {'entries': row[1], 'negative_entries': row[2], 'size': row[3]}
+                for row in conn.execute('''
+                    SELECT source, COUNT(*), SUM(is_negative), SUM(LENGTH(results))
+                    FROM search_cache WHERE expires_at > ? GROUP BY source
+                ''', (time.time(),))
+            }
+            counters = {
+                row[0]: {'hits': row[1], 'negative_hits': row[2], 'misses': row[3]}
+                for row in conn.execute('SELECT source, hits, negative_hits, misses FROM search_cache_stats')
             }
+        finally:
+            conn.close()
+        
+        by_source = {}
+        for source in sorted(set(entries) | set(counters)):
+            counts = counters.get(source, {'hits': 0, 'negative_hits': 0, 'misses': 0})
+            lookups = counts['hits'] + counts['negative_hits'] + counts['misses']
+            by_source[source] = {
+                'entries': entries.get(source, {}).get('entries', 0),
+                'negative_entries': entries.get(source, {}).get('negative_entries', 0),
+                **counts,
+                'hit_rate': round((counts['hits'] + counts['negative_hits']) / lookups, 3) if lookups else None,
+                'ttl_minutes': self.ttl_for(source).total_seconds() / 60,
+                'negative_ttl_minutes': self.ttl_for(source, negative=True).total_seconds() / 60
+            }
+        
+        hits = sum(s['hits'] + s['negative_hits'] for s in by_source.values())
+        lookups = hits + sum(s['misses'] for s in by_source.values())
+        return {
+            'total_entries': sum(e['entries'] for e in entries.values()),
+            'negative_entries': sum(e['negative_entries'] or 0 for e in entries.values()),
+            'cache_size_bytes': sum(e['size'] or 0 for e in entries.values()),
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': lookups - hits,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            'by_source': by_source
+        }
 
 
 class SmartSearchOptimizer:
@@ -4,12 +4,17 @@ Routes API pour la surveillance des volumes manquants
 from flask import request, jsonify, current_app
 from flask_login import login_required
 from . import missing_monitor_bp
+import copy
 import sqlite3
 import json
 from datetime import datetime
 from .detector import MissingVolumeDetector
 from .searcher import MissingVolumeSearcher
 from .downloader import MissingVolumeDownloader
+from .dispatcher import DEFAULT_DISPATCH_CONFIG
+from .priority import DEFAULT_PRIORITY_CONFIG
+from .refresh_planner import DEFAULT_REFRESH_CONFIG
+from .telemetry import RunTelemetryStore
 from .scheduler import MissingVolumeScheduler, monitor_manager
 
 
@@ -62,7 +67,8 @@ def get_default_monitor_config():
             'auto_download_enabled': False,
             'search_sources': ['ebdz', 'prowlarr'],
             'check_interval': 12,  # Par défaut 12 heures
-            'check_interval_unit': 'hours'  # Par défaut en heures
+            'check_interval_unit': 'hours',  # Par défaut en heures
+            'priority': copy.deepcopy(DEFAULT_PRIORITY_CONFIG)  # Ordre des recherches (priority.py)
         },
         'monitor_new_volumes': {
             'enabled': False,
@@ -71,11 +77,18 @@ def get_default_monitor_config():
             'check_nautiljon_updates': True,
             'search_sources': ['ebdz', 'prowlarr'],
             'check_interval': 6,  # Par défaut 6 heures
-            'check_interval_unit': 'hours'  # Par défaut en heures
+            'check_interval_unit': 'hours',  # Par défaut en heures
+            'refresh': dict(DEFAULT_REFRESH_CONFIG)  # Fiches Nautiljon à revérifier (refresh_planner.py)
         },
         'search_sources': ['ebdz', 'prowlarr'],
         'auto_download_enabled': False,
-        'preferred_client': 'qbittorrent'
+        'preferred_client': 'qbittorrent',
+        # Débit des sources distantes (seau à jetons : rafale puis requêtes/minute)
+        'request_rates': {
+            'prowlarr': {'requests_per_minute': 30, 'burst': 3}
+        },
+        # Envoi groupé aux clients (dispatcher.py)
+        'download_dispatch': dict(DEFAULT_DISPATCH_CONFIG)
     }
 
 
@@ -253,17 +266,21 @@ def monitor_config():
             
             # Mettre à jour la configuration des volumes manquants
             missing_config = data.get('monitor_missing_volumes', {})
+            previous_priority = config.get('monitor_missing_volumes', {}).get('priority', DEFAULT_PRIORITY_CONFIG)
             config['monitor_missing_volumes'] = {
                 'enabled': missing_config.get('enabled', True),
                 'search_enabled': missing_config.get('search_enabled', True),
                 'auto_download_enabled': missing_config.get('auto_download_enabled', False),
                 'search_sources': missing_config.get('search_sources', ['ebdz', 'prowlarr']),
                 'check_interval': int(missing_config.get('check_interval', 12)),
-                'check_interval_unit': missing_config.get('check_interval_unit', 'hours')
+                'check_interval_unit': missing_config.get('check_interval_unit', 'hours'),
+                # Non exposée dans l'interface : conservée telle qu'enregistrée
+                'priority': missing_config.get('priority', previous_priority)
             }
             
             # Mettre à jour la configuration des nouveaux volumes
             new_config = data.get('monitor_new_volumes', {})
+            previous_refresh = config.get('monitor_new_volumes', {}).get('refresh', DEFAULT_REFRESH_CONFIG)
             config['monitor_new_volumes'] = {
                 'enabled': new_config.get('enabled', False),
                 'search_enabled': new_config.get('search_enabled', True),
@@ -271,7 +288,9 @@ def monitor_config():
                 'check_nautiljon_updates': new_config.get('check_nautiljon_updates', True),
                 'search_sources': new_config.get('search_sources', ['ebdz', 'prowlarr']),
                 'check_interval': int(new_config.get('check_interval', 6)),
-                'check_interval_unit': new_config.get('check_interval_unit', 'hours')
+                'check_interval_unit': new_config.get('check_interval_unit', 'hours'),
+                # Non exposée dans l'interface : conservée telle qu'enregistrée
+                'refresh': new_config.get('refresh', previous_refresh)
             }
             
             if save_monitor_config(config):
@@ -344,8 +363,9 @@ def configure_series_monitor(series_id):
         cursor = conn.cursor()
         
         # Vérifier que la série existe
-        cursor.execute('SELECT id FROM series WHERE id = ?', (series_id,))
-        if not cursor.fetchone():
+        cursor.execute('SELECT id, title FROM series WHERE id = ?', (series_id,))
+        series_row = cursor.fetchone()
+        if not series_row:
             conn.close()
             return jsonify({'success': False, 'error': 'Série introuvable'}), 404
         
@@ -376,6 +396,10 @@ def configure_series_monitor(series_id):
         conn.commit()
         conn.close()
         
+        # Correspondances ed2k de la série calculées dès sa mise en surveillance
+        from blueprints.ebdz.catalog import register_series
+        register_series(current_app.config['DB_FILE'], series_id, series_row[1])
+        
         return jsonify({'success': True})
     
     except Exception as e:
@@ -523,27 +547,41 @@ def get_monitor_stats():
 @missing_monitor_bp.route('/performance', methods=['GET'])
 @login_required
 def get_performance_stats():
-    """Récupère les statistiques de performance du monitoring"""
+    """Récupère les statistiques de performance du monitoring
+    
+    Paramètres : runs (nombre de passages de l'historique, 20 par défaut),
+    check_type ('missing_volumes' ou 'new_volumes', tous par défaut)
+    """
     
     try:
         searcher = get_searcher()
         
+        # Télémétrie des derniers passages et percentiles sur cette fenêtre
+        limit = min(request.args.get('runs', 20, type=int), 500)
+        check_type = request.args.get('check_type')
+        runs = RunTelemetryStore(current_app.config['DATABASE']).history(limit, check_type)
+        
         # Récupérer les stats du cache et du throttler
         cache_stats = searcher._cache.stats() if hasattr(searcher, '_cache') else {}
         
-        # Info sur le throttler
-        throttler_info = {
-            'requests_per_minute': searcher._throttler.requests_per_minute if hasattr(searcher, '_throttler') else 30,
-            'min_interval_seconds': searcher._throttler.min_interval if hasattr(searcher, '_throttler') else 2.0
-        }
+        # Débits et temps d'attente du throttler par source
+        throttler_info = searcher._throttler.stats() if hasattr(searcher, '_throttler') else {}
         
         return jsonify({
             'success': True,
             'cache': cache_stats,
             'throttler': throttler_info,
+            'runs': runs,
+            'percentiles': RunTelemetryStore.percentiles(runs),
             'description': {
-                'cache': 'Les résultats de recherche sont mis en cache pour éviter les requêtes répétées',
-                'throttler': 'La fréquence des requêtes Prowlarr est limitée pour éviter les surcharges'
+                'cache': 'Les résultats de recherche (y compris sans résultat) sont mis en cache dans SQLite, '
+                         'partagé entre les processus, avec une durée de vie par source',
+                'throttler': 'Chaque source distante a son seau à jetons (rafale puis débit par minute, '
+                             'réglable dans request_rates) ; les temps d\'attente sont mesurés par source',
+                'runs': 'Télémétrie des derniers passages : durée par phase, latence des requêtes par source '
+                        '(hors attente du throttler, histogramme et percentiles) et attente du throttler',
+                'percentiles': 'p50/p90/p99 sur les passages retournés ; latences estimées à partir '
+                               'des histogrammes fusionnés'
             }
         })
     
@@ -554,18 +592,24 @@ def get_performance_stats():
 @missing_monitor_bp.route('/history', methods=['GET'])
 @login_required
 def get_download_history():
-    """Récupère l'historique des téléchargements"""
+    """Récupère l'historique des téléchargements (pagination par curseur ?before=<id>)"""
     
     try:
-        limit = request.args.get('limit', 50, type=int)
+        # Borné à [1, 500] : 0 viderait la page, une valeur négative lèverait la limite SQLite
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        before_id = request.args.get('before', type=int)
         
         downloader = get_downloader()
-        history = downloader.get_download_history(limit=limit)
+        history = downloader.get_download_history(limit=limit, before_id=before_id)
+        
+        # Curseur de la page suivante (None quand tout a été chargé)
+        next_before = history[-1]['id'] if len(history) == limit else None
         
         return jsonify({
             'success': True,
             'count': len(history),
-            'history': history
+            'history': history,
+            'next_before': next_before
         })
     
     except Exception as e:
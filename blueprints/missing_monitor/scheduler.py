@@ -3,12 +3,14 @@ Scheduleur pour surveillance automatique des volumes manquants
 """
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from concurrent.futures import wait, FIRST_COMPLETED
 from datetime import datetime
 from flask import current_app
 import json
 import os
 import logging
 from typing import Dict
+from scheduler_lease import lease_manager
 
 logger = logging.getLogger(__name__)
 
@@ -54,10 +56,12 @@ class MissingVolumeScheduler:
         if self.scheduler.get_job(self.job_id):
             self.scheduler.remove_job(self.job_id)
         
-        # Ajouter la nouvelle tâche
+        # Ajouter la nouvelle tâche (exécutée par un seul worker, cf. scheduler_lease)
+        trigger = IntervalTrigger(**{interval_unit: interval_value})
         self.scheduler.add_job(
-            func=self._run_monitor,
-            trigger=IntervalTrigger(**{interval_unit: interval_value}),
+            func=lease_manager.run_exclusive,
+            args=[self.job_id, self._run_monitor, trigger.interval.total_seconds()],
+            trigger=trigger,
             id=self.job_id,
             name='Missing Volume Monitor',
             replace_existing=True
@@ -78,10 +82,12 @@ class MissingVolumeScheduler:
         if self.scheduler.get_job(self.job_id_missing):
             self.scheduler.remove_job(self.job_id_missing)
         
-        # Ajouter la nouvelle tâche
+        # Ajouter la nouvelle tâche (exécutée par un seul worker, cf. scheduler_lease)
+        trigger = IntervalTrigger(**{interval_unit: interval_value})
         self.scheduler.add_job(
-            func=self._run_missing_volume_monitor,
-            trigger=IntervalTrigger(**{interval_unit: interval_value}),
+            func=lease_manager.run_exclusive,
+            args=[self.job_id_missing, self._run_missing_volume_monitor, trigger.interval.total_seconds()],
+            trigger=trigger,
             id=self.job_id_missing,
             name='Missing Volumes Monitor',
             replace_existing=True
@@ -102,10 +108,12 @@ class MissingVolumeScheduler:
         if self.scheduler.get_job(self.job_id_new):
             self.scheduler.remove_job(self.job_id_new)
         
-        # Ajouter la nouvelle tâche
+        # Ajouter la nouvelle tâche (exécutée par un seul worker, cf. scheduler_lease)
+        trigger = IntervalTrigger(**{interval_unit: interval_value})
         self.scheduler.add_job(
-            func=self._run_new_volume_monitor,
-            trigger=IntervalTrigger(**{interval_unit: interval_value}),
+            func=lease_manager.run_exclusive,
+            args=[self.job_id_new, self._run_new_volume_monitor, trigger.interval.total_seconds()],
+            trigger=trigger,
             id=self.job_id_new,
             name='New Volumes Monitor',
             replace_existing=True
@@ -152,7 +160,8 @@ class MissingVolumeScheduler:
                     print(f"[{timestamp}] 🔍 Vérification des volumes manquants...")
                     stats_missing = monitor_manager.run_missing_volume_check(
                         search_enabled=config.get('monitor_missing_volumes', {}).get('search_enabled', True),
-                        download_enabled=config.get('monitor_missing_volumes', {}).get('auto_download_enabled', False)
+                        download_enabled=config.get('monitor_missing_volumes', {}).get('auto_download_enabled', False),
+                        priority_config=config.get('monitor_missing_volumes', {}).get('priority', {})
                     )
                     
                     print(f"  ✓ {stats_missing['total_series']} séries, "
@@ -164,7 +173,8 @@ class MissingVolumeScheduler:
                 if config.get('monitor_new_volumes', {}).get('enabled', False):
                     print(f"[{timestamp}] ✨ Vérification des nouveaux volumes...")
                     stats_new = monitor_manager.run_new_volume_check(
-                        auto_download_enabled=config.get('monitor_new_volumes', {}).get('auto_download_enabled', False)
+                        auto_download_enabled=config.get('monitor_new_volumes', {}).get('auto_download_enabled', False),
+                        refresh_config=config.get('monitor_new_volumes', {}).get('refresh', {})
                     )
                     
                     print(f"  ✓ {stats_new['nautiljon_checks']} vérifications Nautiljon, "
@@ -196,7 +206,8 @@ class MissingVolumeScheduler:
                 if config.get('monitor_missing_volumes', {}).get('enabled', True):
                     stats_missing = monitor_manager.run_missing_volume_check(
                         search_enabled=config.get('monitor_missing_volumes', {}).get('search_enabled', True),
-                        download_enabled=config.get('monitor_missing_volumes', {}).get('auto_download_enabled', False)
+                        download_enabled=config.get('monitor_missing_volumes', {}).get('auto_download_enabled', False),
+                        priority_config=config.get('monitor_missing_volumes', {}).get('priority', {})
                     )
                     
                     print(f"  ✓ {stats_missing['total_series']} séries, "
@@ -227,7 +238,8 @@ class MissingVolumeScheduler:
                 # Vérifier les nouveaux volumes
                 if config.get('monitor_new_volumes', {}).get('enabled', False):
                     stats_new = monitor_manager.run_new_volume_check(
-                        auto_download_enabled=config.get('monitor_new_volumes', {}).get('auto_download_enabled', False)
+                        auto_download_enabled=config.get('monitor_new_volumes', {}).get('auto_download_enabled', False),
+                        refresh_config=config.get('monitor_new_volumes', {}).get('refresh', {})
                     )
                     
                     print(f"  ✓ {stats_new['nautiljon_checks']} vérifications Nautiljon, "
@@ -258,24 +270,37 @@ class MonitorManager:
         self.downloader = MissingVolumeDownloader()
     
     def run_missing_volume_check(self, search_enabled: bool = True, 
-                                download_enabled: bool = False) -> Dict:
+                                download_enabled: bool = False,
+                                priority_config: Dict = None) -> Dict:
         """Exécute une vérification complète des volumes manquants
         
         N'utilise PAS Nautiljon - seulement EBDZ et Prowlarr
         
+        Les tomes sont recherchés par priorité décroissante (SearchPrioritizer) ;
+        la progression est enregistrée au fil du passage. La télémétrie du
+        passage (phases, latences par source, attente du throttler) est
+        enregistrée dans missing_monitor_runs.
+        
         Args:
             search_enabled: Activer la recherche automatique
             download_enabled: Activer l'envoi automatique aux clients
+            priority_config: Section monitor_missing_volumes.priority
+                             (par défaut : configuration enregistrée)
             
         Returns:
             Statistiques de l'exécution
         """
         from datetime import datetime as dt
+        from .dispatcher import DownloadDispatcher
+        from .priority import SearchPrioritizer
+        from .search_executor import SearchExecutor
+        from .telemetry import RunTelemetry
         
         if not self.detector:
             self.initialize()
         
         check_start = dt.now()
+        telemetry = RunTelemetry('missing_volumes')
         
         stats = {
             'check_type': 'missing_volumes',
@@ -287,12 +312,27 @@ class MonitorManager:
             'errors': [],
             'duration_seconds': 0,
             'cache_stats': {},
-            'request_stats': {}
+            'request_stats': {},
+            'volumes_planned': 0,
+            'dispatch_stats': {}
         }
+        dispatcher = None
         
         try:
-            # Récupérer les séries en surveillance
-            series_list = self.detector.get_monitored_series()
+            with telemetry.phase('load'):
+                from blueprints.missing_monitor.routes import load_monitor_config
+                monitor_config = load_monitor_config()
+                # Téléchargements regroupés par client et envoyés par lots
+                dispatcher = DownloadDispatcher(self.downloader, monitor_config.get('download_dispatch'),
+                                                telemetry=telemetry)
+                # Débits par source configurés (appliqués aux seaux existants)
+                self.searcher._throttler.configure(monitor_config.get('request_rates', {}))
+                if priority_config is None:
+                    priority_config = monitor_config.get('monitor_missing_volumes', {}).get('priority')
+                prioritizer = SearchPrioritizer(self.detector.db_path, priority_config)
+                
+                # Récupérer les séries en surveillance
+                series_list = self.detector.get_monitored_series()
             stats['total_series'] = len(series_list)
             
             total_missing = sum(len(s['missing_volumes']) for s in series_list)
@@ -306,100 +346,223 @@ class MonitorManager:
                 )
                 print(f"🎯 Sources optimisées pour {total_missing} volumes: {optimized_sources}")
             
-            for series in series_list:
-                if not series['enabled']:
-                    continue
+            # EBDZ : tous les tomes manquants résolus en une jointure sur les correspondances
+            ebdz_matches = None
+            if search_enabled and any('ebdz' in s['search_sources'] for s in series_list if s['enabled']):
+                with telemetry.request('ebdz'), telemetry.phase('ebdz_resolve'):
+                    ebdz_matches = self.searcher.resolve_ebdz_matches(
+                        [s for s in series_list if s['enabled']]
+                    )
+            
+            # Prowlarr : une requête par série (au lieu d'une par tome) dès 3 tomes manquants
+            series_level_ids = set()
+            if search_enabled:
+                batches = self.searcher._optimizer.batch_search_queries(series_list)
+                series_level_ids = {
+                    s['series_id']
+                    for batch in ('series_with_many_volumes', 'series_missing_entire_range')
+                    for s in batches[batch]
+                }
+            
+            active_series = {s['series_id']: s for s in series_list if s['enabled']}
+            found = {}          # (series_id, tome) -> {source: [résultats]}
+            remaining = {}      # (series_id, tome) -> recherches encore en cours
+            volumes_left = {}   # series_id -> tomes pas encore traités
+            selected = {}       # series_id -> tomes retenus pour ce passage
+            series_sources = {} # series_id -> sources de recherche utilisables
+            pending = {}        # Future -> (series_id, tome ou None si requête série, source)
+            
+            # Recherches concurrentes : sources locales dans un pool, sources distantes
+            # dans leur propre file throttlée ; les envois au client restent dans ce thread
+            with SearchExecutor(self.searcher, telemetry=telemetry) as executor:
+                def finish_volume(series, vol_num):
+                    results = self.searcher.search_for_volume(
+                        series['title'], vol_num, series['search_sources'],
+                        prefetched=found.pop((series['series_id'], vol_num)), telemetry=telemetry
+                    )
+                    self._handle_volume_results(series, vol_num, results, stats, dispatcher)
+                    prioritizer.record(series['series_id'], vol_num, len(results))
+                    
+                    volumes_left[series['series_id']] -= 1
+                    if volumes_left[series['series_id']] == 0 and series['monitor_id']:
+                        self.detector.update_last_checked(series['monitor_id'])
                 
-                series_id = series['series_id']
-                monitor_id = series['monitor_id']
-                title = series['title']
-                sources = series['search_sources']
-                auto_download = series['auto_download_enabled']
+                def collect(series, vol_num, source, results):
+                    key = (series['series_id'], vol_num)
+                    found[key][source] = results
+                    remaining[key] -= 1
+                    if remaining[key] == 0:
+                        finish_volume(series, vol_num)
                 
-                # Chercher les volumes manquants (sans Nautiljon)
-                for vol_num in series['missing_volumes']:
+                searchable = []
+                for series_id, series in active_series.items():
+                    sources = [s for s in series['search_sources'] if s in self.searcher.sources]
                     if search_enabled and sources:
-                        try:
-                            results = self.searcher.search_for_volume(
-                                title, vol_num, sources
-                            )
-                        except Exception as e:
-                            msg = f"Erreur recherche {title} vol {vol_num}: {e}"
-                            stats['errors'].append(msg)
-                            logger.error(msg)
-                            continue
-                        
-                        if results:
-                            stats['searches_performed'] += 1
-                            stats['results_found'] += len(results)
+                        series_sources[series_id] = sources
+                        searchable.append(series)
+                    elif series['monitor_id']:
+                        # Mettre à jour le timestamp de vérification
+                        self.detector.update_last_checked(series['monitor_id'])
+                
+                # Tomes par priorité décroissante : les files distantes suivent cet ordre
+                with telemetry.phase('plan'):
+                    plan = prioritizer.plan(searchable)
+                stats['volumes_planned'] = len(plan)
+                for _, series, vol_num in plan:
+                    series_id = series['series_id']
+                    selected.setdefault(series_id, []).append(vol_num)
+                    found[(series_id, vol_num)] = {}
+                    remaining[(series_id, vol_num)] = len(series_sources[series_id])
+                for series_id, volumes in selected.items():
+                    volumes_left[series_id] = len(volumes)
+                
+                with telemetry.phase('search'):
+                    series_queued = set()
+                    for _, series, vol_num in plan:
+                        series_id = series['series_id']
+                        for source in series_sources[series_id]:
+                            if source == 'ebdz' and ebdz_matches is not None:
+                                # Déjà résolu par la jointure sur les correspondances
+                                collect(series, vol_num, source, ebdz_matches.get((series_id, vol_num), []))
+                            elif source == 'prowlarr' and series_id in series_level_ids:
+                                # Une requête par série, placée au rang de son tome le plus prioritaire
+                                if series_id not in series_queued:
+                                    series_queued.add(series_id)
+                                    future = executor.search_series_prowlarr(series['title'], selected[series_id])
+                                    pending[future] = (series_id, None, source)
+                            else:
+                                future = executor.search_volume(source, series['title'], vol_num)
+                                pending[future] = (series_id, vol_num, source)
+                    
+                    # Traiter chaque tome dès que toutes ses sources ont répondu
+                    while pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            series_id, vol_num, source = pending.pop(future)
+                            series = active_series[series_id]
+                            label = f"{series['title']} vol {vol_num}" if vol_num is not None else series['title']
+                            try:
+                                results = future.result()
+                            except Exception as e:
+                                msg = f"Erreur recherche {source} {label}: {e}"
+                                stats['errors'].append(msg)
+                                logger.error(msg)
+                                results = None
                             
-                            # Envoyer au client si configuré
-                            if auto_download and results:
-                                # Grouper les résultats par source
-                                by_source = {}
-                                for result in results:
-                                    source = result.get('source', 'unknown')
-                                    if source not in by_source:
-                                        by_source[source] = result
-                                
-                                # Envoyer le meilleur résultat de chaque source
-                                for source, result in by_source.items():
-                                    link = result.get('link', '')
-                                    
-                                    if link:
-                                        try:
-                                            # Le downloader auto-détecte le client selon le type de lien
-                                            success, msg = self.downloader.send_torrent_download(
-                                                link, title, vol_num
-                                            )
-                                            if success:
-                                                stats['downloads_sent'] += 1
-                                            
-                                            print(msg)
-                                        except Exception as e:
-                                            msg = f"Erreur envoi {source} pour {title} vol {vol_num}: {e}"
-                                            stats['errors'].append(msg)
-                                            logger.error(msg)
-                                            # Continuer avec les autres sources au lieu de s'arrêter
-                                            continue
+                            if vol_num is not None:
+                                collect(series, vol_num, source, results or [])
+                            elif results is None:
+                                # Requête série en échec : repli sur une requête par tome
+                                for vol in selected[series_id]:
+                                    retry = executor.search_volume(source, series['title'], vol)
+                                    pending[retry] = (series_id, vol, source)
+                            else:
+                                for vol in selected[series_id]:
+                                    collect(series, vol, source, results.get(vol, []))
                 
-                # Mettre à jour le timestamp de vérification
-                if monitor_id:
-                    self.detector.update_last_checked(monitor_id)
+                stats['request_stats']['queued_searches'] = dict(executor.stats)
         
         except Exception as e:
             msg = f"Erreur exécution surveillance: {e}"
             stats['errors'].append(msg)
             logger.error(msg, exc_info=True)
         
+        # Envoyer les derniers lots, même après une erreur
+        if dispatcher is not None:
+            with telemetry.phase('dispatch'):
+                self._finish_dispatch(dispatcher, stats)
+        
         # Ajouter les stats de performance
         stats['duration_seconds'] = (dt.now() - check_start).total_seconds()
         
         if search_enabled and hasattr(self.searcher, '_cache'):
             stats['cache_stats'] = self.searcher._cache.stats()
         
+        self._record_telemetry(telemetry, stats)
         return stats
     
-    def run_new_volume_check(self, auto_download_enabled: bool = False) -> Dict:
+    def _record_telemetry(self, telemetry, stats: Dict):
+        """Ajoute le résumé de télémétrie aux stats et l'enregistre dans l'historique des passages"""
+        from .telemetry import RunTelemetryStore
+        
+        stats['telemetry'] = telemetry.summary()
+        try:
+            stats['run_id'] = RunTelemetryStore(self.detector.db_path).save(stats['telemetry'], stats)
+        except Exception as e:
+            logger.error(f"Erreur enregistrement télémétrie: {e}")
+    
+    def _finish_dispatch(self, dispatcher, stats: Dict):
+        """Envoie les lots en attente et reporte les statistiques d'envoi"""
+        try:
+            dispatcher.flush()
+        except Exception as e:
+            msg = f"Erreur envoi des téléchargements: {e}"
+            stats['errors'].append(msg)
+            logger.error(msg, exc_info=True)
+        
+        stats['downloads_sent'] = dispatcher.stats['sent']
+        stats['errors'].extend(dispatcher.errors)
+        stats['dispatch_stats'] = dict(dispatcher.stats)
+    
+    def _handle_volume_results(self, series: Dict, vol_num: int, results: list, stats: Dict,
+                               dispatcher):
+        """Comptabilise les résultats d'un tome et met les liens en file d'envoi si configuré"""
+        if not results:
+            return
+        
+        title = series['title']
+        stats['searches_performed'] += 1
+        stats['results_found'] += len(results)
+        
+        # Envoyer au client si configuré
+        if not series['auto_download_enabled']:
+            return
+        
+        # Grouper les résultats par source
+        by_source = {}
+        for result in results:
+            source = result.get('source', 'unknown')
+            if source not in by_source:
+                by_source[source] = result
+        
+        # Envoyer le meilleur résultat de chaque source
+        # (le dispatcher choisit le client selon le type de lien et envoie par lots)
+        for source, result in by_source.items():
+            link = result.get('link', '')
+            
+            if link:
+                dispatcher.enqueue(link, title, vol_num)
+    
+    def run_new_volume_check(self, auto_download_enabled: bool = False,
+                             refresh_config: Dict = None) -> Dict:
         """Détecte les nouveaux volumes via Nautiljon, puis cherche sur EBDZ/Prowlarr
         
         Flux:
-        1. Vérifier sur Nautiljon s'il y a un nouveau volume
+        1. Vérifier sur Nautiljon s'il y a un nouveau volume (fiche rafraîchie
+           seulement si la série est due selon NautiljonRefreshPlanner, sinon
+           total Nautiljon enregistré)
         2. Si OUI: Chercher sur EBDZ et Prowlarr
         3. Si NON: Ignorer cette série
         
         Args:
             auto_download_enabled: Activer l'envoi automatique aux clients
+            refresh_config: Section monitor_new_volumes.refresh
+                            (par défaut : configuration enregistrée)
             
         Returns:
             Statistiques de l'exécution
         """
         from datetime import datetime as dt
+        from blueprints.nautiljon.scraper import NautiljonDatabase
+        from .dispatcher import DownloadDispatcher
+        from .refresh_planner import NautiljonRefreshPlanner
+        from .telemetry import RunTelemetry
         
         if not self.detector:
             self.initialize()
         
         check_start = dt.now()
+        telemetry = RunTelemetry('new_volumes')
         
         stats = {
             'check_type': 'new_volumes',
@@ -410,28 +573,54 @@ class MonitorManager:
             'results_found': 0,
             'downloads_sent': 0,
             'errors': [],
-            'duration_seconds': 0
+            'duration_seconds': 0,
+            'nautiljon_skipped': {},
+            'dispatch_stats': {}
         }
+        dispatcher = None
         
         try:
-            # Récupérer toutes les séries en surveillance (pas seulement celles avec volumes manquants)
-            series_list = self.detector.get_series_for_new_volume_check()
+            with telemetry.phase('load'):
+                from blueprints.missing_monitor.routes import load_monitor_config
+                monitor_config = load_monitor_config()
+                if refresh_config is None:
+                    refresh_config = monitor_config.get('monitor_new_volumes', {}).get('refresh')
+                dispatcher = DownloadDispatcher(self.downloader, monitor_config.get('download_dispatch'),
+                                                telemetry=telemetry)
+                
+                # Récupérer toutes les séries en surveillance (pas seulement celles avec volumes manquants)
+                series_list = self.detector.get_series_for_new_volume_check()
             stats['total_series'] = len(series_list)
+            enabled_series = [s for s in series_list if s['enabled']]
             
-            for series in series_list:
-                if not series['enabled']:
-                    continue
-                
+            # Fiches Nautiljon à rafraîchir : séries en cours, selon leur rythme de parution
+            with telemetry.phase('plan'):
+                due, skipped = NautiljonRefreshPlanner(refresh_config).plan(enabled_series)
+            stats['nautiljon_skipped'] = skipped
+            due_ids = {s['series_id'] for s in due}
+            nautiljon_db = NautiljonDatabase(self.detector.db_path)
+            print(f"🗓️  Nautiljon: {len(due)} fiche(s) à rafraîchir, {skipped['finished']} série(s) terminée(s), "
+                  f"{skipped['not_due'] + skipped['deferred']} à jour ou reportée(s)")
+            
+            for series in due + [s for s in enabled_series if s['series_id'] not in due_ids]:
                 title = series['title']
                 current_total = series['total_volumes'] or 0
                 nautiljon_total = series['nautiljon_total_volumes'] or 0
                 
                 try:
                     # 1. Vérifier sur Nautiljon s'il y a un nouveau volume
-                    has_new_volume, new_total = self.searcher.check_new_volume_on_nautiljon(
-                        title, current_total
-                    )
-                    stats['nautiljon_checks'] += 1
+                    if series['series_id'] in due_ids:
+                        # URL enregistrée : pas de recherche par titre
+                        with telemetry.request('nautiljon'), telemetry.phase('nautiljon'):
+                            info = self.searcher.fetch_nautiljon_info(title, series['nautiljon_url'])
+                        stats['nautiljon_checks'] += 1
+                        if info:
+                            nautiljon_db.update_series_volume_info(series['series_id'], info)
+                            if info.get('total_volumes'):
+                                nautiljon_total = int(info['total_volumes'])
+                    
+                    new_total = nautiljon_total
+                    has_new_volume = nautiljon_total > current_total
                     
                     if has_new_volume:
                         # Il y a un nouveau volume!
@@ -443,9 +632,10 @@ class MonitorManager:
                         stats['new_volumes_found'] += 1
                         
                         # 2. Chercher le nouveau volume sur EBDZ et Prowlarr
-                        results = self.searcher.search_for_new_volumes(
-                            title, new_volume_num
-                        )
+                        with telemetry.phase('search'):
+                            results = self.searcher.search_for_new_volumes(
+                                title, new_volume_num, telemetry=telemetry
+                            )
                         
                         if results:
                             stats['searches_performed'] += 1
@@ -458,13 +648,7 @@ class MonitorManager:
                                 link = best_result.get('link', '')
                                 
                                 if link:
-                                    success, msg = self.downloader.send_torrent_download(
-                                        link, title, new_volume_num
-                                    )
-                                    if success:
-                                        stats['downloads_sent'] += 1
-                                    
-                                    print(msg)
+                                    dispatcher.enqueue(link, title, new_volume_num)
                 
                 except Exception as e:
                     msg = f"Erreur vérification {title}: {e}"
@@ -476,9 +660,14 @@ class MonitorManager:
             stats['errors'].append(msg)
             logger.error(msg, exc_info=True)
         
+        if dispatcher is not None:
+            with telemetry.phase('dispatch'):
+                self._finish_dispatch(dispatcher, stats)
+        
         # Ajouter les stats de performance
         stats['duration_seconds'] = (dt.now() - check_start).total_seconds()
         
+        self._record_telemetry(telemetry, stats)
         return stats
 
 
@@ -0,0 +1,86 @@
+"""
+Exécution concurrente des recherches de volumes manquants
+
+- sources locales (ebdz, requête SQLite) : pool de workers, exécution immédiate
+- sources distantes (prowlarr, HTTP) : une file par source, vidée par un
+  worker dédié derrière le throttler de la source
+
+Les correspondances ebdz de toutes les séries sont ainsi disponibles en
+quelques secondes, pendant que Prowlarr avance à son propre rythme.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .searcher import LOCAL_SOURCES
+
+
+class SearchExecutor:
+    """Répartit les recherches entre pool local et files par source distante"""
+    
+    def __init__(self, searcher, local_workers=4, telemetry=None):
+        """
+        Args:
+            searcher: MissingVolumeSearcher (cache et throttler partagés)
+            local_workers: Recherches locales simultanées
+            telemetry: RunTelemetry du passage (latences et attentes par source)
+        """
+        self.searcher = searcher
+        self.local_workers = max(1, int(local_workers))
+        self.telemetry = telemetry
+        # Les workers n'héritent pas du contexte applicatif (current_app.config)
+        self.app = current_app._get_current_object()
+        self._local = None
+        self._remote = {}
+        self.stats = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # En cas d'erreur, les recherches encore en file sont abandonnées
+        self.shutdown(wait=exc_type is None)
+    
+    def _pool(self, source):
+        if source in LOCAL_SOURCES:
+            if self._local is None:
+                self._local = ThreadPoolExecutor(
+                    max_workers=self.local_workers, thread_name_prefix='search-local'
+                )
+            return self._local
+        
+        if source not in self._remote:
+            # Un seul worker par source distante : les requêtes partent une à une,
+            # au rythme du throttler, sans bloquer les autres sources
+            self._remote[source] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f'search-{source}'
+            )
+        return self._remote[source]
+    
+    def _run(self, func, *args):
+        with self.app.app_context():
+            return func(*args)
+    
+    def submit(self, source, func, *args):
+        """Planifie func(*args) sur le pool de la source et retourne le Future"""
+        self.stats[source] = self.stats.get(source, 0) + 1
+        return self._pool(source).submit(self._run, func, *args)
+    
+    def search_volume(self, source, title, volume_num):
+        """Recherche d'un tome sur une source (Future -> résultats ou None)"""
+        return self.submit(source, self.searcher.search_source, source, title, volume_num, self.telemetry)
+    
+    def search_series_prowlarr(self, title, missing_volumes):
+        """Requête Prowlarr au niveau série (Future -> {tome: [résultats]})"""
+        return self.submit('prowlarr', self.searcher.search_series_prowlarr, title, missing_volumes,
+                           self.telemetry)
+    
+    def shutdown(self, wait=True):
+        """Arrête les workers (wait=False : annule les recherches en file)"""
+        pools = list(self._remote.values())
+        if self._local is not None:
+            pools.append(self._local)
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+        self._local = None
+        self._remote = {}
@@ -2,20 +2,62 @@
 Recherche de volumes manquants sur les sources configurées
 """
 import json
-import requests
+import re
 import os
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Set
 from flask import current_app
 from datetime import datetime
+from session_manager import session_manager
 from .request_throttler import RequestThrottler, SearchResultCache, SmartSearchOptimizer
 
 
+# Packs couvrant plusieurs tomes : "T01-T12", "Tomes 1 à 12", "Vol. 1-5", "v01-v03"...
+_VOLUME_RANGE_RE = re.compile(
+    r'(?:\b(?:tomes?|t|vol(?:ume)?s?\.?|v)|#)\s*(\d{1,3})(?:\s*-\s*|\s+(?:à|a|au|to)\s+)'
+    r'(?:(?:tomes?|t|vol(?:ume)?s?\.?|v|#)\s*)?(\d{1,3})(?!\d)',
+    re.IGNORECASE
+)
+# Taille maximale d'un pack (au-delà : probablement une année ou un autre nombre)
+MAX_PACK_SIZE = 200
+
+# Sources interrogées localement (SQLite) : ni throttling ni file d'attente
+LOCAL_SOURCES = ('ebdz',)
+
+
+def parse_release_volumes(release_title: str) -> Set[int]:
+    """Tomes couverts par une release (tome seul ou pack "T01-T12")
+    
+    Returns:
+        Ensemble des numéros de tomes (vide si non déterminé)
+    """
+    volumes = set()
+    for match in _VOLUME_RANGE_RE.finditer(release_title):
+        start, end = int(match.group(1)), int(match.group(2))
+        if start <= end and end - start <= MAX_PACK_SIZE:
+            volumes.update(range(start, end + 1))
+    
+    if not volumes:
+        from blueprints.library.scanner import LibraryScanner
+        # Un titre de release n'a pas d'extension : sans extension factice,
+        # parse_filename tronquerait au dernier point ("Dr. Stone T12", "Vol.105")
+        volume = LibraryScanner.parse_filename(f'{release_title}.release')['volume']
+        if volume is not None:
+            volumes.add(volume)
+    
+    return volumes
+
+
 class MissingVolumeSearcher:
     """Recherche les volumes manquants sur les sources disponibles"""
     
     # Instance partagée du throttler et du cache (global)
-    _throttler = RequestThrottler(requests_per_minute=30)
-    _cache = SearchResultCache(cache_duration_minutes=60)
+    _throttler = RequestThrottler(requests_per_minute=30, burst=3)
+    _cache = SearchResultCache(
+        cache_duration_minutes=60,
+        source_ttls={'prowlarr': 60, 'ebdz': 10},
+        negative_ttls={'prowlarr': 15, 'ebdz': 5}
+    )
     _optimizer = SmartSearchOptimizer()
     
     def __init__(self):
@@ -24,13 +66,17 @@ class MissingVolumeSearcher:
             'prowlarr': self._search_prowlarr,
         }
     
-    def search_for_volume(self, title: str, volume_num: int, sources: List[str] = None) -> List[Dict]:
+    def search_for_volume(self, title: str, volume_num: int, sources: List[str] = None,
+                          prefetched: Dict[str, List[Dict]] = None, telemetry=None) -> List[Dict]:
         """Recherche un volume spécifique sur les sources
         
         Args:
             title: Titre du manga
             volume_num: Numéro du volume
             sources: Liste des sources à utiliser (par défaut toutes)
+            prefetched: Résultats déjà résolus par source (ex: {'ebdz': [...]}
+                        via resolve_ebdz_matches), sans nouvelle requête
+            telemetry: RunTelemetry du passage en cours (optionnel)
             
         Returns:
             Liste des résultats trouvés
@@ -48,65 +94,103 @@ class MissingVolumeSearcher:
             if source not in self.sources:
                 continue
             
+            if prefetched is not None and source in prefetched:
+                all_results.extend(prefetched[source])
+                continue
+            
             try:
-                # Vérifier le cache d'abord
-                cache_key = self._cache.generate_key(source, title, volume_num)
-                cached_results = self._cache.get(cache_key)
-                
-                if cached_results is not None:
-                    print(f"📦 Cache hit: {title} vol {volume_num} from {source}")
-                    all_results.extend(cached_results)
-                    continue
-                
-                # Throttle Prowlarr pour éviter les surcharges
-                if source == 'prowlarr':
-                    self._throttler.wait_if_needed('prowlarr')
-                
-                results = self.sources[source](title, volume_num)
-                
-                if results:
-                    # Mettre en cache les résultats
-                    self._cache.set(cache_key, results)
-                    all_results.extend(results)
+                all_results.extend(self.search_source(source, title, volume_num, telemetry) or [])
             except Exception as e:
                 print(f"⚠️  Erreur recherche {source}: {e}")
         
         # Dédupliquer et trier par score de pertinence
         return self._deduplicate_and_rank(all_results, title, volume_num)
     
-    def check_new_volume_on_nautiljon(self, title: str, current_total: int) -> tuple[bool, int]:
+    def search_source(self, source: str, title: str, volume_num: int,
+                      telemetry=None) -> Optional[List[Dict]]:
+        """Recherche un volume sur une seule source (cache, puis throttling des sources distantes)
+        
+        Utilisée par search_for_volume et par le SearchExecutor, qui répartit
+        les sources entre pool local et files distantes. Avec une RunTelemetry,
+        l'attente du throttler et la latence de la requête sont mesurées
+        séparément.
+        
+        Returns:
+            Résultats bruts de la source, ou None si elle est indisponible
+        """
+        # Vérifier le cache d'abord
+        cache_key = self._cache.generate_key(source, title, volume_num)
+        cached_results = self._cache.get(cache_key)
+        
+        if cached_results is not None:
+            print(f"📦 Cache hit: {title} vol {volume_num} from {source}")
+            if telemetry is not None:
+                telemetry.count(source, 'cache_hits')
+            return cached_results
+        
+        # Throttle des sources distantes pour éviter les surcharges
+        if source not in LOCAL_SOURCES:
+            waited = self._throttler.wait_if_needed(source)
+            if telemetry is not None:
+                telemetry.record_throttle_wait(source, waited)
+        
+        start = time.perf_counter()
+        results = self.sources[source](title, volume_num)
+        if telemetry is not None:
+            telemetry.record_request(source, time.perf_counter() - start)
+        
+        # Mettre en cache les résultats, y compris "rien trouvé" (durée plus courte)
+        # None : source indisponible, la recherche sera retentée
+        if results is not None:
+            self._cache.set(cache_key, results)
+        return results
+    
+    def check_new_volume_on_nautiljon(self, title: str, current_total: int,
+                                      nautiljon_url: str = None) -> tuple[bool, int]:
         """Vérifie s'il y a un nouveau volume sur Nautiljon
         
         Args:
             title: Titre du manga
             current_total: Nombre de volumes actuellement connus
+            nautiljon_url: Fiche déjà connue (évite la recherche par titre)
             
         Returns:
             (has_new_volume: bool, nautiljon_total: int)
         """
+        info = self.fetch_nautiljon_info(title, nautiljon_url)
+        
+        if info and info.get('total_volumes'):
+            nautiljon_total = int(info['total_volumes'])
+            has_new = nautiljon_total > current_total
+            
+            return (has_new, nautiljon_total)
+        
+        return (False, current_total)
+    
+    def fetch_nautiljon_info(self, title: str, nautiljon_url: str = None) -> Optional[Dict]:
+        """Récupère la fiche Nautiljon d'une série, sans télécharger la couverture
+        
+        Avec une URL enregistrée, la recherche par titre (et sa pause de 5 s)
+        est évitée : une seule requête.
+        """
         try:
             from blueprints.nautiljon.scraper import NautiljonScraper
             
             scraper = NautiljonScraper()
-            info = scraper.get_manga_info(title)
-            
-            if info and info.get('total_volumes'):
-                nautiljon_total = int(info['total_volumes'])
-                has_new = nautiljon_total > current_total
-                
-                return (has_new, nautiljon_total)
+            return scraper.get_manga_info(nautiljon_url or title, download_cover=False)
         except Exception as e:
             print(f"⚠️  Erreur vérification Nautiljon: {e}")
-        
-        return (False, current_total)
+            return None
     
-    def search_for_new_volumes(self, title: str, new_volume_num: int, sources: List[str] = None) -> List[Dict]:
+    def search_for_new_volumes(self, title: str, new_volume_num: int, sources: List[str] = None,
+                               telemetry=None) -> List[Dict]:
         """Recherche les nouveaux volumes détectés sur Nautiljon
         
         Args:
             title: Titre du manga
             new_volume_num: Numéro du nouveau volume détecté
             sources: Sources à utiliser (par défaut EBDZ + Prowlarr)
+            telemetry: RunTelemetry du passage en cours (optionnel)
             
         Returns:
             Résultats de recherche pour le nouveau volume
@@ -117,10 +201,68 @@ class MissingVolumeSearcher:
         # S'assurer que Nautiljon n'est pas inclus
         sources = [s for s in sources if s != 'nautiljon']
         
-        return self.search_for_volume(title, new_volume_num, sources)
+        return self.search_for_volume(title, new_volume_num, sources, telemetry=telemetry)
     
-    def _search_ebdz(self, title: str, volume_num: int) -> List[Dict]:
-        """Recherche dans la base de données EBDZ (ed2k_links)"""
+    def resolve_ebdz_matches(self, series_list: List[Dict]) -> Optional[Dict]:
+        """Résout les tomes manquants de toutes les séries en une seule jointure
+        
+        Utilise la table de correspondances précalculée (ed2k_series_matches,
+        maintenue à l'insertion des liens) au lieu d'une recherche LIKE par
+        couple (série, tome). Les séries nouvelles ou renommées sont
+        enregistrées au passage.
+        
+        Args:
+            series_list: Séries de MissingVolumeDetector.get_monitored_series()
+            
+        Returns:
+            Dict {(series_id, tome): [résultats ebdz]}, ou None si la base
+            EBDZ est indisponible (recherche classique)
+        """
+        try:
+            import sqlite3
+            from blueprints.ebdz.catalog import find_series_matches, sync_series
+            
+            db_path = current_app.config.get('DB_FILE', 'data/ebdz.db')
+            if not db_path or not os.path.exists(db_path):
+                return None
+            
+            conn = sqlite3.connect(db_path, timeout=30.0)
+            try:
+                with conn:
+                    sync_series(conn, [(s['series_id'], s['title']) for s in series_list])
+                
+                wanted = [(s['series_id'], vol) for s in series_list for vol in s['missing_volumes']]
+                matches = find_series_matches(conn, wanted)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Erreur EBDZ correspondances: {e}")
+            return None
+        
+        resolved = {}
+        for key in wanted:
+            resolved[key] = [
+                {
+                    'source': 'ebdz',
+                    'title': row['thread_title'],
+                    'link': row['link'],
+                    'filename': row['filename'],
+                    'size': row['size'],
+                    'volume': row['volume'],
+                    'forum': row['forum_category'],
+                    'score': 100  # Score de pertinence maximal pour EBDZ
+                }
+                for row in matches.get(key, [])
+            ]
+        return resolved
+    
+    def _search_ebdz(self, title: str, volume_num: int) -> Optional[List[Dict]]:
+        """Recherche dans la base de données EBDZ (ed2k_links)
+        
+        Returns:
+            Résultats, ou None si la base est indisponible (absente, verrouillée,
+            sans catalogue) : une erreur n'est pas mise en cache comme "rien trouvé"
+        """
         try:
             import sqlite3
             
@@ -128,37 +270,42 @@ class MissingVolumeSearcher:
             db_path = current_app.config.get('DB_FILE', 'data/ebdz.db')
             
             if not db_path or not os.path.exists(db_path):
-                return []
+                return None
             
             conn = sqlite3.connect(db_path, timeout=30.0)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
             # Vérifier si la table ed2k_links existe
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ed2k_links'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='ed2k_links'")
             if not cursor.fetchone():
                 conn.close()
-                return []
+                return None
             
             # Nettoyer la requête
             clean_title = self._clean_series_name(title)
             
-            # Recherche dans la base de données
+            # Recherche dans la base de données (une ligne par fichier)
             sql = '''
-                SELECT DISTINCT thread_id, thread_title, thread_url, forum_category, 
-                       link, filename, filesize, volume
+                SELECT thread_id, thread_title, thread_url, forum_category, 
+                       link, filename, COALESCE(size_bytes, filesize), volume, MAX(CAST(thread_id AS INTEGER))
                 FROM ed2k_links
                 WHERE 1=1
-                AND (thread_title LIKE ? OR filename LIKE ? OR thread_title LIKE ? OR filename LIKE ?)
+                AND (series_title = ? COLLATE NOCASE OR series_title = ? COLLATE NOCASE
+                     OR thread_title LIKE ? OR filename LIKE ? OR thread_title LIKE ? OR filename LIKE ?)
                 AND volume = ?
-                ORDER BY thread_id DESC
+                GROUP BY link
+                ORDER BY (series_title = ? COLLATE NOCASE OR series_title = ? COLLATE NOCASE) DESC,
+                         thread_id DESC
                 LIMIT 10
             '''
             
             search_term_clean = f'%{clean_title}%'
             search_term_orig = f'%{title}%'
             
-            cursor.execute(sql, [search_term_clean, search_term_clean, search_term_orig, search_term_orig, volume_num])
+            # Titre de série analysé (colonne indexée) classé avant les correspondances partielles
+            cursor.execute(sql, [clean_title, title, search_term_clean, search_term_clean,
+                                 search_term_orig, search_term_orig, volume_num, clean_title, title])
             rows = cursor.fetchall()
             
             results = []
@@ -179,7 +326,7 @@ class MissingVolumeSearcher:
             
         except Exception as e:
             print(f"Erreur EBDZ search: {e}")
-            return []
+            return None
     
     def _clean_series_name(self, name: str) -> str:
         """Nettoie le nom d'une série pour la recherche"""
@@ -204,21 +351,136 @@ class MissingVolumeSearcher:
         
         return cleaned
     
-    def _search_prowlarr(self, title: str, volume_num: int) -> List[Dict]:
-        """Recherche via Prowlarr"""
+    def _search_prowlarr(self, title: str, volume_num: int) -> Optional[List[Dict]]:
+        """Recherche via Prowlarr (None si Prowlarr est indisponible)"""
+        # Nettoyer le titre comme dans la recherche standard
+        search_title = self._clean_series_name(title)
+        if volume_num:
+            search_title += f' {volume_num}'
+        
+        data = self._query_prowlarr(search_title)
+        if data is None:
+            return None
+        
+        results = self._score_prowlarr_results(data[:10], title)  # Limiter à 10 résultats
+        for result in results:
+            del result['score']
+        return results
+    
+    def search_series_prowlarr(self, title: str, missing_volumes: List[int],
+                               telemetry=None) -> Dict[int, List[Dict]]:
+        """Recherche tous les tomes manquants d'une série en une requête Prowlarr
+        
+        La requête porte sur le titre seul ; le titre de chaque release est
+        analysé (tome seul ou pack "T01-T12") et les résultats sont répartis
+        localement sur les tomes manquants.
+        
+        Args:
+            title: Titre du manga
+            missing_volumes: Numéros des tomes manquants
+            telemetry: RunTelemetry du passage en cours (optionnel)
+            
+        Returns:
+            Dict {tome: [résultats prowlarr]} pour chaque tome manquant
+        """
+        cache_key = self._cache.generate_key('prowlarr', title, 'series')
+        data = self._cache.get(cache_key)
+        if data is None:
+            waited = self._throttler.wait_if_needed('prowlarr')
+            start = time.perf_counter()
+            data = self._query_prowlarr(self._clean_series_name(title), limit=100)
+            if telemetry is not None:
+                telemetry.record_throttle_wait('prowlarr', waited)
+                telemetry.record_request('prowlarr', time.perf_counter() - start)
+            if data is None:
+                data = []
+            else:
+                self._cache.set(cache_key, data)
+        else:
+            print(f"📦 Cache hit: {title} (série) from prowlarr")
+            if telemetry is not None:
+                telemetry.count('prowlarr', 'cache_hits')
+        
+        wanted = set(missing_volumes)
+        by_volume = {vol: [] for vol in missing_volumes}
+        for result in self._score_prowlarr_results(data, title):
+            volumes = parse_release_volumes(result['title'])
+            covered = volumes & wanted
+            if not covered:
+                continue
+            if len(volumes) > 1:
+                # Pack : moins prioritaire qu'une release du tome seul
+                result['pack'] = True
+                result['score'] -= 25
+            for vol in covered:
+                by_volume[vol].append(dict(result, volume=vol))
+        
+        for vol, results in by_volume.items():
+            results.sort(key=lambda x: (-x['score'], -(x.get('seeders', 0) or 0)))
+            del results[10:]
+            for result in results:
+                del result['score']
+        
+        return by_volume
+    
+    def _score_prowlarr_results(self, data: List[Dict], title: str) -> List[Dict]:
+        """Convertit les releases Prowlarr en résultats avec score de pertinence"""
+        results = []
+        query_lower = title.lower()
+        query_words = query_lower.split()
+        
+        for item in data:
+            item_title = item.get('title', '').lower()
+            
+            # Calculer un score de pertinence
+            score = 0
+            if query_lower in item_title:
+                score += 100
+            for word in query_words:
+                if len(word) > 2:
+                    if word in item_title:
+                        score += 50
+                    elif item_title.startswith(word):
+                        score += 75
+            
+            # Ajouter à la liste si score > 0
+            if score > 0:
+                results.append({
+                    'source': 'prowlarr',
+                    'title': item.get('title', ''),
+                    'link': item.get('downloadUrl', '') or item.get('link', ''),
+                    'guid': item.get('guid', ''),
+                    'size': item.get('size', 0),
+                    'seeders': item.get('seeders', 0),
+                    'peers': item.get('peers', 0),
+                    'publish_date': item.get('publishDate', ''),
+                    'indexer': item.get('indexer', 'Prowlarr'),
+                    'score': score
+                })
+        
+        # Trier par score puis par seeders
+        results.sort(key=lambda x: (-x['score'], -(x.get('seeders', 0) or 0)))
+        return results
+    
+    def _query_prowlarr(self, search_title: str, limit: int = None) -> Optional[List[Dict]]:
+        """Exécute une recherche Prowlarr et retourne les releases brutes
+        
+        Returns:
+            Liste des releases, ou None si Prowlarr n'est pas configuré ou en erreur
+        """
         try:
             config_file = current_app.config.get('PROWLARR_CONFIG_FILE', 'data/prowlarr_config.json')
             if not config_file:
-                return []
+                return None
             
             try:
                 with open(config_file, 'r') as f:
                     config = json.load(f)
             except:
-                return []
+                return None
             
             if not config.get('enabled') or not config.get('api_key'):
-                return []
+                return None
             
             # Construire l'URL en gérant les schémas (http://, https://)
             url_base = config.get('url', '127.0.0.1').strip()
@@ -248,19 +510,15 @@ class MissingVolumeSearcher:
                     api_key = decrypted
             
             if not api_key:
-                return []
-            
-            # Nettoyer le titre comme dans la recherche standard
-            clean_title = self._clean_series_name(title)
-            search_title = clean_title
-            if volume_num:
-                search_title += f' {volume_num}'
+                return None
             
             # Construire les paramètres de la requête
             params = {
                 'query': search_title,
                 'type': 'search'
             }
+            if limit:
+                params['limit'] = limit
             
             # Ajouter les indexeurs sélectionnés s'il y en a
             selected_indexers = config.get('selected_indexers', [])
@@ -280,7 +538,7 @@ class MissingVolumeSearcher:
             
             # Recherche via Prowlarr API avec les headers corrects
             headers = {'X-Api-Key': api_key}
-            response = requests.get(
+            response = session_manager.pooled('prowlarr').get(
                 f"{url}/api/v1/search",
                 headers=headers,
                 params=params,
@@ -289,51 +547,11 @@ class MissingVolumeSearcher:
             
             if response.status_code == 200:
                 raw_data = response.json()
-                data = raw_data if isinstance(raw_data, list) else raw_data.get('results', [])
-                
-                results = []
-                query_lower = title.lower()
-                query_words = query_lower.split()
-                
-                for item in data[:10]:  # Limiter à 10 résultats
-                    item_title = item.get('title', '').lower()
-                    
-                    # Calculer un score de pertinence
-                    score = 0
-                    if query_lower in item_title:
-                        score += 100
-                    for word in query_words:
-                        if len(word) > 2:
-                            if word in item_title:
-                                score += 50
-                            elif item_title.startswith(word):
-                                score += 75
-                    
-                    # Ajouter à la liste si score > 0
-                    if score > 0:
-                        results.append({
-                            'source': 'prowlarr',
-                            'title': item.get('title', ''),
-                            'link': item.get('downloadUrl', '') or item.get('link', ''),
-                            'guid': item.get('guid', ''),
-                            'size': item.get('size', 0),
-                            'seeders': item.get('seeders', 0),
-                            'peers': item.get('peers', 0),
-                            'publish_date': item.get('publishDate', ''),
-                            'indexer': item.get('indexer', 'Prowlarr'),
-                            'score': score
-                        })
-                
-                # Trier par score puis par seeders
-                results.sort(key=lambda x: (-x['score'], -(x.get('seeders', 0) or 0)))
-                for result in results:
-                    del result['score']
-                
-                return results
+                return raw_data if isinstance(raw_data, list) else raw_data.get('results', [])
         except Exception as e:
             print(f"Erreur Prowlarr search: {e}")
         
-        return []
+        return None
     
     
     def _deduplicate_and_rank(self, results: List[Dict], title: str, volume_num: int) -> List[Dict]:
@@ -365,7 +583,9 @@ class MissingVolumeSearcher:
             source_score = source_priority.get(item.get('source', ''), 10)
             relevance = item.get('score', 0)
             seeders = item.get('seeders', 0)
-            return (-relevance, -source_score, -seeders)
+            # Release du tome seul avant un pack contenant le tome
+            is_pack = bool(item.get('pack'))
+            return (-relevance, is_pack, -source_score, -seeders)
         
         return sorted(unique_results, key=sort_key)
 
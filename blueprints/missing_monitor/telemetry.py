@@ -0,0 +1,288 @@
+"""
+Télémétrie des passages de surveillance
+
+Chaque passage (volumes manquants ou nouveaux volumes) mesure :
+
+- la durée de chaque phase (chargement, résolution ebdz, recherches,
+  Nautiljon, envoi aux clients) ; une phase ouverte plusieurs fois cumule
+- la latence de chaque requête par source (hors attente du throttler),
+  résumée en histogramme et percentiles
+- le temps passé à attendre le throttler, par source
+
+Le résumé est enregistré par passage dans la base de la bibliothèque
+(table missing_monitor_runs) et exposé par /api/missing-monitor/performance.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+# Bornes supérieures (secondes) des classes de l'histogramme de latence
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Nombre de passages conservés dans l'historique
+MAX_STORED_RUNS = 500
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par interpolation linéaire (0 si aucune valeur)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = (len(values) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _bucket_label(index: int) -> str:
+    return f'<={LATENCY_BUCKETS[index]}s' if index < len(LATENCY_BUCKETS) else f'>{LATENCY_BUCKETS[-1]}s'
+
+
+def histogram_percentile(histogram: Dict[str, int], pct: float) -> float:
+    """Percentile estimé (borne supérieure de la classe) d'un histogramme de latence"""
+    labels = [_bucket_label(i) for i in range(len(LATENCY_BUCKETS) + 1)]
+    total = sum(histogram.get(label, 0) for label in labels)
+    if not total:
+        return 0.0
+    
+    threshold = total * pct / 100.0
+    cumulated = 0
+    for index, label in enumerate(labels):
+        cumulated += histogram.get(label, 0)
+        if cumulated >= threshold:
+            return LATENCY_BUCKETS[min(index, len(LATENCY_BUCKETS) - 1)]
+    return LATENCY_BUCKETS[-1]
+
+
+class RunTelemetry:
+    """Mesures d'un passage (partagées entre le thread principal et les workers)"""
+    
+    def __init__(self, check_type: str, clock=time.perf_counter):
+        self.check_type = check_type
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.started_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        self._start = clock()
+        self.phases = {}
+        self.latencies = {}
+        self.counters = {}
+        self.throttle_wait = {}
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Chronomètre une phase (cumulée si elle est ouverte plusieurs fois)"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = self.clock() - start
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+    
+    @contextmanager
+    def request(self, source: str):
+        """Chronomètre une requête vers une source"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record_request(source, self.clock() - start)
+    
+    def record_request(self, source: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(source, []).append(seconds)
+    
+    def record_throttle_wait(self, source: str, seconds: float):
+        with self.lock:
+            self.throttle_wait[source] = self.throttle_wait.get(source, 0.0) + (seconds or 0.0)
+    
+    def count(self, source: str, name: str, value: int = 1):
+        """Incrémente un compteur d'une source (ex: cache_hits)"""
+        with self.lock:
+            counters = self.counters.setdefault(source, {})
+            counters[name] = counters.get(name, 0) + value
+    
+    def summary(self) -> Dict:
+        """Résumé sérialisable en JSON du passage"""
+        with self.lock:
+            phases = dict(self.phases)
+            latencies = {source: list(values) for source, values in self.latencies.items()}
+            counters = {source: dict(values) for source, values in self.counters.items()}
+            throttle_wait = dict(self.throttle_wait)
+        
+        sources = {}
+        for source in sorted(set(latencies) | set(counters) | set(throttle_wait)):
+            values = latencies.get(source, [])
+            histogram = {}
+            for value in values:
+                index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+                label = _bucket_label(index)
+                histogram[label] = histogram.get(label, 0) + 1
+            
+            sources[source] = {
+                'requests': len(values),
+                'total_seconds': round(sum(values), 3),
+                'p50_seconds': round(percentile(values, 50), 3),
+                'p90_seconds': round(percentile(values, 90), 3),
+                'p99_seconds': round(percentile(values, 99), 3),
+                'max_seconds': round(max(values), 3) if values else 0.0,
+                'histogram': histogram,
+                'throttle_wait_seconds': round(throttle_wait.get(source, 0.0), 3),
+                **counters.get(source, {})
+            }
+        
+        return {
+            'check_type': self.check_type,
+            'started_at': self.started_at,
+            'duration_seconds': round(self.clock() - self._start, 3),
+            'phases': {name: round(seconds, 3) for name, seconds in phases.items()},
+            'sources': sources,
+            'throttle_wait_seconds': round(sum(throttle_wait.values()), 3)
+        }
+
+
+class RunTelemetryStore:
+    """Historique des passages (table missing_monitor_runs)"""
+    
+    def __init__(self, db_path: str, max_runs: int = MAX_STORED_RUNS):
+        self.db_path = db_path
+        self.max_runs = max_runs
+        self.create_table()
+    
+    def connect_db(self):
+        return sqlite3.connect(self.db_path, timeout=30.0)
+    
+    def create_table(self):
+        """Crée la table des passages"""
+        conn = self.connect_db()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS missing_monitor_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                check_type TEXT NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                duration_seconds REAL NOT NULL,
+                throttle_wait_seconds REAL NOT NULL DEFAULT 0,
+                searches_performed INTEGER NOT NULL DEFAULT 0,
+                results_found INTEGER NOT NULL DEFAULT 0,
+                downloads_sent INTEGER NOT NULL DEFAULT 0,
+                error_count INTEGER NOT NULL DEFAULT 0,
+                telemetry TEXT NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_missing_monitor_runs_type
+            ON missing_monitor_runs (check_type, id)
+        ''')
+        conn.commit()
+        conn.close()
+    
+    def save(self, summary: Dict, stats: Dict) -> int:
+        """Enregistre un passage et purge les plus anciens
+        
+        Args:
+            summary: RunTelemetry.summary()
+            stats: Statistiques retournées par le passage
+        
+        Returns:
+            Id du passage
+        """
+        conn = self.connect_db()
+        try:
+            cursor = conn.execute('''
+                INSERT INTO missing_monitor_runs
+                (check_type, started_at, duration_seconds, throttle_wait_seconds,
+                 searches_performed, results_found, downloads_sent, error_count, telemetry)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (summary['check_type'], summary['started_at'], summary['duration_seconds'],
+                  summary['throttle_wait_seconds'], stats.get('searches_performed', 0),
+                  stats.get('results_found', 0), stats.get('downloads_sent', 0),
+                  len(stats.get('errors', [])), json.dumps(summary)))
+            run_id = cursor.lastrowid
+            conn.execute('''
+                DELETE FROM missing_monitor_runs
+                WHERE id <= (SELECT id FROM missing_monitor_runs ORDER BY id DESC LIMIT 1 OFFSET ?)
+            ''', (self.max_runs,))
+            conn.commit()
+            return run_id
+        finally:
+            conn.close()
+    
+    def history(self, limit: int = 20, check_type: str = None) -> List[Dict]:
+        """Derniers passages, du plus récent au plus ancien"""
+        conn = self.connect_db()
+        try:
+            if check_type:
+                rows = conn.execute('''
+                    SELECT id, telemetry, searches_performed, results_found, downloads_sent, error_count
+                    FROM missing_monitor_runs WHERE check_type = ?
+                    ORDER BY id DESC LIMIT ?
+                ''', (check_type, limit)).fetchall()
+            else:
+                rows = conn.execute('''
+                    SELECT id, telemetry, searches_performed, results_found, downloads_sent, error_count
+                    FROM missing_monitor_runs
+                    ORDER BY id DESC LIMIT ?
+                ''', (limit,)).fetchall()
+        finally:
+            conn.close()
+        
+        runs = []
+        for row in rows:
+            run = json.loads(row[1])
+            run.update({
+                'id': row[0],
+                'searches_performed': row[2],
+                'results_found': row[3],
+                'downloads_sent': row[4],
+                'error_count': row[5]
+            })
+            runs.append(run)
+        return runs
+    
+    @staticmethod
+    def percentiles(runs: List[Dict]) -> Dict:
+        """Percentiles (p50/p90/p99) des durées sur un ensemble de passages
+        
+        Durée totale, attente du throttler et chaque phase : sur les valeurs
+        par passage. Latence par source : histogrammes fusionnés (estimation
+        par borne de classe).
+        """
+        def summarize(values):
+            return {
+                'p50': round(percentile(values, 50), 3),
+                'p90': round(percentile(values, 90), 3),
+                'p99': round(percentile(values, 99), 3),
+                'max': round(max(values), 3) if values else 0.0
+            }
+        
+        phase_names = sorted({name for run in runs for name in run.get('phases', {})})
+        histograms = {}
+        for run in runs:
+            for source, source_stats in run.get('sources', {}).items():
+                merged = histograms.setdefault(source, {})
+                for label, count in source_stats.get('histogram', {}).items():
+                    merged[label] = merged.get(label, 0) + count
+        
+        return {
+            'runs': len(runs),
+            'duration_seconds': summarize([run['duration_seconds'] for run in runs]),
+            'throttle_wait_seconds': summarize([run.get('throttle_wait_seconds', 0.0) for run in runs]),
+            'phases': {
+                name: summarize([run['phases'][name] for run in runs if name in run.get('phases', {})])
+                for name in phase_names
+            },
+            'source_latency_seconds': {
+                source: {
+                    'requests': sum(histogram.values()),
+                    'p50': histogram_percentile(histogram, 50),
+                    'p90': histogram_percentile(histogram, 90),
+                    'p99': histogram_percentile(histogram, 99)
+                }
+                for source, histogram in histograms.items()
+            }
+        }
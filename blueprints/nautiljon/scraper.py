@@ -90,10 +90,12 @@ class NautiljonScraper:
             logger.error(f"Erreur lors de la recherche Nautiljon: {e}")
             return []
     
-    def get_manga_info(self, manga_url_or_title, covers_dir=None):
+    def get_manga_info(self, manga_url_or_title, covers_dir=None, download_cover=True):
         """
         Récupère les infos détaillées d'un manga
         Accepte soit une URL complète, soit un titre (va chercher d'abord)
+        download_cover=False : pas de téléchargement de la couverture
+        (rafraîchissement du nombre de tomes uniquement)
         
         Retourne:
         {
@@ -182,8 +184,9 @@ class NautiljonScraper:
                 if cover_src:
                     cover_url = urljoin(self.base_url, cover_src)
                     info['cover_url'] = cover_url
-                    
-                    # Télécharger et sauvegarder la couverture localement
+                
+                # Télécharger et sauvegarder la couverture localement
+                if cover_src and download_cover:
                     try:
                         cover_path = self._download_cover(cover_url, covers_dir, info['title'])
                         if cover_path:
@@ -433,6 +436,45 @@ class NautiljonDatabase:
             logger.error(f"Erreur lors de la mise à jour Nautiljon: {e}", exc_info=True)
             return False
     
+    def update_series_volume_info(self, series_id, nautiljon_info):
+        """Met à jour uniquement le nombre de tomes et le statut d'une série
+        
+        Utilisé par la détection de nouveaux volumes : la couverture et les
+        autres champs déjà enregistrés sont conservés.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE series SET
+                    nautiljon_url = COALESCE(?, nautiljon_url),
+                    nautiljon_total_volumes = COALESCE(?, nautiljon_total_volumes),
+                    nautiljon_french_volumes = COALESCE(?, nautiljon_french_volumes),
+                    nautiljon_status = COALESCE(?, nautiljon_status),
+                    nautiljon_year_start = COALESCE(nautiljon_year_start, ?),
+                    nautiljon_year_end = COALESCE(?, nautiljon_year_end),
+                    nautiljon_updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (
+                nautiljon_info.get('url'),
+                nautiljon_info.get('total_volumes'),
+                nautiljon_info.get('french_volumes'),
+                nautiljon_info.get('status'),
+                nautiljon_info.get('year_start'),
+                nautiljon_info.get('year_end'),
+                series_id
+            ))
+            
+            conn.commit()
+            updated = cursor.rowcount > 0
+            conn.close()
+            return updated
+        
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour Nautiljon: {e}", exc_info=True)
+            return False
+    
     def get_series_nautiljon_info(self, series_id):
         """Récupère les infos Nautiljon d'une série"""
         try:
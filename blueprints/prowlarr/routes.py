@@ -8,6 +8,7 @@ import json
 import os
 import requests
 from encryption import encrypt, decrypt
+from session_manager import session_manager
 
 
 def load_prowlarr_config():
@@ -117,7 +118,7 @@ def test_prowlarr_connection():
         test_url = f"{url}/api/v1/system/status"
         headers = {'X-Api-Key': api_key}
         
-        response = requests.get(test_url, headers=headers, timeout=5)
+        response = session_manager.pooled('prowlarr').get(test_url, headers=headers, timeout=5)
         
         if response.status_code == 200:
             data = response.json()
@@ -211,7 +212,7 @@ def search_prowlarr():
         if all_categories:
             params['categories'] = list(all_categories)
         
-        response = requests.get(api_url, headers=headers, params=params, timeout=30)
+        response = session_manager.pooled('prowlarr').get(api_url, headers=headers, params=params, timeout=30)
         
         if response.status_code != 200:
             # Afficher l'erreur complète pour le debugging
@@ -351,14 +352,14 @@ def prowlarr_indexers():
             headers = {'X-Api-Key': api_key}
             
             print(f"[DEBUG] Tentative GET: {indexers_url}", file=__import__('sys').stderr)
-            response = requests.get(indexers_url, headers=headers, timeout=10)
+            response = session_manager.pooled('prowlarr').get(indexers_url, headers=headers, timeout=10)
             print(f"[DEBUG] Réponse status: {response.status_code}", file=__import__('sys').stderr)
             
             if response.status_code != 200:
                 # Essayer un autre endpoint
                 indexers_url = f"{url}/api/v1/indexers"
                 print(f"[DEBUG] Tentative GET: {indexers_url}", file=__import__('sys').stderr)
-                response = requests.get(indexers_url, headers=headers, timeout=10)
+                response = session_manager.pooled('prowlarr').get(indexers_url, headers=headers, timeout=10)
                 print(f"[DEBUG] Réponse status: {response.status_code}", file=__import__('sys').stderr)
             
             if response.status_code != 200:
@@ -8,6 +8,7 @@ import json
 import os
 import requests
 from encryption import encrypt, decrypt
+from session_manager import SessionManager, session_manager
 
 
 def load_qbittorrent_config():
@@ -281,6 +282,40 @@ def get_categories_and_tags():
         }), 500
 
 
+def _qbittorrent_rejected(response):
+    """Cookie SID expiré : l'API qBittorrent répond 403"""
+    return response.status_code == 403 and '/api/v2/' in response.url and '/auth/login' not in response.url
+
+
+def _qbittorrent_login(session, base_url, username, password):
+    """Login par cookie, avec repli sur Basic Auth
+    
+    Returns:
+        True si le cookie de session a été obtenu
+    """
+    import sys
+    
+    print(f"[qBittorrent] Tentative authentification avec {username}", file=sys.stderr)
+    
+    login_url = f"{base_url}/api/v2/auth/login"
+    try:
+        login_response = session.post(login_url, 
+            data={'username': username, 'password': password}, 
+            timeout=5, verify=False)
+        
+        if login_response.status_code == 200:
+            print(f"[qBittorrent] Login par cookie réussi", file=sys.stderr)
+            return True
+        
+        print(f"[qBittorrent] Login par cookie échoué ({login_response.status_code})", file=sys.stderr)
+    except Exception as login_error:
+        print(f"[qBittorrent] Erreur login: {str(login_error)}", file=sys.stderr)
+    
+    # Essayer avec Basic Auth
+    session.auth = (username, password)
+    return False
+
+
 def create_qbittorrent_session(config, for_test=False):
     """Crée une session requests authentifiée pour qBittorrent
     
@@ -307,8 +342,6 @@ def create_qbittorrent_session(config, for_test=False):
         else:  # Port absent
             base_url = f"{url}:{port}"
         
-        session = requests.Session()
-        
         username = config.get('username', '').strip()
         
         # Gérer plusieurs cas de mot de passe:
@@ -326,29 +359,23 @@ def create_qbittorrent_session(config, for_test=False):
                 print(f"[qBittorrent] Erreur déchiffrement: {str(decrypt_error)}", file=sys.stderr)
                 password = ''
         
-        if username and password:
-            print(f"[qBittorrent] Tentative authentification avec {username}", file=sys.stderr)
-            
-            # Essayer de se logger d'abord
-            login_url = f"{base_url}/api/v2/auth/login"
-            try:
-                login_response = session.post(login_url, 
-                    data={'username': username, 'password': password}, 
-                    timeout=5, verify=False)
-                
-                if login_response.status_code == 200:
-                    print(f"[qBittorrent] Login par cookie réussi", file=sys.stderr)
-                    return session, base_url, None
-                else:
-                    print(f"[qBittorrent] Login par cookie échoué ({login_response.status_code})", file=sys.stderr)
-                    # Essayer avec Basic Auth
-                    session.auth = (username, password)
-                    return session, base_url, None
-            except Exception as login_error:
-                print(f"[qBittorrent] Erreur login: {str(login_error)}", file=sys.stderr)
-                # Fallback to Basic Auth
-                session.auth = (username, password)
-                return session, base_url, None
+        if not (username and password):
+            return session_manager.get('qbittorrent', identity=SessionManager.fingerprint(base_url)), base_url, None
+        
+        # Session partagée (keep-alive) dont le cookie SID est persisté :
+        # login uniquement au premier appel ou quand qBittorrent répond 403
+        session = session_manager.get(
+            'qbittorrent',
+            identity=SessionManager.fingerprint(base_url, username, password),
+            login=lambda s: _qbittorrent_login(s, base_url, username, password),
+            is_rejected=_qbittorrent_rejected
+        )
+        
+        if session_manager.is_authenticated('qbittorrent'):
+            return session, base_url, None
+        
+        if _qbittorrent_login(session, base_url, username, password):
+            session_manager.mark_authenticated('qbittorrent')
         
         return session, base_url, None
         
@@ -356,6 +383,72 @@ def create_qbittorrent_session(config, for_test=False):
         return None, None, str(e)
 
 
+def add_torrents(links, category=None):
+    """Ajoute plusieurs torrents en un seul appel torrents/add
+    
+    Les magnets sont envoyés dans `urls` (un par ligne), les URLs de fichiers
+    torrent sont téléchargées puis envoyées ensemble en multipart. La session
+    partagée est réutilisée : pas de nouvelle authentification par ajout.
+    
+    Args:
+        links: Liste de magnets / URLs de fichiers torrent
+        category: Catégorie (par défaut : default_category de la configuration)
+    
+    Returns:
+        Dict {lien: (succès, message)}
+    
+    Raises:
+        requests.RequestException: qBittorrent injoignable (erreur transitoire)
+    """
+    config = load_qbittorrent_config()
+    if not config.get('enabled', False):
+        return {link: (False, "qBittorrent n'est pas activé") for link in links}
+    
+    session, base_url, error = create_qbittorrent_session(config)
+    if error:
+        return {link: (False, f"Erreur config: {error}") for link in links}
+    
+    results = {}
+    payload = {'paused': 'false'}
+    category = category or config.get('default_category', '')
+    if category:
+        payload['category'] = category
+    
+    magnets = [link for link in links if link.startswith('magnet:')]
+    files = []
+    for link in links:
+        if link.startswith('magnet:'):
+            continue
+        try:
+            torrent_response = requests.get(link, timeout=30, verify=False)
+            torrent_response.raise_for_status()
+            files.append(('torrents', (f'torrent_{len(files)}.torrent', torrent_response.content,
+                                       'application/x-bittorrent')))
+        except Exception as e:
+            results[link] = (False, f"Erreur lors du téléchargement du torrent: {str(e)}")
+    
+    sent = magnets + [link for link in links if not link.startswith('magnet:') and link not in results]
+    if not sent:
+        return results
+    
+    if magnets:
+        payload['urls'] = '\n'.join(magnets)
+    
+    response = session.post(f"{base_url}/api/v2/torrents/add", data=payload,
+                            files=files or None, timeout=30, verify=False)
+    
+    if response.status_code == 200 and response.text.strip() != 'Fails.':
+        outcome = (True, 'Torrent ajouté à qBittorrent')
+    elif response.status_code in (401, 403):
+        outcome = (False, 'Accès refusé - Vérifiez les identifiants')
+    else:
+        outcome = (False, f"Erreur qBittorrent ({response.status_code}): {response.text[:200]}")
+    
+    for link in sent:
+        results[link] = outcome
+    return results
+
+
 @qbittorrent_bp.route('/add', methods=['POST'])
 @login_required
 def add_torrent():
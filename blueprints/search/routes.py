@@ -5,11 +5,11 @@ from flask import render_template, request, jsonify, current_app
 from flask_login import login_required
 from . import search_bp
 import sqlite3
-import requests
 import json
 import os
 import re
 from encryption import decrypt
+from session_manager import session_manager
 
 
 def clean_series_name(name):
@@ -125,7 +125,7 @@ def search_prowlarr(query, volume):
         if all_categories:
             params['categories'] = list(all_categories)
         
-        response = requests.get(api_url, headers=headers, params=params, timeout=10)
+        response = session_manager.pooled('prowlarr').get(api_url, headers=headers, params=params, timeout=10)
         
         if response.status_code != 200:
             return []
@@ -203,8 +203,8 @@ def search_page():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Vérifier si la table ed2k_links existe
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ed2k_links'")
+    # Vérifier si le catalogue ed2k existe
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ed2k_files'")
     table_exists = cursor.fetchone() is not None
     
     categories = []
@@ -212,13 +212,14 @@ def search_page():
     total_threads = 0
     
     if table_exists:
-        cursor.execute('SELECT DISTINCT forum_category FROM ed2k_links ORDER BY forum_category')
+        cursor.execute('SELECT DISTINCT forum_category FROM ed2k_threads ORDER BY forum_category')
         categories = [row[0] for row in cursor.fetchall()]
         
-        cursor.execute('SELECT COUNT(*) FROM ed2k_links')
+        # Un fichier posté dans plusieurs threads n'est compté qu'une fois
+        cursor.execute('SELECT COUNT(*) FROM ed2k_files')
         total_links = cursor.fetchone()[0]
         
-        cursor.execute('SELECT COUNT(DISTINCT thread_id) FROM ed2k_links')
+        cursor.execute('SELECT COUNT(*) FROM ed2k_threads')
         total_threads = cursor.fetchone()[0]
     
     conn.close()
@@ -227,7 +228,7 @@ def search_page():
                           categories=categories, 
                           total_links=total_links,
                           total_threads=total_threads,
-                          database_empty=not table_exists)
+                          database_empty=not total_links)
 
 
 @search_bp.route('/discover')
@@ -243,6 +244,8 @@ def search_ed2k():
     query = request.args.get('query', '').strip()
     volume = request.args.get('volume', '').strip()
     category = request.args.get('category', '').strip()
+    # Une ligne par fichier (hash ed2k) même s'il est posté dans plusieurs threads
+    unique = request.args.get('unique', '1') != '0'
 
     try:
         all_results = []
@@ -253,20 +256,22 @@ def search_ed2k():
             cursor = conn.cursor()
             
             # Vérifier si la table ed2k_links existe
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ed2k_links'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='ed2k_links'")
             if cursor.fetchone() is not None:
                 sql = '''
                     SELECT thread_id, thread_title, thread_url, forum_category, cover_image,
-                           link, filename, filesize, volume, description
+                           link, filename, COALESCE(size_bytes, filesize), volume, description,
+                           COUNT(*) AS postings, series_title, resolution, format,
+                           MAX(CAST(thread_id AS INTEGER))
                     FROM ed2k_links
                     WHERE 1=1
                 '''
                 params = []
 
                 if query:
-                    sql += ' AND (thread_title LIKE ? OR filename LIKE ?)'
+                    sql += ' AND (thread_title LIKE ? OR filename LIKE ? OR series_title LIKE ?)'
                     search_term = f'%{query}%'
-                    params.extend([search_term, search_term])
+                    params.extend([search_term, search_term, search_term])
 
                 if volume:
                     sql += ' AND volume = ?'
@@ -276,6 +281,8 @@ def search_ed2k():
                     sql += ' AND forum_category = ?'
                     params.append(category)
 
+                # Sans regroupement : une ligne par postage (fichier × thread)
+                sql += ' GROUP BY link' if unique else ' GROUP BY link, thread_id'
                 sql += ' ORDER BY thread_id, volume'
 
                 cursor.execute(sql, params)
@@ -293,7 +300,11 @@ def search_ed2k():
                         'filename': row[6],
                         'filesize': row[7],
                         'volume': row[8],
-                        'description': row[9]
+                        'description': row[9],
+                        'postings': row[10],
+                        'series_title': row[11],
+                        'resolution': row[12],
+                        'format': row[13]
                     })
 
             conn.close()
@@ -332,14 +343,15 @@ def search_ebdz_api():
         cursor = conn.cursor()
         
         # Vérifier si la table ed2k_links existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ed2k_links'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='ed2k_links'")
         if cursor.fetchone() is not None:
             # Nettoyer la requête pour une meilleure correspondance
             clean_query = clean_series_name(query)
             
+            # Une ligne par fichier, rattachée au thread le plus récent
             sql = '''
-                SELECT DISTINCT thread_id, thread_title, thread_url, forum_category, 
-                       link, filename, filesize, volume
+                SELECT thread_id, thread_title, thread_url, forum_category, 
+                       link, filename, COALESCE(size_bytes, filesize), volume, MAX(CAST(thread_id AS INTEGER))
                 FROM ed2k_links
                 WHERE 1=1
             '''
@@ -363,7 +375,7 @@ def search_ebdz_api():
                 sql += ' AND forum_category = ?'
                 params.append(category)
 
-            sql += ' ORDER BY volume DESC, thread_id DESC LIMIT 50'
+            sql += ' GROUP BY link ORDER BY volume DESC, thread_id DESC LIMIT 50'
 
             cursor.execute(sql, params)
             rows = cursor.fetchall()
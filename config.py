@@ -80,7 +80,10 @@ class Config:
         'forums': [],
         'auto_scrape_enabled': False,
         'auto_scrape_interval': 60,  # en minutes
-        'auto_scrape_interval_unit': 'minutes'  # 'minutes', 'hours', 'days'
+        'auto_scrape_interval_unit': 'minutes',  # 'minutes', 'hours', 'days'
+        'requests_per_second': 1.0,  # Budget de requêtes vers ebdz.net
+        'max_concurrency': 2,  # Threads récupérés simultanément par forum
+        'max_parallel_forums': 2  # Forums scrapés en parallèle (même budget de requêtes)
     }
     
     # Prowlarr par défaut
@@ -109,7 +112,8 @@ class Config:
         'auto_assign_enabled': True,
         'auto_assign_rules': [],  # Liste des règles d'auto-assignation
         'auto_import_interval': 60,  # en minutes
-        'auto_import_interval_unit': 'minutes'  # 'minutes', 'hours', 'days'
+        'auto_import_interval_unit': 'minutes',  # 'minutes', 'hours', 'days'
+        'history_retention_days': 90  # Détail fichier par fichier conservé (jours)
     }
     
     @staticmethod
@@ -267,6 +271,30 @@ class Config:
             )
         ''')
         
+        # Lien envoyé (empreinte indexée) et nombre d'envois du même lien
+        cursor.execute("PRAGMA table_info(missing_volume_downloads)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for col_name, col_type in [('link', 'TEXT'), ('link_hash', 'TEXT'), ('attempts', 'INTEGER DEFAULT 1')]:
+            if col_name not in existing_columns:
+                try:
+                    cursor.execute(f"ALTER TABLE missing_volume_downloads ADD COLUMN {col_name} {col_type}")
+                except sqlite3.OperationalError as e:
+                    if 'already exists' not in str(e):
+                        print(f"⚠️  Impossible d'ajouter {col_name}: {e}")
+        
+        # Un envoi par (lien, série, tome) ; les anciennes lignes sans lien restent distinctes (NULL)
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_missing_downloads_link
+            ON missing_volume_downloads (link_hash, title, volume_number)
+        ''')
+        # Recherche "déjà envoyé récemment" par série et tome
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_missing_downloads_volume
+            ON missing_volume_downloads (title, volume_number, success, created_at)
+        ''')
+        # Pagination de l'historique sur la clé primaire : ancien index (created_at, id) inutile
+        cursor.execute('DROP INDEX IF EXISTS idx_missing_downloads_created')
+        
         conn.commit()
 
 
@@ -8,11 +8,17 @@ Tags supportés:
   [P] - Numéro de partie (si applicable)
   [N] - Nom du fichier original (sans extension)
 """
+import os
 import re
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Tuple
 import logging
 
+from blueprints.library.scanner import LibraryScanner
+
 logger = logging.getLogger(__name__)
 
 
@@ -210,7 +216,7 @@ class FileRenamer:
                     continue
                 
                 # Extraire le numéro de volume du nom du fichier
-                volume_number = extract_volume_number(file_path.stem)
+                volume_number = extract_volume_number(file_path.name)
                 
                 files_info.append({
                     'filename': file_path.name,
@@ -228,40 +234,37 @@ class FileRenamer:
             if dry_run:
                 return True, preview, ""
             
-            # Effectuer le renommage réel
+            # Effectuer le renommage réel (deux phases, sans écrasement)
             results = []
+            operations = []
             for item in preview:
                 old_path = series_path_obj / item['old_name']
                 new_path = series_path_obj / item['new_name']
                 
-                if old_path.exists():
-                    # Vérifier que le nouveau nom n'existe pas déjà
-                    if new_path.exists() and old_path != new_path:
-                        logger.warning(f"Fichier destination existe déjà: {new_path}")
-                        results.append({
-                            'old_name': item['old_name'],
-                            'new_name': item['new_name'],
-                            'success': False,
-                            'error': 'Fichier destination existe déjà'
-                        })
-                        continue
-                    
-                    try:
-                        old_path.rename(new_path)
-                        results.append({
-                            'old_name': item['old_name'],
-                            'new_name': item['new_name'],
-                            'success': True
-                        })
-                        logger.info(f"Fichier renommé: {item['old_name']} -> {item['new_name']}")
-                    except Exception as e:
-                        results.append({
-                            'old_name': item['old_name'],
-                            'new_name': item['new_name'],
-                            'success': False,
-                            'error': str(e)
-                        })
-                        logger.error(f"Erreur renommage: {e}")
+                if not old_path.exists() or old_path == new_path:
+                    continue
+                
+                operations.append({
+                    'old_name': item['old_name'],
+                    'new_name': item['new_name'],
+                    'old_path': str(old_path),
+                    'new_path': str(new_path)
+                })
+            
+            # Une destination existante n'est acceptable que si elle est elle-même renommée
+            freed = {op['old_path'] for op in operations}
+            for op in list(operations):
+                if os.path.lexists(op['new_path']) and op['new_path'] not in freed:
+                    logger.warning(f"Fichier destination existe déjà: {op['new_path']}")
+                    results.append({
+                        'old_name': op['old_name'],
+                        'new_name': op['new_name'],
+                        'success': False,
+                        'error': 'Fichier destination existe déjà'
+                    })
+                    operations.remove(op)
+            
+            results.extend(RenameEngine.rename_directory(operations))
             
             return True, results, ""
         
@@ -270,29 +273,317 @@ class FileRenamer:
             return False, [], str(e)
 
 
+class RenameEngine:
+    """Moteur de renommage en deux phases pour une ou plusieurs séries
+    
+    Phase 1 : chaque fichier reçoit un nom temporaire unique dans son dossier.
+    Phase 2 : les noms temporaires sont renommés vers les noms finaux.
+    Les cycles (A -> B, B -> A) et permutations sont ainsi gérés sans écraser
+    de fichier. Les dossiers sont traités en parallèle et la table volumes est
+    mise à jour en une seule transaction.
+    """
+    
+    TEMP_PREFIX = '.rename-tmp-'
+    
+    def __init__(self, db_path: str, max_workers: int = 4):
+        """
+        Args:
+            db_path: Chemin de la base SQLite
+            max_workers: Nombre de dossiers traités en parallèle
+        """
+        self.db_path = db_path
+        self.max_workers = max_workers
+    
+    def load_volumes(self, series_ids: List[int] = None, library_id: int = None) -> List[Dict]:
+        """
+        Charge en une requête les volumes à renommer
+        
+        Args:
+            series_ids: Séries concernées (optionnel)
+            library_id: Bibliothèque entière (optionnel)
+        
+        Returns:
+            Liste de volumes triés par série puis partie/volume
+        """
+        query = '''
+            SELECT v.id, v.series_id, v.filename, v.filepath, v.volume_number, v.part_number,
+                   s.title AS series_title, s.path AS series_path
+            FROM volumes v
+            JOIN series s ON s.id = v.series_id
+        '''
+        conditions = []
+        params = []
+        if series_ids is not None:
+            conditions.append(f"v.series_id IN ({','.join('?' * len(series_ids))})")
+            params.extend(series_ids)
+        if library_id is not None:
+            conditions.append('s.library_id = ?')
+            params.append(library_id)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY s.title, v.series_id, v.part_number, v.volume_number, v.id'
+        
+        conn = sqlite3.connect(self.db_path, timeout=120.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+    
+    def plan(self, pattern: str, volumes: List[Dict], check_disk: bool = True) -> List[Dict]:
+        """
+        Calcule les renommages et détecte les conflits
+        
+        Args:
+            pattern: Pattern de renommage
+            volumes: Volumes retournés par load_volumes
+            check_disk: Vérifier aussi les fichiers existants sur le disque.
+                        Si False, seuls les volumes en base sont considérés
+                        (aperçu rapide d'une bibliothèque entière)
+        
+        Returns:
+            Liste d'opérations avec 'status' : 'rename', 'unchanged' ou
+            'conflict' (avec 'error')
+        
+        Raises:
+            ValueError: Si le pattern est invalide
+        """
+        rename_pattern = RenamePattern(pattern)
+        is_valid, error = rename_pattern.validate()
+        if not is_valid:
+            raise ValueError(error)
+        
+        operations = []
+        counters = {}
+        
+        for volume in volumes:
+            # Compteur [C] propre à chaque série, dans l'ordre partie/volume
+            counter = counters.get(volume['series_id'], 0)
+            counters[volume['series_id']] = counter + 1
+            
+            volume_number = volume.get('volume_number')
+            part_number = volume.get('part_number')
+            if volume_number is None or part_number is None:
+                parsed = LibraryScanner.parse_filename(volume['filename'])
+                if volume_number is None:
+                    volume_number = parsed['volume']
+                if part_number is None:
+                    part_number = parsed['part_number']
+            
+            new_name = rename_pattern.apply(
+                series_title=volume['series_title'],
+                volume_number=volume_number,
+                part_number=part_number,
+                original_filename=volume['filename'],
+                counter=counter
+            )
+            
+            old_path = volume.get('filepath') or os.path.join(volume['series_path'], volume['filename'])
+            operation = {
+                'volume_id': volume['id'],
+                'series_id': volume['series_id'],
+                'series_title': volume['series_title'],
+                'old_name': volume['filename'],
+                'new_name': new_name,
+                'old_path': old_path,
+                'new_path': os.path.join(os.path.dirname(old_path), new_name),
+                'volume_number': volume_number,
+                'counter': counter,
+                'status': 'rename'
+            }
+            
+            if new_name == volume['filename']:
+                operation['status'] = 'unchanged'
+            elif not new_name.strip() or '/' in new_name or os.sep in new_name or new_name.startswith(self.TEMP_PREFIX):
+                operation['status'] = 'conflict'
+                operation['error'] = 'Nom de fichier invalide'
+            
+            operations.append(operation)
+        
+        self._detect_conflicts(operations, check_disk)
+        return operations
+    
+    def _detect_conflicts(self, operations: List[Dict], check_disk: bool = True):
+        """Marque les opérations qui écraseraient un fichier"""
+        # Plusieurs fichiers vers le même nom
+        targets = {}
+        for op in operations:
+            if op['status'] == 'rename':
+                targets.setdefault(op['new_path'], []).append(op)
+        for same_target in targets.values():
+            if len(same_target) > 1:
+                for op in same_target:
+                    op['status'] = 'conflict'
+                    op['error'] = 'Plusieurs fichiers auraient le même nom'
+        
+        # Destination déjà occupée par un fichier qui ne sera pas libéré.
+        # Répété jusqu'à stabilité : un conflit peut en bloquer un autre.
+        changed = True
+        while changed:
+            changed = False
+            freed = {op['old_path'] for op in operations if op['status'] == 'rename'}
+            kept = {op['old_path'] for op in operations if op['status'] != 'rename'}
+            for op in operations:
+                if op['status'] != 'rename':
+                    continue
+                if op['new_path'] in kept or (
+                        check_disk and os.path.lexists(op['new_path']) and op['new_path'] not in freed):
+                    op['status'] = 'conflict'
+                    op['error'] = 'Fichier destination existe déjà'
+                    changed = True
+    
+    def execute(self, operations: List[Dict], job=None) -> List[Dict]:
+        """
+        Effectue les renommages planifiés puis met à jour la base
+        
+        Args:
+            operations: Opérations retournées par plan (seules les 'rename'
+                        sont exécutées)
+            job: BackgroundJob optionnel pour rapporter la progression
+        
+        Returns:
+            Liste de résultats {'volume_id', 'old_name', 'new_name', 'success', 'error'}
+        """
+        to_rename = [op for op in operations if op['status'] == 'rename']
+        
+        groups = {}
+        for op in to_rename:
+            groups.setdefault(os.path.dirname(op['old_path']), []).append(op)
+        
+        results = []
+        if groups:
+            workers = max(1, min(self.max_workers, len(groups)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.rename_directory, ops) for ops in groups.values()]
+                for future in as_completed(futures):
+                    group_results = future.result()
+                    results.extend(group_results)
+                    if job is not None:
+                        job.increment('files_done', len(group_results))
+        
+        renamed = [r for r in results if r['success']]
+        if renamed:
+            self._apply_db_updates(renamed)
+        
+        logger.info(f"Renommage terminé: {len(renamed)}/{len(to_rename)} fichier(s)")
+        return results
+    
+    def run(self, job, pattern: str, library_id: int = None, series_ids: List[int] = None) -> Dict:
+        """
+        Point d'entrée de la tâche de fond (voir background_jobs)
+        
+        Returns:
+            Résumé : fichiers renommés, en erreur et en conflit
+        """
+        operations = self.plan(pattern, self.load_volumes(series_ids=series_ids, library_id=library_id))
+        conflicts = [op for op in operations if op['status'] == 'conflict']
+        
+        job.update(
+            force=True,
+            files_total=sum(1 for op in operations if op['status'] == 'rename'),
+            files_done=0,
+            conflicts=len(conflicts)
+        )
+        
+        results = self.execute(operations, job=job)
+        failed = [r for r in results if not r['success']]
+        
+        return {
+            'renamed_count': len(results) - len(failed),
+            'failed_count': len(failed),
+            'conflict_count': len(conflicts),
+            'failed': failed,
+            'conflicts': [
+                {'volume_id': op['volume_id'], 'old_name': op['old_name'],
+                 'new_name': op['new_name'], 'error': op['error']}
+                for op in conflicts
+            ]
+        }
+    
+    @classmethod
+    def rename_directory(cls, operations: List[Dict]) -> List[Dict]:
+        """
+        Renomme en deux phases des fichiers d'un même dossier
+        
+        Args:
+            operations: Dicts avec au moins 'old_path', 'new_path', 'old_name', 'new_name'
+        
+        Returns:
+            Liste de résultats (un par opération)
+        """
+        token = uuid.uuid4().hex[:8]
+        results = []
+        staged = []
+        
+        # Phase 1 : noms temporaires
+        for index, op in enumerate(operations):
+            temp_path = os.path.join(os.path.dirname(op['old_path']),
+                                     f"{cls.TEMP_PREFIX}{token}-{index}")
+            try:
+                os.rename(op['old_path'], temp_path)
+                staged.append((op, temp_path))
+            except OSError as e:
+                logger.error(f"Erreur renommage {op['old_name']}: {e}")
+                results.append(cls._result(op, False, str(e)))
+        
+        # Phase 2 : noms finaux (jamais d'écrasement)
+        for op, temp_path in staged:
+            try:
+                if os.path.lexists(op['new_path']):
+                    raise FileExistsError('Fichier destination existe déjà')
+                os.rename(temp_path, op['new_path'])
+                results.append(cls._result(op, True))
+                logger.info(f"Fichier renommé: {op['old_name']} -> {op['new_name']}")
+            except OSError as e:
+                error = str(e)
+                # Remettre le fichier à son nom d'origine si possible
+                try:
+                    if os.path.lexists(op['old_path']):
+                        raise FileExistsError(op['old_path'])
+                    os.rename(temp_path, op['old_path'])
+                except OSError:
+                    error += f" (fichier conservé sous {temp_path})"
+                logger.error(f"Erreur renommage {op['old_name']}: {error}")
+                results.append(cls._result(op, False, error))
+        
+        return results
+    
+    @staticmethod
+    def _result(op: Dict, success: bool, error: str = None) -> Dict:
+        result = {
+            'volume_id': op.get('volume_id'),
+            'old_name': op['old_name'],
+            'new_name': op['new_name'],
+            'new_path': op['new_path'],
+            'success': success
+        }
+        if error:
+            result['error'] = error
+        return result
+    
+    def _apply_db_updates(self, renamed: List[Dict]):
+        """Met à jour volumes.filename/filepath en une seule transaction"""
+        conn = sqlite3.connect(self.db_path, timeout=120.0)
+        try:
+            with conn:
+                conn.executemany('''
+                    UPDATE volumes SET filename = ?, filepath = ? WHERE id = ?
+                ''', [(r['new_name'], r['new_path'], r['volume_id']) for r in renamed if r['volume_id']])
+        finally:
+            conn.close()
+
+
 def extract_volume_number(filename: str) -> int:
     """
     Extrait le numéro de volume d'un nom de fichier
     
+    Utilise le même parser que le scanner de bibliothèque pour que le
+    renommage et le scan détectent les mêmes numéros.
+    
     Args:
-        filename: Nom du fichier (sans extension)
+        filename: Nom du fichier (avec extension)
     
     Returns:
         Numéro de volume ou None
     """
-    # Chercher un pattern comme "Vol 1", "Volume 1", "V1", etc.
-    patterns = [
-        r'[Vv](?:ol(?:ume)?)?\.?\s*(\d+)',  # V1, Vol 1, Volume 1
-        r'(\d+)\s*(?:tomes?|volumes?)',      # 1 tome, 2 volumes
-        r'^(\d+)',                            # Commence par un nombre
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, filename, re.IGNORECASE)
-        if match:
-            try:
-                return int(match.group(1))
-            except (ValueError, IndexError):
-                pass
-    
-    return None
+    return LibraryScanner.parse_filename(filename)['volume']
@@ -0,0 +1,236 @@
+"""
+Baux des tâches planifiées, partagés entre les workers
+
+Sous gunicorn, chaque worker démarre ses propres schedulers APScheduler :
+sans coordination, chaque tâche planifiée s'exécuterait une fois par worker.
+Avant de s'exécuter, une tâche prend un bail dans la table scheduler_leases
+(base de la bibliothèque, commune à tous les workers) :
+
+- un seul worker détient le bail ; il le renouvelle (battement de cœur)
+  pendant l'exécution. Un worker arrêté brutalement cesse de le renouveler
+  et le bail expire après LEASE_TTL secondes
+- une tâche démarrée depuis moins de la moitié de son intervalle n'est pas
+  relancée : les déclenchements des autres workers, décalés de quelques
+  secondes, sont ignorés
+- l'état de chaque tâche (worker détenteur, dernier passage, résultat) est
+  lisible depuis n'importe quel worker
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class SchedulerLeaseManager:
+    """Garantit qu'une tâche planifiée ne s'exécute que sur un seul worker"""
+    
+    # Durée de validité d'un bail sans battement de cœur (secondes)
+    LEASE_TTL = 120
+    # Intervalle entre deux renouvellements du bail (secondes)
+    HEARTBEAT_INTERVAL = 30
+    # Part de l'intervalle de la tâche pendant laquelle un passage récent bloque un nouveau départ
+    MIN_INTERVAL_RATIO = 0.5
+    
+    def __init__(self, app=None):
+        self.app = app
+        self.db_path = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Initialiser le gestionnaire avec l'app Flask"""
+        self.app = app
+        self.db_path = app.config['DATABASE']
+        self._init_table()
+    
+    @property
+    def owner(self):
+        """Identifiant du worker (calculé à chaque appel : les workers sont forkés)"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+    
+    def _init_table(self):
+        """Crée la table des baux"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS scheduler_leases (
+                job_id TEXT PRIMARY KEY,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                heartbeat_at REAL,
+                last_owner TEXT,
+                last_started_at REAL,
+                last_finished_at REAL,
+                last_status TEXT,
+                last_error TEXT,
+                run_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.commit()
+        conn.close()
+    
+    def acquire(self, job_id, interval_seconds=0):
+        """Prend le bail d'une tâche s'il est libre (ou expiré)
+        
+        Args:
+            job_id: Identifiant de la tâche planifiée
+            interval_seconds: Intervalle de la tâche (0 = pas de délai minimal)
+        
+        Returns:
+            True si ce worker détient le bail
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('INSERT OR IGNORE INTO scheduler_leases (job_id) VALUES (?)', (job_id,))
+            # Une seule requête UPDATE : SQLite sérialise les écritures, un seul worker l'emporte
+            cursor = conn.execute('''
+                UPDATE scheduler_leases
+                SET owner = ?, expires_at = ?, heartbeat_at = ?, last_owner = ?,
+                    last_started_at = ?, last_finished_at = NULL, last_status = 'running',
+                    last_error = NULL, run_count = run_count + 1
+                WHERE job_id = ?
+                  AND (owner IS NULL OR expires_at < ?)
+                  AND (last_started_at IS NULL OR last_started_at <= ?)
+            ''', (self.owner, now + self.LEASE_TTL, now, self.owner, now, job_id,
+                  now, now - interval_seconds * self.MIN_INTERVAL_RATIO))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+    
+    def heartbeat(self, job_id):
+        """Prolonge le bail détenu par ce worker
+        
+        Returns:
+            False si le bail a été perdu (expiré puis repris par un autre worker)
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE scheduler_leases SET expires_at = ?, heartbeat_at = ?
+                WHERE job_id = ? AND owner = ?
+            ''', (now + self.LEASE_TTL, now, job_id, self.owner))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+    
+    def release(self, job_id, status='completed', error=None):
+        """Libère le bail et enregistre le résultat du passage"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE scheduler_leases
+                SET owner = NULL, expires_at = 0, last_finished_at = ?, last_status = ?, last_error = ?
+                WHERE job_id = ? AND owner = ?
+            ''', (time.time(), status, error, job_id, self.owner))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _heartbeat_loop(self, job_id, stop):
+        while not stop.wait(self.HEARTBEAT_INTERVAL):
+            try:
+                if not self.heartbeat(job_id):
+                    print(f"⚠️  Bail de la tâche {job_id} perdu (expiré), un autre worker peut la relancer")
+                    return
+            except sqlite3.Error as e:
+                print(f"⚠️  Impossible de renouveler le bail de {job_id}: {e}")
+    
+    @contextmanager
+    def hold(self, job_id, interval_seconds=0):
+        """Détient le bail pendant le bloc (renouvelé par un thread de battement de cœur)
+        
+        Yields:
+            True si ce worker a obtenu le bail, False sinon (le bloc doit alors s'arrêter)
+        """
+        if self.db_path is None:
+            # Gestionnaire non initialisé (processus unique) : exécution locale
+            yield True
+            return
+        
+        try:
+            acquired = self.acquire(job_id, interval_seconds)
+        except sqlite3.Error as e:
+            print(f"⚠️  Impossible de prendre le bail de {job_id}: {e}")
+            acquired = False
+        
+        if not acquired:
+            yield False
+            return
+        
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(job_id, stop),
+            name=f"lease-{job_id}", daemon=True
+        )
+        heartbeat.start()
+        status, error = 'completed', None
+        try:
+            yield True
+        except Exception as e:
+            status, error = 'failed', str(e)
+            raise
+        finally:
+            stop.set()
+            heartbeat.join(timeout=5)
+            try:
+                self.release(job_id, status, error)
+            except sqlite3.Error as e:
+                print(f"⚠️  Impossible de libérer le bail de {job_id}: {e}")
+    
+    def run_exclusive(self, job_id, func, interval_seconds=0):
+        """Exécute func() si ce worker obtient le bail (fonction passée à APScheduler)"""
+        with self.hold(job_id, interval_seconds) as acquired:
+            if not acquired:
+                print(f"⏭️  Tâche {job_id} déjà prise en charge par un autre worker, passage ignoré")
+                return None
+            return func()
+    
+    @staticmethod
+    def _format_time(timestamp):
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
+    
+    def _row_to_dict(self, row, now):
+        lease = dict(row)
+        running = bool(lease['owner']) and lease['expires_at'] >= now
+        if lease['owner'] and not running:
+            # Worker arrêté sans libérer le bail
+            lease['last_status'] = 'expired'
+        lease['running'] = running
+        lease['held_by_this_worker'] = running and lease['owner'] == self.owner
+        for key in ('expires_at', 'heartbeat_at', 'last_started_at', 'last_finished_at'):
+            lease[key] = self._format_time(lease[key])
+        return lease
+    
+    def get(self, job_id):
+        """Retourne l'état d'une tâche planifiée ou None"""
+        if self.db_path is None:
+            return None
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('SELECT * FROM scheduler_leases WHERE job_id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._row_to_dict(row, time.time()) if row else None
+    
+    def list(self):
+        """Liste l'état de toutes les tâches planifiées"""
+        if self.db_path is None:
+            return []
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute('SELECT * FROM scheduler_leases ORDER BY job_id').fetchall()
+        conn.close()
+        now = time.time()
+        return [self._row_to_dict(row, now) for row in rows]
+
+
+# Instance globale du gestionnaire
+lease_manager = SchedulerLeaseManager()
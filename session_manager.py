@@ -0,0 +1,201 @@
+"""
+Sessions HTTP authentifiées partagées (ebdz.net, qBittorrent, Prowlarr...)
+
+- une requests.Session par service, avec un pool de connexions keep-alive
+- cookies persistés sur disque, chiffrés avec la clé Fernet de encryption.py :
+  un redémarrage ne coûte pas de nouvelle connexion
+- ré-authentification uniquement lorsqu'une réponse est rejetée (cookie
+  expiré), puis nouvel envoi transparent de la requête
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import create_cookie, get_cookie_header
+
+from encryption import encrypt, decrypt
+
+
+SESSIONS_DIR = './data/sessions'
+
+
+class SessionManager:
+    """Registre des sessions authentifiées par service"""
+    
+    def __init__(self, sessions_dir=SESSIONS_DIR, pool_maxsize=10):
+        self.sessions_dir = sessions_dir
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._identities = {}
+        self._authenticated = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._retrying = threading.local()
+    
+    def _path(self, name):
+        return os.path.join(self.sessions_dir, f"{name}.session")
+    
+    @staticmethod
+    def fingerprint(*parts):
+        """Identité d'une session (URL, utilisateur...) : la changer invalide les cookies"""
+        return hashlib.sha256('|'.join(str(p) for p in parts).encode()).hexdigest()
+    
+    def get(self, name, identity='', login=None, is_rejected=None, persist=True):
+        """Retourne la session partagée d'un service
+        
+        Args:
+            name: Nom du service ('ebdz', 'qbittorrent', 'prowlarr')
+            identity: Empreinte des identifiants (fingerprint). Une identité
+                      différente remplace la session et ses cookies.
+            login: Fonction login(session) -> bool, appelée quand une réponse
+                   est rejetée
+            is_rejected: Fonction is_rejected(response) -> bool
+            persist: Sauvegarder les cookies sur disque
+        """
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None or self._identities.get(name) != identity:
+                session = self._new_session()
+                self._sessions[name] = session
+                self._identities[name] = identity
+                self._locks.setdefault(name, threading.Lock())
+                self._authenticated[name] = persist and self._load(name, session, identity)
+            
+            session.persist = persist
+            if login and is_rejected:
+                session.hooks['response'] = [self._reauth_hook(name, session, login, is_rejected)]
+            return session
+    
+    def pooled(self, name):
+        """Session keep-alive sans authentification par cookie (API key...)"""
+        return self.get(name, persist=False)
+    
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def is_authenticated(self, name):
+        """Indique si la session a des cookies valides (restaurés ou après login)"""
+        return self._authenticated.get(name, False)
+    
+    def mark_authenticated(self, name):
+        """À appeler après un login réussi : les cookies sont sauvegardés"""
+        self._authenticated[name] = True
+        self.save(name)
+    
+    def invalidate(self, name):
+        """Oublie les cookies d'un service (mémoire et disque)"""
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is not None:
+                session.cookies.clear()
+            self._authenticated[name] = False
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+    
+    def _reauth_hook(self, name, session, login, is_rejected):
+        """Hook de réponse : ré-authentifie et renvoie la requête rejetée une fois"""
+        
+        def hook(response, **kwargs):
+            if getattr(self._retrying, 'active', False) or not is_rejected(response):
+                return response
+            
+            sent_cookies = response.request.headers.get('Cookie')
+            with self._locks[name]:
+                # Un autre thread a pu se reconnecter pendant la requête
+                current_cookies = get_cookie_header(session.cookies, response.request)
+                if current_cookies == sent_cookies or not current_cookies:
+                    print(f"🔑 Session {name} rejetée, nouvelle authentification...")
+                    self._authenticated[name] = False
+                    self._retrying.active = True
+                    try:
+                        if not login(session):
+                            return response
+                    finally:
+                        self._retrying.active = False
+                    self.mark_authenticated(name)
+            
+            retry = response.request.copy()
+            retry.headers.pop('Cookie', None)
+            retry.prepare_cookies(session.cookies)
+            self._retrying.active = True
+            try:
+                return session.send(retry, **kwargs)
+            finally:
+                self._retrying.active = False
+        
+        return hook
+    
+    def save(self, name):
+        """Sauvegarde chiffrée des cookies d'un service"""
+        session = self._sessions.get(name)
+        if session is None or not getattr(session, 'persist', True):
+            return
+        
+        cookies = [
+            {
+                'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path,
+                'expires': c.expires, 'secure': c.secure
+            }
+            for c in session.cookies
+        ]
+        payload = json.dumps({
+            'identity': self._identities.get(name, ''),
+            'saved_at': time.time(),
+            'cookies': cookies
+        })
+        
+        try:
+            os.makedirs(self.sessions_dir, exist_ok=True)
+            tmp_path = f"{self._path(name)}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(encrypt(payload))
+            os.replace(tmp_path, self._path(name))
+        except Exception as e:
+            print(f"⚠️  Impossible de sauvegarder la session {name}: {e}")
+    
+    def _load(self, name, session, identity):
+        """Restaure les cookies sauvegardés s'ils correspondent à l'identité"""
+        try:
+            with open(self._path(name), 'r') as f:
+                payload = decrypt(f.read())
+        except (FileNotFoundError, OSError):
+            return False
+        except Exception as e:
+            print(f"⚠️  Session {name} illisible: {e}")
+            return False
+        
+        if not payload:
+            return False
+        
+        data = json.loads(payload)
+        if data.get('identity') != identity:
+            return False
+        
+        now = time.time()
+        restored = 0
+        for c in data.get('cookies', []):
+            if c.get('expires') and c['expires'] < now:
+                continue
+            session.cookies.set_cookie(create_cookie(
+                c['name'], c['value'], domain=c['domain'], path=c['path'],
+                expires=c.get('expires'), secure=c.get('secure', False)
+            ))
+            restored += 1
+        
+        if restored:
+            print(f"✓ Session {name} restaurée ({restored} cookie(s))")
+        return restored > 0
+
+
+# Instance globale du gestionnaire
+session_manager = SessionManager()
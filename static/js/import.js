@@ -1028,22 +1028,35 @@ window.onclick = function(event) {
 }
 
 // ===== HISTORIQUE DES IMPORTS =====
-async function loadImportHistory() {
+// Curseur de pagination de l'historique (id de la dernière opération affichée)
+let historyNextBefore = null;
+
+async function loadImportHistory(append = false) {
     try {
         const container = document.getElementById('history-container');
         const loading = document.getElementById('history-loading');
         
-        loading.style.display = 'block';
-        container.style.display = 'none';
+        if (!append) {
+            historyNextBefore = null;
+            loading.style.display = 'block';
+            container.style.display = 'none';
+        }
+        
+        let url = '/api/import/history?limit=50';
+        if (append && historyNextBefore) {
+            url += `&before=${historyNextBefore}`;
+        }
         
-        const response = await fetch('/api/import/history?limit=50');
+        const response = await fetch(url);
         const data = await response.json();
         
         if (data.success && data.history && data.history.length > 0) {
-            displayImportHistory(data.history);
+            historyNextBefore = data.next_before;
+            displayImportHistory(data.history, append);
+            document.getElementById('history-more').style.display = historyNextBefore ? 'block' : 'none';
             container.style.display = 'block';
             loading.style.display = 'none';
-        } else {
+        } else if (!append) {
             document.getElementById('history-empty').style.display = 'block';
             document.getElementById('history-table-wrapper').style.display = 'none';
             container.style.display = 'block';
@@ -1055,9 +1068,11 @@ async function loadImportHistory() {
     }
 }
 
-function displayImportHistory(history) {
+function displayImportHistory(history, append = false) {
     const tbody = document.getElementById('history-body');
-    tbody.innerHTML = '';
+    if (!append) {
+        tbody.innerHTML = '';
+    }
     
     const tableWrapper = document.getElementById('history-table-wrapper');
     tableWrapper.style.display = 'table';
@@ -1117,7 +1132,7 @@ function displayImportHistory(history) {
                 <button class="btn" style="padding: 4px 8px; font-size: 12px; background: #8b5cf6; margin-right: 5px;" onclick="event.stopPropagation(); showHistoryDetails('${operation.operation_id}');">
                     📋 Détails
                 </button>
-                ${operation.status === 'completed' ? `
+                ${operation.status === 'completed' && !operation.compacted ? `
                     <button class="btn" style="padding: 4px 8px; font-size: 12px; background: #ef4444;" onclick="event.stopPropagation(); undoImportOperation('${operation.operation_id}');">
                         ↩️ Annuler
                     </button>
@@ -1230,7 +1245,14 @@ async function undoImportOperation(operationId) {
         const data = await response.json();
         
         if (data.success) {
-            alert(`✅ Annulation réussie!\n\n${data.message}`);
+            let details = '';
+            if (data.stats && data.stats.elapsed_seconds !== undefined) {
+                details = `\n\n⏱️ ${data.stats.elapsed_seconds}s`;
+                if (data.stats.files_per_second) {
+                    details += ` (${data.stats.files_per_second} fichiers/s)`;
+                }
+            }
+            alert(`✅ Annulation réussie!\n\n${data.message}${details}`);
             loadImportHistory(); // Recharger l'historique
         } else {
             alert(`❌ Erreur: ${data.error}`);
@@ -1368,6 +1368,7 @@ async function updateRenamePreview() {
                             <div class="rename-preview-new">
                                 <span class="rename-preview-label">Après:</span>
                                 <code>${escapeHtml(item.new_name)}</code>
+                                ${item.status === 'conflict' ? `<span style="color: #c33;">⚠️ ${escapeHtml(item.error)}</span>` : ''}
                             </div>
                         </div>
                     `).join('')}
@@ -305,10 +305,22 @@ async function runScraper() {
         });
         const data = await response.json();
 
-        if (data.success) {
-            showMessage('ebdzMessage2', `✅ Scraping terminé ! ${data.total_links} liens récupérés sur ${data.forums_scraped} forum(s).`, 'success');
-        } else {
+        if (!data.success) {
             showMessage('ebdzMessage2', '❌ Erreur: ' + data.error, 'error');
+            return;
+        }
+
+        // Le scraping tourne en tâche de fond : suivi de la progression
+        const job = await waitForScrapeJob(data.job_id);
+        if (job.status === 'completed') {
+            const result = job.result;
+            let message = `✅ Scraping terminé ! ${result.new_links} nouveaux liens sur ${result.forums_scraped} forum(s).`;
+            if (result.forums_failed > 0) {
+                message += ` ⚠️ ${result.forums_failed} forum(s) en erreur.`;
+            }
+            showMessage('ebdzMessage2', message, result.forums_failed > 0 ? 'warning' : 'success');
+        } else {
+            showMessage('ebdzMessage2', '❌ Erreur: ' + (job.error || job.status), 'error');
         }
     } catch (error) {
         showMessage('ebdzMessage2', '❌ Erreur: ' + error.message, 'error');
@@ -318,6 +330,28 @@ async function runScraper() {
     }
 }
 
+async function waitForScrapeJob(jobId, interval = 2000) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error);
+        }
+
+        const job = data.job;
+        if (!['pending', 'running'].includes(job.status)) {
+            return job;
+        }
+
+        const progress = job.progress || {};
+        if (progress.forums_total) {
+            showMessage('ebdzMessage2', `⏳ Scraping en cours… ${progress.forums_done || 0}/${progress.forums_total} forum(s), +${progress.new_links || 0} liens`, 'info');
+        }
+
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 function toggleEbdzPassword() {
     const input = document.getElementById('ebdzPassword');
     const btn = input.closest('.password-input-group').querySelector('.btn-toggle-password');
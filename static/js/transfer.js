@@ -358,67 +358,74 @@ async function moveSelectedLeft() {
 
 /**
  * Effectue le transfert d'une ou plusieurs séries
+ *
+ * Le serveur lance une tâche en arrière-plan : on suit sa progression
+ * via /api/jobs/<job_id> jusqu'à la fin.
  */
 async function transferSeries(seriesIds, fromLibraryId, toLibraryId, fromSide, toSide) {
     try {
-        let successCount = 0;
-        let failureCount = 0;
-
-        for (const seriesId of seriesIds) {
-            try {
-                const response = await fetch('/api/transfer/move', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        series_id: seriesId,
-                        from_library_id: fromLibraryId,
-                        to_library_id: toLibraryId
-                    })
-                });
-
-                if (response.ok) {
-                    successCount++;
-                    transferCount++;
-                    
-                    // Retirer l'élément de l'affichage
-                    const itemId = `${fromSide}-series-${seriesId}`;
-                    const item = document.getElementById(itemId);
-                    if (item) {
-                        item.style.animation = 'slideOut 0.3s ease-out';
-                        setTimeout(() => item.remove(), 300);
-                    }
-                    
-                    // Mettre à jour les sélections
-                    if (fromSide === 'left') {
-                        leftSelectedSeries.delete(seriesId);
-                    } else {
-                        rightSelectedSeries.delete(seriesId);
-                    }
-                } else {
-                    failureCount++;
-                    const errorData = await response.json();
-                    console.error(`Erreur transfert série ${seriesId}:`, errorData.error);
-                }
-            } catch (error) {
-                failureCount++;
-                console.error(`Erreur lors du transfert de la série ${seriesId}:`, error);
+        const response = await fetch('/api/transfer/move', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                series_ids: seriesIds,
+                from_library_id: fromLibraryId,
+                to_library_id: toLibraryId
+            })
+        });
+
+        const data = await response.json();
+        if (!response.ok) {
+            showNotification(`Erreur: ${data.error}`, 'error');
+            return;
+        }
+
+        showNotification(data.message, 'info');
+
+        const job = await waitForJob(data.job_id);
+        const result = job.result || { transferred: [], failed: [] };
+
+        if (job.status !== 'completed') {
+            showNotification(`Erreur lors du transfert: ${job.error || job.status}`, 'error');
+        }
+
+        for (const transferred of result.transferred) {
+            transferCount++;
+
+            // Retirer l'élément de l'affichage
+            const itemId = `${fromSide}-series-${transferred.series_id}`;
+            const item = document.getElementById(itemId);
+            if (item) {
+                item.style.animation = 'slideOut 0.3s ease-out';
+                setTimeout(() => item.remove(), 300);
             }
+
+            // Mettre à jour les sélections
+            if (fromSide === 'left') {
+                leftSelectedSeries.delete(transferred.series_id);
+            } else {
+                rightSelectedSeries.delete(transferred.series_id);
+            }
+        }
+
+        for (const failed of result.failed) {
+            console.error(`Erreur transfert série ${failed.series_id}:`, failed.error);
         }
 
         // Afficher le résultat
-        if (successCount > 0) {
+        if (result.transferred.length > 0) {
             showNotification(
-                `${successCount} série(s) transférée(s) avec succès!`,
+                `${result.transferred.length} série(s) transférée(s) avec succès!`,
                 'success'
             );
             updateCompletionStat();
         }
 
-        if (failureCount > 0) {
+        if (result.failed.length > 0) {
             showNotification(
-                `${failureCount} série(s) n'ont pas pu être transférée(s)`,
+                `${result.failed.length} série(s) n'ont pas pu être transférée(s)`,
                 'error'
             );
         }
@@ -440,6 +447,25 @@ async function transferSeries(seriesIds, fromLibraryId, toLibraryId, fromSide, t
     }
 }
 
+/**
+ * Attend la fin d'une tâche en arrière-plan en interrogeant son état
+ */
+async function waitForJob(jobId, interval = 1000) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error);
+        }
+
+        if (!['pending', 'running'].includes(data.job.status)) {
+            return data.job;
+        }
+
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 /**
  * Met à jour le compteur de transferts réussis
  */
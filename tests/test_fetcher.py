@@ -0,0 +1,106 @@
+"""
+PoliteFetcher face à un serveur HTTP local (429/Retry-After, 5xx, débit)
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from blueprints.ebdz.fetcher import PoliteFetcher
+
+
+class StubServer:
+    """Serveur local : réponses programmées par chemin, horodatage des requêtes"""
+    
+    def __init__(self):
+        self.hits = []
+        self.responses = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self.lock = threading.Lock()
+        
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.hits.append((self.path, time.monotonic()))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    queue = stub.responses.get(self.path)
+                    status, headers = queue.pop(0) if queue else (200, {})
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def times(self, path):
+        return [at for hit_path, at in self.hits if hit_path == path]
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+def test_retry_after_is_honored(server):
+    server.responses['/busy'] = [(429, {'Retry-After': '0.3'})]
+    fetcher = PoliteFetcher(requests_per_second=50, backoff_base=0.01, timeout=5)
+    
+    response = fetcher.get(server.url + '/busy')
+    
+    assert response.status_code == 200
+    first, second = server.times('/busy')
+    assert second - first >= 0.3
+    assert fetcher.stats['throttled'] == 1
+    assert fetcher.stats['retries'] == 1
+    assert fetcher.stats['errors'] == 0
+
+
+def test_server_errors_exhaust_retries(server):
+    server.responses['/down'] = [(503, {})] * 10
+    fetcher = PoliteFetcher(requests_per_second=50, max_retries=2, backoff_base=0.01, timeout=5)
+    
+    response = fetcher.get(server.url + '/down')
+    
+    # Dernière réponse retournée telle quelle une fois les tentatives épuisées
+    assert response.status_code == 503
+    assert len(server.times('/down')) == 3
+    assert fetcher.stats['retries'] == 2
+    assert fetcher.stats['errors'] == 1
+
+
+def test_rate_budget_holds_under_concurrency(server):
+    server.delay = 0.05
+    fetcher = PoliteFetcher(requests_per_second=20, max_concurrency=4, timeout=5)
+    
+    results = list(fetcher.map(lambda i: fetcher.get(f"{server.url}/page/{i}").status_code, range(10)))
+    
+    assert sorted(result for _, result, _ in results) == [200] * 10
+    assert all(error is None for _, _, error in results)
+    assert server.max_in_flight <= 4
+    
+    # Premier jeton immédiat, puis un toutes les 1/20 s
+    times = sorted(at for _, at in server.hits)
+    assert times[-1] - times[0] >= 9 / 20 * 0.9
@@ -0,0 +1,25 @@
+"""
+Tomes couverts par un titre de release Prowlarr (parse_release_volumes)
+"""
+import pytest
+
+from blueprints.missing_monitor.searcher import parse_release_volumes
+
+
+@pytest.mark.parametrize('title, volumes', [
+    ('Berserk Vol. 41 FR CBZ', {41}),
+    ('One Piece Vol.105 FR', {105}),
+    ('Dr. Stone T12', {12}),
+    ('Dr. Stone T12 [FR].cbz', {12}),
+    ('Naruto - Tome 5', {5}),
+])
+def test_single_volume_with_dots(title, volumes):
+    assert parse_release_volumes(title) == volumes
+
+
+def test_pack_range():
+    assert parse_release_volumes('One Piece T01-T03 FR') == {1, 2, 3}
+
+
+def test_no_volume():
+    assert parse_release_volumes('Berserk Artbook FR') == set()
@@ -0,0 +1,80 @@
+"""
+Seaux à jetons de RequestThrottler, pilotés par une horloge factice
+"""
+import pytest
+
+from blueprints.missing_monitor.request_throttler import RequestThrottler
+
+
+def make_throttler(clock, **kwargs):
+    return RequestThrottler(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_burst_then_rate(clock):
+    throttler = make_throttler(clock, requests_per_minute=60, burst=3)
+    
+    # Rafale : trois requêtes immédiates
+    assert [throttler.wait_if_needed('prowlarr') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+    
+    # Puis une requête par seconde
+    assert throttler.wait_if_needed('prowlarr') == pytest.approx(1.0)
+    assert throttler.wait_if_needed('prowlarr') == pytest.approx(1.0)
+    assert clock.sleeps == [pytest.approx(1.0), pytest.approx(1.0)]
+
+
+def test_refill_is_capped_at_burst(clock):
+    throttler = make_throttler(clock, requests_per_minute=60, burst=2)
+    throttler.wait_if_needed('prowlarr')
+    throttler.wait_if_needed('prowlarr')
+    assert not throttler.can_request('prowlarr')
+    assert throttler.time_until_available('prowlarr') == pytest.approx(1.0)
+    
+    # Une longue pause ne recharge que `burst` jetons
+    clock.advance(600)
+    assert throttler.try_acquire('prowlarr')
+    assert throttler.try_acquire('prowlarr')
+    assert not throttler.try_acquire('prowlarr')
+
+
+def test_sources_are_independent(clock):
+    throttler = make_throttler(clock, requests_per_minute=60, burst=1)
+    assert throttler.wait_if_needed('prowlarr') == 0.0
+    assert throttler.wait_if_needed('nautiljon') == 0.0
+    assert throttler.wait_if_needed('prowlarr') == pytest.approx(1.0)
+
+
+def test_configure_sets_per_source_rates(clock):
+    throttler = make_throttler(clock, requests_per_minute=60, burst=1)
+    throttler.wait_if_needed('prowlarr')
+    
+    # Réglage appliqué au seau existant et aux seaux créés ensuite
+    throttler.configure({
+        'prowlarr': {'requests_per_minute': 30, 'burst': 2},
+        'nautiljon': {'requests_per_minute': 6}
+    })
+    assert throttler.wait_if_needed('prowlarr') == pytest.approx(2.0)
+    assert throttler.wait_if_needed('nautiljon') == 0.0
+    assert throttler.wait_if_needed('nautiljon') == pytest.approx(10.0)
+    
+    by_source = throttler.stats()['by_source']
+    assert by_source['prowlarr']['requests_per_minute'] == 30
+    assert by_source['prowlarr']['burst'] == 2
+    assert by_source['nautiljon']['burst'] == 1
+
+
+def test_wait_time_accounting(clock):
+    throttler = make_throttler(clock, requests_per_minute=60, burst=1)
+    for _ in range(4):
+        throttler.wait_if_needed('prowlarr')
+    assert not throttler.try_acquire('prowlarr')
+    
+    stats = throttler.stats()['by_source']['prowlarr']
+    assert stats['requests'] == 4
+    assert stats['immediate'] == 1
+    assert stats['waited'] == 3
+    assert stats['rejected'] == 1
+    assert stats['total_wait_seconds'] == pytest.approx(3.0)
+    assert stats['max_wait_seconds'] == pytest.approx(1.0)
+    assert stats['avg_wait_seconds'] == pytest.approx(1.0)
+    assert sum(clock.sleeps) == pytest.approx(3.0)
@@ -0,0 +1,61 @@
+"""
+Détection des threads modifiés : clé stable du dernier message (dates relatives MyBB)
+"""
+from datetime import datetime
+
+import pytest
+
+from blueprints.ebdz.parsing import available_parsers, get_parser, last_post_key
+from blueprints.ebdz.scraper import MyBBScraper
+
+
+FORUM_ROW = """
+<table><tr>
+  <td><a href="showthread.php?tid=42">One Piece</a></td>
+  <td><a href="misc.php?action=whoPosted&tid=42">12</a></td>
+  <td><span class="lastpost smalltext">{date}<br />
+    <a href="showthread.php?tid=42&action=lastpost">Dernier message</a> : {author}</span></td>
+</tr></table>
+"""
+
+DAY_ONE = datetime(2026, 10, 19, 23, 50)
+DAY_TWO = datetime(2026, 10, 20, 0, 10)
+
+
+def test_relative_dates_resolve_to_the_same_key():
+    assert (last_post_key("Aujourd'hui, 10:21 Dernier message : bob", now=DAY_ONE)
+            == last_post_key("Hier, 10:21 Dernier message : bob", now=DAY_TWO)
+            == "19-10-2026, 10:21 Dernier message : bob")
+    assert last_post_key("Il y a 5 minutes", now=DAY_ONE) == "19-10-2026, 23:45"
+    assert last_post_key("19-10-2026, 10:21") == "19-10-2026, 10:21"
+    assert last_post_key(None) is None
+
+
+def test_pid_takes_precedence():
+    assert last_post_key("Aujourd'hui, 10:21", pid='981') == 'pid:981'
+
+
+@pytest.mark.parametrize('backend', available_parsers())
+def test_parsers_extract_last_post_pid(backend):
+    parser = get_parser(backend)
+    html = FORUM_ROW.format(date="Aujourd'hui, 10:21",
+                            author='<a href="showthread.php?pid=981#pid981">bob</a>')
+    threads, _ = parser.parse_forum_page(html)
+    assert threads[0]['last_post_pid'] == '981'
+    assert threads[0]['reply_count'] == 12
+    
+    threads, _ = parser.parse_forum_page(FORUM_ROW.format(date="Hier, 10:21", author='bob'))
+    assert threads[0]['last_post_pid'] is None
+    assert threads[0]['last_post'].startswith('Hier, 10:21')
+
+
+def test_unchanged_thread_survives_day_rollover():
+    scraper = MyBBScraper('https://forum.example/forumdisplay.php?fid=1', ':memory:', 'user', 'secret')
+    known_state = {'42': {'last_post': last_post_key("Aujourd'hui, 10:21", now=DAY_ONE), 'reply_count': 12}}
+    
+    thread = {'thread_id': '42', 'reply_count': 12,
+              'last_post_key': last_post_key("Hier, 10:21", now=DAY_TWO)}
+    assert not scraper.thread_has_changed(thread, known_state)
+    
+    thread['reply_count'] = 13
+    assert scraper.thread_has_changed(thread, known_state)
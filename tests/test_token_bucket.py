@@ -0,0 +1,43 @@
+"""
+TokenBucket partagé (fetcher ebdz et throttler), piloté par une horloge factice
+"""
+import pytest
+
+from token_bucket import TokenBucket
+
+
+def test_reserve_returns_delay_without_sleeping(clock):
+    bucket = TokenBucket(2.0, capacity=2, clock=clock, sleep=clock.sleep)
+    
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, pytest.approx(0.5), pytest.approx(1.0)]
+    assert clock.sleeps == []
+
+
+def test_acquire_waits_for_refill(clock):
+    bucket = TokenBucket(4.0, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.25)]
+
+
+def test_pause_blocks_until_it_ends(clock):
+    bucket = TokenBucket(10.0, capacity=3, clock=clock, sleep=clock.sleep)
+    bucket.pause(5)
+    
+    assert not bucket.try_acquire()
+    assert bucket.time_until_available() == pytest.approx(5.0)
+    bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(5.0)
+    
+    # Jetons accumulés pendant la pause, bornés par la réserve
+    assert bucket.available() == pytest.approx(2.0)
+
+
+def test_set_rate_keeps_tokens_within_capacity(clock):
+    bucket = TokenBucket(1.0, capacity=5, clock=clock, sleep=clock.sleep)
+    bucket.set_rate(0.5, capacity=2)
+    assert bucket.available() == pytest.approx(2.0)
+    
+    bucket.try_acquire()
+    bucket.try_acquire()
+    assert bucket.time_until_available() == pytest.approx(2.0)
@@ -0,0 +1,110 @@
+"""
+Seau à jetons partagé pour limiter le débit des requêtes
+
+Utilisé par le scraper ebdz (PoliteFetcher, un seau par hôte) et par la
+surveillance des volumes manquants (RequestThrottler, un seau par source).
+L'horloge et la fonction d'attente sont injectables : les tests pilotent
+le seau avec une horloge factice, sans dormir.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` jetons par seconde, au plus `capacity` en réserve"""
+    
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate: Jetons ajoutés par seconde
+            capacity: Jetons en réserve au plus (requêtes autorisées en rafale)
+            clock: Horloge monotone en secondes
+            sleep: Fonction d'attente associée à l'horloge
+        """
+        self.rate = float(rate)
+        self.capacity = float(max(1, capacity))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def _refill(self, now):
+        """Ajoute les jetons accumulés depuis la dernière mise à jour (sous self.lock)"""
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+    
+    def reserve(self):
+        """Réserve un jeton et retourne le délai (secondes) avant de pouvoir l'utiliser
+        
+        Le jeton est pris tout de suite (solde éventuellement négatif) : l'appelant
+        attend ensuite hors du verrou, sans bloquer les autres threads.
+        """
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+    
+    def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme
+        
+        Contrairement à reserve(), une pause décidée pendant l'attente
+        (Retry-After, backoff) est prise en compte avant de repartir.
+        """
+        while True:
+            with self.lock:
+                now = self.clock()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            # Attente hors du verrou pour ne pas bloquer les autres threads
+            self.sleep(wait)
+    
+    def try_acquire(self):
+        """Prend un jeton s'il est disponible, sans jamais attendre"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            if now < self.paused_until or self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+    
+    def time_until_available(self):
+        """Délai (secondes) avant qu'un jeton soit disponible, sans le prendre"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            return max(0.0, (1 - self.tokens) / self.rate, self.paused_until - now)
+    
+    def available(self):
+        """Jetons disponibles immédiatement"""
+        with self.lock:
+            self._refill(self.clock())
+            return max(self.tokens, 0.0)
+    
+    def pause(self, seconds):
+        """Suspend la distribution de jetons (Retry-After, backoff)"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = min(self.tokens, 0.0)
+    
+    def set_rate(self, rate, capacity=None):
+        """Change le débit (et la réserve) en conservant les jetons déjà accumulés"""
+        with self.lock:
+            self._refill(self.clock())
+            self.rate = float(rate)
+            if capacity is not None:
+                self.capacity = float(max(1, capacity))
+                self.tokens = min(self.tokens, self.capacity)